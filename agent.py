@@ -0,0 +1,37 @@
+"""Fleet agent: report this host's metrics to an aggregator, without the web UI.
+
+    python agent.py --url http://monitor.example:5000 [--interval 5] [--host name]
+
+Any instance of the web app can act as the aggregator; its /fleet page and
+/api/fleet list every host that reports to it.
+"""
+import argparse
+import logging
+import os
+import signal
+
+from app.agent import Agent, DEFAULT_INTERVAL, MAX_SPOOL_BYTES
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Push system metrics to a fleet aggregator.')
+    parser.add_argument('--url', required=True, help='Aggregator base URL, e.g. http://monitor:5000')
+    parser.add_argument('--host', help='Name to report as (default: hostname)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='Seconds between reports')
+    parser.add_argument('--token', default=os.environ.get('FLEET_TOKEN'), help='Shared secret (default: $FLEET_TOKEN)')
+    parser.add_argument('--spool-dir', help='Where undelivered batches are kept (default: ~/.sysmon-agent/<host>)')
+    parser.add_argument('--max-spool-mb', type=float, default=MAX_SPOOL_BYTES / (1024 * 1024))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    agent = Agent(args.url, host=args.host, interval=args.interval, token=args.token,
+                  spool_dir=args.spool_dir, max_spool_bytes=int(args.max_spool_mb * 1024 * 1024))
+    signal.signal(signal.SIGTERM, lambda *_: agent.stop())
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        agent.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,37 @@
-from flask import Flask
+import atexit
+import threading
 
-app = Flask(__name__)
+_lock = threading.Lock()
 
-from app import views
\ No newline at end of file
+
+def _create_app():
+    global app, socketio
+    from flask import Flask
+    from flask_socketio import SocketIO
+
+    app = Flask(__name__)
+    # The metrics sampler pushes from a regular thread, so Socket.IO uses threads too
+    socketio = SocketIO(app, async_mode='threading')
+
+    from app import views, live
+    from .sampler import sampler
+    from .history import metric_store
+
+    # Alerts and history are fed by the sampler, so it runs from the start
+    # rather than from the first request that reads a snapshot
+    sampler.start()
+    # Run last to first: no more samples, then write the buffered ones and
+    # the unfinished minute and hour
+    atexit.register(metric_store.stop)
+    atexit.register(sampler.stop)
+
+
+def __getattr__(name):
+    # The web app is only built when something asks for it, so the fleet
+    # agent can import the collectors without loading Flask and the UI
+    if name in ('app', 'socketio'):
+        with _lock:
+            if 'app' not in globals():
+                _create_app()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
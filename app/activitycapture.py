@@ -0,0 +1,213 @@
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+import psutil
+from .proctable import process_table
+from .sampler import sampler
+# Registers the sampler plugin that refreshes the process table
+from . import processinfo  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 5.0
+# CPU percent a category's processes need between them for a sample to count as spent on it
+ACTIVE_CPU = 2.0
+# Finished intervals are written at least this often, or once this many are waiting
+FLUSH_INTERVAL = 300.0
+MAX_PENDING = 100
+
+# (category, executable name patterns). Matched against the process name
+# and then its command line; a pattern has to be a whole executable name
+# (optionally with a path, .exe or .app) so arguments like '--figma' or
+# '~/code/project' don't match.
+DEFAULT_RULES = (
+    ('Meetings', (r'zoom', r'zoom\.us', r'caphost', r'webex\w*', r'ciscowebex\w*', r'gotomeeting', r'jitsi\w*')),
+    ('Code', (r'code', r'code-oss', r'codium', r'cursor', r'pycharm\w*', r'idea\w*', r'webstorm\w*', r'goland\w*',
+              r'clion\w*', r'rider\w*', r'studio\w*', r'android-studio', r'n?vim', r'gvim', r'emacs\w*', r'sublime_text',
+              r'subl', r'zed', r'xcode', r'devenv', r'gdb', r'lldb', r'cargo', r'rustc', r'gcc', r'g\+\+', r'clang\+*',
+              r'javac', r'gradle\w*', r'mvn', r'pytest', r'jupyter\w*', r'git', r'lazygit')),
+    ('Messaging', (r'slack', r'discord', r'teams', r'ms-teams', r'telegram\w*', r'signal(?:-desktop)?',
+                   r'whatsapp', r'element(?:-desktop)?', r'mattermost\w*', r'skype\w*', r'wechat', r'zulip')),
+    ('Email', (r'thunderbird\w*', r'outlook', r'olk', r'mail', r'evolution', r'geary', r'mailspring', r'kmail')),
+    ('Design', (r'figma\w*', r'sketch', r'gimp[\w.-]*', r'inkscape', r'krita', r'blender', r'photoshop',
+                r'illustrator', r'affinity\w*', r'darktable', r'penpot')),
+    ('Documentation', (r'soffice\.bin', r'soffice', r'libreoffice\w*', r'winword', r'obsidian', r'notion\w*',
+                       r'typora', r'zotero', r'evince', r'okular', r'acrord32', r'acrobat', r'logseq', r'joplin')),
+    ('Task Management', (r'todoist', r'trello', r'things3?', r'asana', r'clickup', r'linear', r'jira\w*',
+                         r'taskwarrior')),
+    ('Productivity', (r'excel', r'powerpnt', r'onenote', r'keynote', r'numbers', r'pages', r'calculator',
+                      r'gnome-calculator')),
+)
+
+
+def _cmdline(pid):
+    try:
+        return ' '.join(psutil.Process(pid).cmdline())
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess, OSError):
+        return ''
+
+
+class ProcessClassifier:
+    """Maps processes to productivity categories with one combined regex.
+
+    Every rule is a named group of a single alternation, so classifying a
+    process is one regex search however many rules there are. Results are
+    kept per process (pid and start time), so a sample only classifies the
+    processes that started since the last one, and only those whose name
+    didn't match pay for reading their command line.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, cmdline=_cmdline):
+        self.categories = {}
+        groups = []
+        for index, (category, patterns) in enumerate(rules):
+            group = f'c{index}'
+            self.categories[group] = category
+            groups.append(f"(?P<{group}>{'|'.join(patterns)})")
+        self._pattern = re.compile(
+            r'(?:^|(?<=[\s/\\]))(?:' + '|'.join(groups) + r')(?:\.exe|\.app)?(?=$|\s)', re.IGNORECASE)
+        self._cmdline = cmdline
+        self._cache = {}  # (pid, create_time) -> category or None
+
+    def match(self, text):
+        """Category of the first executable name in text, or None."""
+        found = self._pattern.search(text)
+        return self.categories[found.lastgroup] if found else None
+
+    def classify(self, pid, create_time, name):
+        key = (pid, create_time)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        category = self.match(name)
+        if category is None:
+            category = self.match(self._cmdline(pid))
+        self._cache[key] = category
+        return category
+
+    def prune(self, snapshot):
+        """Forget processes that are gone, so the cache stays the size of the table."""
+        if len(self._cache) > 2 * len(snapshot) + 100:
+            live = set(zip(snapshot.pids, snapshot.create_time))
+            self._cache = {key: category for key, category in self._cache.items() if key in live}
+
+
+class ActivityCapture:
+    """Records what the machine is being used for as productivity activities.
+
+    Every `interval` seconds the latest process table snapshot (refreshed
+    by the sampler) is classified. The category whose processes use the
+    most CPU, at least ACTIVE_CPU percent between them, is what that sample
+    was spent on. Consecutive samples of one category are merged into a
+    single activity, and finished activities are written through the
+    tracker in batches rather than one write per sample.
+    """
+
+    def __init__(self, tracker, interval=DEFAULT_INTERVAL, classifier=None, flush_interval=FLUSH_INTERVAL):
+        self.tracker = tracker
+        self.interval = interval
+        self.classifier = classifier or ProcessClassifier()
+        self.flush_interval = flush_interval
+        self.current = None  # [category, first sample, last sample, busiest process name]
+        self.pending = []
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def sample(self, snapshot=None, now=None):
+        """Classify one process table snapshot, returns the category it counts for."""
+        snapshot = snapshot if snapshot is not None else process_table.snapshot()
+        now = time.time() if now is None else now
+        classify = self.classifier.classify
+        cpu = {}
+        busiest = {}
+        for pid, create_time, name, percent in zip(snapshot.pids, snapshot.create_time, snapshot.names,
+                                                   snapshot.cpu_percent):
+            if not percent:
+                # Idle processes can't make a category active, skip classifying them
+                continue
+            category = classify(pid, create_time, name)
+            if category is not None:
+                cpu[category] = cpu.get(category, 0.0) + percent
+                if percent > busiest.get(category, ('', 0.0))[1]:
+                    busiest[category] = (name, percent)
+        self.classifier.prune(snapshot)
+
+        category = max(cpu, key=cpu.get) if cpu else None
+        if category is not None and cpu[category] < ACTIVE_CPU:
+            category = None
+        with self._lock:
+            self._extend(category, now, busiest[category][0] if category else None)
+        return category
+
+    def _extend(self, category, now, name):
+        current = self.current
+        # A missed sample or two (a slow tick) doesn't split an activity
+        if current is not None and current[0] == category and now - current[2] <= 2.5 * self.interval:
+            current[2] = now
+            return
+        self._close()
+        if category is not None:
+            self.current = [category, now, now, name]
+
+    def _close(self):
+        if self.current is None:
+            return
+        category, first, last, name = self.current
+        self.current = None
+        # Each sample stands for the interval that follows it
+        self.pending.append({
+            "category": category,
+            "start_time": datetime.fromtimestamp(first),
+            "end_time": datetime.fromtimestamp(last + self.interval),
+            "description": f"Captured: {name}",
+        })
+
+    def flush(self, close=False):
+        """Write the finished activities (and the running one if close) in one batch."""
+        with self._lock:
+            if close:
+                self._close()
+            pending, self.pending = self.pending, []
+        self._flushed = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            self.tracker.add_activities(pending)
+        except Exception:
+            logger.exception('Writing captured activities failed')
+            with self._lock:
+                # Retried with the next flush, without growing forever
+                self.pending[:0] = pending[-MAX_PENDING * 10:]
+            return 0
+        return len(pending)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+                if len(self.pending) >= MAX_PENDING or time.monotonic() - self._flushed >= self.flush_interval:
+                    self.flush()
+            except Exception:
+                logger.exception('Activity capture sample failed')
+        self.flush(close=True)
+
+    def start(self):
+        # The process table is only refreshed while the sampler runs
+        sampler.start()
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-capture', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
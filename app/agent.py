@@ -0,0 +1,228 @@
+import gzip
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from .sampler import sampler
+from .systeminfo import HOST_FACTS
+from .processinfo import query_processes
+from .proctable import process_table
+
+logger = logging.getLogger(__name__)
+
+INGEST_PATH = '/api/fleet/ingest'
+DEFAULT_INTERVAL = 5.0
+# Reports sent in one request, and kept in memory before spilling to disk
+MAX_BATCH = 60
+# Spooled batches retried per flush once the aggregator is back
+SPOOL_BATCHES_PER_FLUSH = 10
+MAX_SPOOL_BYTES = 50 * 1024 * 1024
+MAX_BACKOFF = 300.0
+TOP_PROCESSES = 5
+
+
+def host_report(snapshot, host, processes=None):
+    """Compact per-host report built from one sampler snapshot."""
+    cpu = snapshot.get('cpu') or {}
+    memory = snapshot.get('memory') or {}
+    disks = snapshot.get('disks') or {'partitions': []}
+    partitions = [{
+        'mountpoint': partition['mountpoint'],
+        'percent': partition['percent'],
+        'total': partition['total'],
+        'used': partition['used'],
+    } for partition in disks['partitions']]
+
+    sent = recv = 0.0
+    for name, interface in (snapshot.get('network') or {}).items():
+        rates = interface['rates']
+        if name.startswith('lo') or not rates:
+            continue
+        sent += rates['bytes_sent']['current'] or 0.0
+        recv += rates['bytes_recv']['current'] or 0.0
+
+    report = {
+        'host': host,
+        'timestamp': snapshot.timestamp,
+        'uptime': snapshot.timestamp - HOST_FACTS['boot_timestamp'],
+        'platform': {'system': HOST_FACTS['system'], 'release': HOST_FACTS['release']},
+        'cpu': {'percent': cpu.get('percent'), 'count': cpu.get('count')},
+        'memory': {key: memory.get(key) for key in ('percent', 'total', 'used', 'available', 'swap_percent')},
+        'disks': partitions,
+        # The fullest mount is what runs out first
+        'disk_percent': max((partition['percent'] for partition in partitions), default=None),
+        'network': {'bytes_sent_per_sec': sent, 'bytes_recv_per_sec': recv},
+        'processes': {'count': snapshot.get('process_count')},
+    }
+    if processes is not None:
+        rows, _ = query_processes(processes, limit=TOP_PROCESSES)
+        report['processes']['top'] = [
+            {key: row[key] for key in ('pid', 'name', 'cpu_percent', 'memory_percent')} for row in rows
+        ]
+    return report
+
+
+class Spool:
+    """Batches that couldn't be delivered, one gzip file each, oldest first.
+
+    Bounded by `max_bytes`: the oldest batches are dropped to make room,
+    so a long outage loses the start of the gap rather than filling the disk.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_SPOOL_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def files(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.json.gz'))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def put(self, body):
+        self._sequence += 1
+        name = f'{time.time_ns():020d}-{self._sequence:06d}.json.gz'
+        path = os.path.join(self.directory, name)
+        # Written under a temporary name so a crash never leaves half a batch to send
+        with open(path + '.tmp', 'wb') as f:
+            f.write(body)
+        os.replace(path + '.tmp', path)
+        self._trim()
+
+    def _trim(self):
+        files = [(path, os.path.getsize(path)) for path in self.files()]
+        total = sum(size for _, size in files)
+        for path, size in files:
+            if total <= self.max_bytes:
+                break
+            logger.warning('Spool full, dropping %s', os.path.basename(path))
+            os.remove(path)
+            total -= size
+
+    def __len__(self):
+        return len(self.files())
+
+
+class Agent:
+    """Pushes host reports to an aggregator's /api/fleet/ingest.
+
+    A report is taken from the sampler every `interval` seconds and sent
+    with anything still pending as one gzip JSON batch. When the aggregator
+    is down or answers 429/503 the agent backs off exponentially (honouring
+    Retry-After), keeps collecting, and spills batches to the spool once
+    MAX_BATCH reports are waiting. Spooled batches are sent oldest first
+    once pushes succeed again.
+    """
+
+    def __init__(self, url, host=None, interval=DEFAULT_INTERVAL, token=None, spool_dir=None,
+                 max_spool_bytes=MAX_SPOOL_BYTES, timeout=10.0):
+        self.url = url.rstrip('/') + INGEST_PATH
+        self.host = host or socket.gethostname()
+        self.interval = interval
+        self.token = token
+        self.timeout = timeout
+        spool_dir = spool_dir or os.path.join(os.path.expanduser('~'), '.sysmon-agent', self.host)
+        self.spool = Spool(spool_dir, max_spool_bytes)
+        self.pending = []
+        self.sent = 0
+        self.failures = 0
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+
+    def collect(self):
+        snapshot = sampler.snapshot()
+        self.pending.append(host_report(snapshot, self.host, process_table.snapshot()))
+
+    def _post(self, body):
+        """(delivered, retry) for one gzip batch, retry is False when it must be dropped."""
+        request = urllib.request.Request(self.url, data=body, method='POST', headers={
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+        })
+        if self.token:
+            request.add_header('Authorization', f'Bearer {self.token}')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            return True, False
+        except urllib.error.HTTPError as e:
+            if e.code in (429, 503):
+                retry_after = e.headers.get('Retry-After')
+                self._back_off(float(retry_after) if retry_after and retry_after.isdigit() else None)
+                return False, True
+            if 400 <= e.code < 500 and e.code not in (401, 403, 408):
+                # The aggregator will never accept this batch, retrying would block the queue
+                logger.error('Aggregator rejected a batch (%s), dropping it', e.code)
+                return False, False
+            logger.warning('Push failed: HTTP %s', e.code)
+        except (urllib.error.URLError, OSError) as e:
+            logger.warning('Push failed: %s', getattr(e, 'reason', e))
+        self._back_off()
+        return False, True
+
+    def _back_off(self, retry_after=None):
+        self.failures += 1
+        self._backoff = min(MAX_BACKOFF, max(self.interval, self._backoff * 2))
+        delay = retry_after if retry_after is not None else self._backoff
+        # Jitter so agents that lost the aggregator together don't return together
+        self._retry_at = time.monotonic() + delay * random.uniform(0.8, 1.2)
+
+    def flush(self):
+        """Send spooled batches, then pending reports. Returns True if all went out."""
+        if time.monotonic() < self._retry_at:
+            if len(self.pending) >= MAX_BATCH:
+                self._spill()
+            return False
+
+        for path in self.spool.files()[:SPOOL_BATCHES_PER_FLUSH]:
+            with open(path, 'rb') as f:
+                delivered, retry = self._post(f.read())
+            if not delivered and retry:
+                self._spill_if_full()
+                return False
+            os.remove(path)
+            self._backoff = 0.0
+
+        while self.pending:
+            batch = self.pending[:MAX_BATCH]
+            delivered, retry = self._post(gzip.compress(json.dumps({'reports': batch}).encode('utf-8')))
+            if not delivered and retry:
+                self._spill_if_full()
+                return False
+            del self.pending[:len(batch)]
+            if delivered:
+                self.sent += len(batch)
+                self._backoff = 0.0
+        return not len(self.spool)
+
+    def _spill_if_full(self):
+        if len(self.pending) >= MAX_BATCH:
+            self._spill()
+
+    def _spill(self):
+        batch = self.pending[:MAX_BATCH]
+        self.spool.put(gzip.compress(json.dumps({'reports': batch}).encode('utf-8')))
+        del self.pending[:len(batch)]
+
+    def run(self):
+        logger.info('Reporting as %s to %s every %ss', self.host, self.url, self.interval)
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.collect()
+                self.flush()
+            except Exception:
+                logger.exception('Agent cycle failed')
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        # Whatever couldn't be sent survives a restart
+        while self.pending:
+            self._spill()
+
+    def stop(self):
+        self._stop.set()
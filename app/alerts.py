@@ -0,0 +1,484 @@
+import json
+import logging
+import operator
+import os
+import queue
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from .sampler import sampler
+from .proctable import process_table
+from .logcatalog import APP_LOG_DIR
+# Registers the sampler plugins whose data rules read
+from . import systeminfo, processinfo  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+RULES_PATH = os.environ.get('ALERT_RULES', os.path.join(os.path.dirname(__file__), 'data', 'alerts.rules'))
+LOG_PATH = os.path.join(APP_LOG_DIR, 'alerts.log')
+# A firing alert resolves once its condition has been clear for this long
+RESOLVE_AFTER = 10.0
+RECENT_EVENTS = 200
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Shorthands for the usual suspects, e.g. cpu_percent > 90
+ALIASES = {
+    'cpu_percent': ('cpu', 'percent'),
+    'memory_percent': ('memory', 'percent'),
+    'swap_percent': ('memory', 'swap_percent'),
+    'process_count': ('process_count',),
+    'battery_percent': ('battery', 'percent'),
+}
+# Path prefixes as written in rules -> snapshot sections
+SECTIONS = {'net': 'network', 'network': 'network', 'disk_io': 'disk_io', 'cpu': 'cpu',
+            'memory': 'memory', 'battery': 'battery', 'process_count': 'process_count'}
+# Fields that add up two counters
+COMBINED = {
+    'errors': ('errin', 'errout'),
+    'drops': ('dropin', 'dropout'),
+}
+
+NUMBER = r'-?\d+(?:\.\d+)?'
+DURATION = r'\d+(?:\.\d+)?\s*(?:ms|s|m|h)?'
+RULE = re.compile(
+    rf'^(?P<expr>.+?)\s*(?P<op>>=|<=|==|!=|>|<)\s*(?P<threshold>{NUMBER})'
+    rf'(?:\s+for\s+(?P<hold>{DURATION}))?(?:\s+clear\s+(?P<clear>{NUMBER}))?$')
+PROCESS_RULE = re.compile(
+    rf'''^process\s+(?P<quote>['"])(?P<name>.+?)(?P=quote)\s+missing(?:\s+for\s+(?P<hold>{DURATION}))?$''')
+RATE = re.compile(r'^rate\(\s*(?P<path>.+?)\s*\)$')
+PATH_TOKEN = re.compile(r'''\[\s*(['"])(?P<key>.*?)\1\s*\]|\.?(?P<name>[A-Za-z_][\w-]*)''')
+
+
+def parse_duration(text):
+    """Seconds in '90', '90s', '2m', '1.5h' or '500ms'."""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*(ms|s|m|h)?', text.strip())
+    if not match:
+        raise ValueError(f"Invalid duration '{text}'")
+    value, unit = match.groups()
+    return float(value) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, None: 1}[unit]
+
+
+def _path(text):
+    keys = []
+    pos = 0
+    while pos < len(text):
+        match = PATH_TOKEN.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Invalid metric '{text}'")
+        keys.append(match.group('key') if match.group('key') is not None else match.group('name'))
+        pos = match.end()
+    return keys
+
+
+def compile_metric(text):
+    """(key, read) for a metric: `read(tick)` returns its current value or None.
+
+    The key is the parsed path, so `net.eth0.errors` and `net['eth0'].errors`
+    are one metric, read once per tick whatever the number of rules on it.
+    """
+    keys = _path(text)
+    if len(keys) == 1 and keys[0] in ALIASES:
+        keys = list(ALIASES[keys[0]])
+
+    if keys[0] == 'disk':
+        # disk['/'].percent: a partition by mount point
+        if len(keys) != 3:
+            raise ValueError(f"Expected disk['<mount>'].<field>, got '{text}'")
+        _, mount, field = keys
+
+        def read_disk(tick):
+            partition = tick.mounts().get(mount)
+            return partition.get(field) if partition is not None else None
+        return tuple(keys), read_disk
+
+    section = SECTIONS.get(keys[0])
+    if section is None:
+        raise ValueError(f"Unknown metric '{text}'")
+    keys = (section,) + tuple(keys[1:])
+    *parents, last = keys
+    combined = COMBINED.get(last)
+
+    def read(tick):
+        value = tick.snapshot.data
+        for key in parents:
+            value = value.get(key)
+            if value is None:
+                return None
+        if combined is not None and last not in value:
+            return value.get(combined[0], 0) + value.get(combined[1], 0)
+        return value.get(last)
+    return keys, read
+
+
+class _Tick:
+    """One sampler snapshot plus lookups shared by every metric in a pass."""
+
+    __slots__ = ('snapshot', 'engine', '_mounts', '_names')
+
+    def __init__(self, snapshot, engine):
+        self.snapshot = snapshot
+        self.engine = engine
+        self._mounts = None
+        self._names = None
+
+    def mounts(self):
+        if self._mounts is None:
+            disks = self.snapshot.get('disks') or {'partitions': []}
+            self._mounts = {partition['mountpoint']: partition for partition in disks['partitions']}
+        return self._mounts
+
+    def process_names(self):
+        if self._names is None:
+            self._names = self.engine.process_names()
+        return self._names
+
+
+class _Metric:
+    """A value read once per tick and shared by every rule on it."""
+
+    __slots__ = ('read', 'is_rate', 'rules', 'value', 'previous', 'idle')
+
+    def __init__(self, read, is_rate):
+        self.read = read
+        self.is_rate = is_rate
+        self.rules = []
+        self.value = None
+        self.previous = None  # (counter, timestamp) for rate()
+        # True while every rule on it is 'ok', see AlertEngine.evaluate
+        self.idle = False
+
+    def sample(self, tick):
+        value = self.read(tick)
+        if not self.is_rate:
+            return value
+        timestamp = tick.snapshot.timestamp
+        previous = self.previous
+        self.previous = (value, timestamp)
+        if previous is None or value is None or timestamp <= previous[1]:
+            return None
+        delta = value - previous[0]
+        # A counter that went backwards was reset, skip that interval
+        return delta / (timestamp - previous[1]) if delta >= 0 else None
+
+
+def parse_rule(text):
+    """(metric key, read, is_rate, op, threshold, hold, clear) for a rule."""
+    match = PROCESS_RULE.match(text)
+    if match:
+        process = match.group('name')
+        read = lambda tick: 1 if process in tick.process_names() else 0
+        op, threshold, clear = '==', 0.0, None
+        key, is_rate = ('process', process), False
+    else:
+        match = RULE.match(text)
+        if not match:
+            raise ValueError(f"Can't parse rule '{text}'")
+        expr = match.group('expr').strip()
+        rate = RATE.match(expr)
+        is_rate = rate is not None
+        key, read = compile_metric(rate.group('path') if is_rate else expr)
+        op = match.group('op')
+        threshold = float(match.group('threshold'))
+        clear = float(match.group('clear')) if match.group('clear') is not None else None
+    hold = parse_duration(match.group('hold')) if match.group('hold') else 0.0
+    return (('rate',) + key if is_rate else key), read, is_rate, op, threshold, hold, clear
+
+
+class Rule:
+    """One alert rule and its evaluation state.
+
+    States go ok -> pending (condition true, waiting out `hold`) -> firing
+    -> ok again once the condition has been clear for RESOLVE_AFTER
+    seconds. With a `clear` threshold a firing rule only counts as clear
+    past that value, so a metric hovering around the threshold doesn't
+    flap. Each evaluation is a couple of comparisons.
+    """
+
+    __slots__ = ('id', 'name', 'text', 'metric', 'op', 'compare', 'threshold', 'clear', 'hold',
+                 'state', 'since', 'cleared_since', 'fired_at')
+
+    def __init__(self, id, text, metric, op, threshold, hold=0.0, clear=None, name=None):
+        self.id = id
+        self.text = text
+        self.name = name or text
+        self.metric = metric
+        self.op = op
+        self.compare = OPERATORS[op]
+        self.threshold = threshold
+        self.hold = hold
+        self.clear = clear
+        self.state = 'ok'
+        self.since = None
+        self.cleared_since = None
+        self.fired_at = None
+
+    def evaluate(self, value, now):
+        """Advance the state machine, returns 'firing', 'resolved' or None."""
+        if self.state == 'firing':
+            active = self.compare(value, self.threshold if self.clear is None else self.clear)
+            if active:
+                self.cleared_since = None
+                return None
+            if self.cleared_since is None:
+                self.cleared_since = now
+            if now - self.cleared_since < RESOLVE_AFTER:
+                return None
+            self.state = 'ok'
+            self.since = self.cleared_since = None
+            return 'resolved'
+
+        if not self.compare(value, self.threshold):
+            self.state = 'ok'
+            self.since = None
+            return None
+        if self.state == 'ok':
+            self.state = 'pending'
+            self.since = now
+        if now - self.since >= self.hold:
+            self.state = 'firing'
+            self.fired_at = now
+            self.cleared_since = None
+            return 'firing'
+        return None
+
+    def to_dict(self):
+        # Seconds pending/firing rather than monotonic timestamps
+        now = time.monotonic()
+        return {
+            'id': self.id,
+            'name': self.name,
+            'rule': self.text,
+            'state': self.state,
+            'value': self.metric.value,
+            'active_for': round(now - self.since, 1) if self.since is not None else None,
+            'firing_for': round(now - self.fired_at, 1) if self.state == 'firing' else None,
+        }
+
+
+class LogSink:
+    """Appends events as JSON lines, e.g. to logs/alerts.log (shown on /logs)."""
+
+    def __init__(self, path=LOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, open(self.path, 'a') as f:
+            f.write(json.dumps(event) + '\n')
+
+
+class WebhookSink:
+    """POSTs events as JSON from its own thread, so a slow endpoint never delays a tick."""
+
+    def __init__(self, url, timeout=5.0, retries=3):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self._queue = queue.Queue(maxsize=1000)
+        threading.Thread(target=self._run, name='alert-webhook', daemon=True).start()
+
+    def __call__(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            logger.warning('Alert webhook queue full, dropping event %s', event['id'])
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            body = json.dumps(event).encode('utf-8')
+            for attempt in range(self.retries):
+                try:
+                    request = urllib.request.Request(self.url, data=body, method='POST',
+                                                     headers={'Content-Type': 'application/json'})
+                    with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                        response.read()
+                    break
+                except OSError as e:
+                    logger.warning('Alert webhook failed (%s), attempt %d', e, attempt + 1)
+                    time.sleep(2 ** attempt)
+
+
+class AlertEngine:
+    """Evaluates every rule on each sampler tick and fans events out to sinks.
+
+    Rules are grouped by metric. A metric whose value didn't change while
+    all its rules are 'ok' is skipped outright: with the same value an 'ok'
+    rule can only stay 'ok'. Only state changes produce events (one
+    'firing', one 'resolved'), so a condition that stays true is reported
+    once however many ticks it lasts.
+    """
+
+    def __init__(self, path=RULES_PATH):
+        self.path = path
+        self._rules = {}
+        self._metrics = {}
+        self._next_id = 1
+        self._sinks = []
+        self._events = deque(maxlen=RECENT_EVENTS)
+        self._event_id = 0
+        self._lock = threading.Lock()
+        self._names = (None, frozenset())  # (process table version, names)
+        self.last_duration = 0.0
+
+    def add_sink(self, sink):
+        self._sinks.append(sink)
+        return sink
+
+    def add_rule(self, text, name=None):
+        """Parse and add a rule, raises ValueError if it doesn't parse."""
+        # Both end up on one 'name: rule' line of the rules file
+        if name is not None:
+            if not isinstance(name, str) or ': ' in name or '\n' in name or '\r' in name:
+                raise ValueError("A rule name is a single line of text without ': '")
+            name = name.strip() or None
+        if '\n' in text or '\r' in text:
+            raise ValueError('A rule is a single line')
+        text = text.strip()
+        key, read, is_rate, op, threshold, hold, clear = parse_rule(text)
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = _Metric(read, is_rate)
+            rule = Rule(str(self._next_id), text, metric, op, threshold, hold, clear, name)
+            self._next_id += 1
+            self._rules[rule.id] = rule
+            metric.rules.append(rule)
+            # The new rule hasn't seen the current value yet
+            metric.idle = False
+        return rule
+
+    def remove_rule(self, rule_id):
+        with self._lock:
+            rule = self._rules.pop(rule_id, None)
+            if rule is None:
+                return False
+            rule.metric.rules.remove(rule)
+            if not rule.metric.rules:
+                self._metrics = {key: metric for key, metric in self._metrics.items() if metric.rules}
+        return True
+
+    def load(self):
+        """Rules from the rules file: one per line, optionally 'name: rule', # comments."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                name, separator, text = line.partition(': ')
+                if not separator:
+                    name, text = None, line
+                try:
+                    self.add_rule(text, name)
+                except ValueError as e:
+                    try:
+                        if name is None:
+                            raise
+                        # An unnamed rule with ': ' in it, e.g. a process name
+                        self.add_rule(line)
+                    except ValueError:
+                        logger.error('Skipping alert rule: %s', e)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            lines = [rule.text if rule.name == rule.text else f'{rule.name}: {rule.text}'
+                     for rule in self._rules.values()]
+        with open(self.path + '.tmp', 'w') as f:
+            f.write(''.join(line + '\n' for line in lines))
+        os.replace(self.path + '.tmp', self.path)
+
+    def process_names(self):
+        # Rebuilt only when the process table changed
+        snapshot = process_table.snapshot()
+        version, names = self._names
+        if version != snapshot.version:
+            names = frozenset(snapshot.names)
+            self._names = (snapshot.version, names)
+        return names
+
+    def evaluate(self, snapshot, now=None):
+        """Run every rule against one snapshot, returns the events raised."""
+        started = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        tick = _Tick(snapshot, self)
+        events = []
+        with self._lock:
+            for metric in self._metrics.values():
+                try:
+                    value = metric.sample(tick)
+                    if value is None:
+                        # No data (device gone, first rate sample): rules keep their state
+                        continue
+                    if metric.idle and value == metric.value:
+                        continue
+                    metric.value = value
+                    idle = True
+                    for rule in metric.rules:
+                        transition = rule.evaluate(value, now)
+                        if transition is not None:
+                            events.append(self._event(rule, transition, snapshot.timestamp, now))
+                        if rule.state != 'ok':
+                            idle = False
+                    metric.idle = idle
+                except (TypeError, AttributeError):
+                    # The path points at something that isn't a number
+                    continue
+            self._events.extend(events)
+        self.last_duration = time.perf_counter() - started
+
+        for event in events:
+            for sink in self._sinks:
+                try:
+                    sink(event)
+                except Exception:
+                    logger.exception('Alert sink failed')
+        return events
+
+    def _event(self, rule, state, timestamp, now):
+        self._event_id += 1
+        event = {
+            'id': self._event_id,
+            'rule_id': rule.id,
+            'name': rule.name,
+            'rule': rule.text,
+            'state': state,
+            'value': rule.metric.value,
+            'timestamp': timestamp,
+        }
+        if state == 'resolved':
+            event['duration'] = round(now - rule.fired_at, 1)
+        return event
+
+    def rules(self):
+        with self._lock:
+            return [rule.to_dict() for rule in self._rules.values()]
+
+    def active(self):
+        with self._lock:
+            return [rule.to_dict() for rule in self._rules.values() if rule.state == 'firing']
+
+    def events(self, limit=50):
+        with self._lock:
+            return list(self._events)[-limit:][::-1]
+
+
+alert_engine = AlertEngine()
+alert_engine.load()
+alert_engine.add_sink(LogSink())
+if os.environ.get('ALERT_WEBHOOK_URL'):
+    alert_engine.add_sink(WebhookSink(os.environ['ALERT_WEBHOOK_URL']))
+sampler.subscribe(alert_engine.evaluate)
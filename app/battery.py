@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import deque
+
+
+class BatteryModel:
+    """Estimates battery drain from a ring buffer of recent samples.
+
+    psutil only reports charge in whole percent, so the rate is fitted with a
+    least-squares line over every discharging sample in the window instead of
+    diffing two readings a fraction of a second apart.
+    """
+
+    def __init__(self, window=600, max_samples=720, min_span=60):
+        self.window = window            # seconds of history used for the fit
+        self.min_span = min_span        # need at least this much history to answer
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def add_sample(self, percent, plugged, timestamp=None):
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self._lock:
+            self._samples.append((timestamp, float(percent), bool(plugged)))
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def _discharge_samples(self):
+        # Only the current discharge run counts, a plug event resets the fit
+        with self._lock:
+            samples = list(self._samples)
+        if not samples or samples[-1][2]:
+            return []
+        cutoff = samples[-1][0] - self.window
+        run = []
+        for timestamp, percent, plugged in reversed(samples):
+            if plugged or timestamp < cutoff:
+                break
+            run.append((timestamp, percent))
+        run.reverse()
+        return run
+
+    def discharge_rate(self):
+        """Percent per second lost while on battery, or None if unknown."""
+        run = self._discharge_samples()
+        if len(run) < 2 or run[-1][0] - run[0][0] < self.min_span:
+            return None
+
+        n = len(run)
+        mean_t = sum(t for t, _ in run) / n
+        mean_p = sum(p for _, p in run) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in run)
+        if var_t == 0:
+            return None
+        slope = sum((t - mean_t) * (p - mean_p) for t, p in run) / var_t
+
+        # A flat or rising line while unplugged tells us nothing useful
+        return -slope if slope < 0 else None
+
+    def time_remaining(self):
+        """Seconds until empty at the fitted rate, or None if unknown."""
+        run = self._discharge_samples()
+        rate = self.discharge_rate()
+        if not run or rate is None:
+            return None
+        return run[-1][1] / rate
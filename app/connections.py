@@ -0,0 +1,202 @@
+import ipaddress
+import socket
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+import psutil
+from .proctable import process_table
+
+# Entries returned for each aggregate breakdown
+TOP_N = 20
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Row layout of a collected connection
+TYPE, LOCAL_IP, LOCAL_PORT, REMOTE_IP, REMOTE_PORT, STATUS, PID = range(7)
+
+
+@lru_cache(maxsize=65536)
+def remote_network(ip):
+    """The /24 (IPv4) or /64 (IPv6) a remote address belongs to."""
+    if ip.startswith('::ffff:') and '.' in ip:
+        ip = ip[7:]
+    if '.' in ip:
+        return ip.rsplit('.', 1)[0] + '.0/24'
+    try:
+        return str(ipaddress.ip_network(f'{ip}/64', strict=False))
+    except ValueError:
+        return ip
+
+
+def _process_name(pid, names):
+    name = names.get(pid)
+    if name is None:
+        # Not in the process table yet, only ever done for the top TOP_N pids
+        try:
+            name = psutil.Process(pid).name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+    return name
+
+
+def connection_row(row):
+    return {
+        'type': row[TYPE],
+        'laddr': [row[LOCAL_IP], row[LOCAL_PORT]] if row[LOCAL_IP] is not None else None,
+        'raddr': [row[REMOTE_IP], row[REMOTE_PORT]] if row[REMOTE_IP] is not None else None,
+        'status': row[STATUS],
+        'pid': row[PID]
+    }
+
+
+class ConnectionInventory:
+    """One scan of the socket table with its aggregates computed up front."""
+
+    __slots__ = ('version', 'timestamp', 'duration', 'rows', 'summary')
+
+    def __init__(self, version, timestamp, duration, rows):
+        self.version = version
+        self.timestamp = timestamp
+        self.duration = duration
+        self.rows = rows
+        self.summary = self._summarize()
+
+    def _summarize(self):
+        by_state = Counter()
+        by_port = Counter()
+        by_pid = Counter()
+        by_network = Counter()
+        for row in self.rows:
+            by_state[row[STATUS]] += 1
+            if row[LOCAL_PORT] is not None:
+                by_port[row[LOCAL_PORT]] += 1
+            if row[PID] is not None:
+                by_pid[row[PID]] += 1
+            if row[REMOTE_IP]:
+                by_network[remote_network(row[REMOTE_IP])] += 1
+
+        names = {}
+        if by_pid:
+            snapshot = process_table.snapshot()
+            names = dict(zip(snapshot.pids, snapshot.names))
+
+        return {
+            'version': self.version,
+            'timestamp': self.timestamp,
+            'scan_seconds': round(self.duration, 3),
+            'total': len(self.rows),
+            'by_state': dict(by_state.most_common()),
+            'by_local_port': [{'port': port, 'count': count} for port, count in by_port.most_common(TOP_N)],
+            'by_pid': [{'pid': pid, 'name': _process_name(pid, names), 'count': count}
+                       for pid, count in by_pid.most_common(TOP_N)],
+            'by_remote_network': [{'network': network, 'count': count}
+                                  for network, count in by_network.most_common(TOP_N)],
+        }
+
+    def query(self, offset=0, limit=DEFAULT_PAGE_SIZE, status=None, pid=None, port=None,
+              remote=None, type=None):
+        """(rows, matched) for one page of connections matching every given filter.
+
+        `port` matches the local or the remote port, `remote` is an address
+        prefix or a network as reported in by_remote_network.
+        """
+        rows = self.rows
+        if status:
+            status = status.upper()
+            rows = [row for row in rows if row[STATUS] == status]
+        if type:
+            type = type.upper()
+            rows = [row for row in rows if row[TYPE] == type]
+        if pid is not None:
+            rows = [row for row in rows if row[PID] == pid]
+        if port is not None:
+            rows = [row for row in rows if row[LOCAL_PORT] == port or row[REMOTE_PORT] == port]
+        if remote:
+            if '/' in remote:
+                rows = [row for row in rows if row[REMOTE_IP] and remote_network(row[REMOTE_IP]) == remote]
+            else:
+                rows = [row for row in rows if row[REMOTE_IP] and row[REMOTE_IP].startswith(remote)]
+        offset = max(0, offset)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        return [connection_row(row) for row in rows[offset:offset + limit]], len(rows)
+
+
+class ConnectionCollector:
+    """Scans psutil.net_connections() on its own thread every `interval` seconds.
+
+    The scan is the expensive part on busy hosts (100k+ sockets), so it runs
+    at most once per interval regardless of how many pages or API clients
+    are reading. Readers get the last finished ConnectionInventory.
+    """
+
+    def __init__(self, interval=5.0, kind='inet'):
+        self.interval = interval
+        self.kind = kind
+        self._inventory = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+
+    def collect(self):
+        started = time.monotonic()
+        rows = []
+        for conn in psutil.net_connections(kind=self.kind):
+            laddr = conn.laddr or None
+            raddr = conn.raddr or None
+            rows.append((
+                'TCP' if conn.type == socket.SOCK_STREAM else 'UDP',
+                laddr[0] if laddr else None,
+                laddr[1] if laddr else None,
+                raddr[0] if raddr else None,
+                raddr[1] if raddr else None,
+                conn.status,
+                conn.pid
+            ))
+        self._version += 1
+        inventory = ConnectionInventory(self._version, time.time(), time.monotonic() - started, rows)
+        with self._lock:
+            self._inventory = inventory
+        self._ready.set()
+        return inventory
+
+    def _run(self):
+        while True:
+            try:
+                self.collect()
+            except Exception:
+                # e.g. AccessDenied on macOS without root, keep serving the previous scan
+                pass
+            self._ready.set()
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='connections', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def inventory(self):
+        """Latest scan, waiting for the first one if needed."""
+        if self._thread is None:
+            self.start()
+        self._ready.wait()
+        inventory = self._inventory
+        if inventory is None:
+            # The first scan failed, serve an empty table rather than nothing
+            inventory = ConnectionInventory(0, time.time(), 0.0, [])
+        return inventory
+
+
+connection_collector = ConnectionCollector()
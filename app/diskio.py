@@ -0,0 +1,97 @@
+import os
+import re
+from .rates import RateRegistry, WINDOWS
+from .sampler import sampler
+
+DISK_FIELDS = ('read_count', 'write_count', 'read_bytes', 'write_bytes', 'read_time', 'write_time', 'busy_time')
+
+# Windows over which per-interval latencies are ranked, with the matching
+# moving average used to skip idle devices without walking their history
+LATENCY_WINDOWS = {'1m': ('avg_1m', 60), '5m': ('avg_5m', 300)}
+PERCENTILES = (50, 95, 99)
+
+# sda1 -> sda, nvme0n1p2 -> nvme0n1, mmcblk0p1 -> mmcblk0, disk1s1 -> disk1 (macOS)
+PARTITION_SUFFIX = re.compile(r'(?:(?<=\d)p\d+|(?<=[a-z])\d+|(?<=\d)s\d+)$')
+
+# 15 minutes of per-tick deltas for every block device
+disk_rates = RateRegistry(DISK_FIELDS, seconds=15 * 60, interval=sampler.interval)
+
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if denominator else None
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values.sort()
+    # Nearest rank
+    return {f'p{p}': values[min(len(values) - 1, max(0, -(-p * len(values) // 100) - 1))] for p in PERCENTILES}
+
+
+def _latencies(ring, window, time_field, count_field):
+    # Average service time (ms per operation) of every interval that had I/O
+    average, seconds = LATENCY_WINDOWS[window]
+    if not ring.average(count_field, average):
+        return []
+    return [time_delta / count_delta
+            for _, time_delta, count_delta in ring.recent(seconds, (time_field, count_field))
+            if count_delta]
+
+
+def disk_metrics(name, has_busy_time=True):
+    """Throughput, IOPS, service time and busy percent for one device.
+
+    Everything is derived from counter deltas: bytes/s and operations/s
+    over the latest interval and the 1/5/15 minute windows, average
+    service time as time spent / operations completed, and busy percent
+    from busy_time (Linux only, None elsewhere). Latency percentiles rank
+    the per-interval service times in each window, so short spikes that
+    averages hide still show up in p95/p99.
+    """
+    ring = disk_rates.get(name)
+    if ring is None or ring.current('read_count') is None:
+        return None
+
+    def rates(window=None):
+        rate = ring.current if window is None else (lambda field: ring.average(field, window))
+        busy = rate('busy_time')
+        return {
+            'read_bytes_per_sec': rate('read_bytes'),
+            'write_bytes_per_sec': rate('write_bytes'),
+            'read_iops': rate('read_count'),
+            'write_iops': rate('write_count'),
+            # ms of I/O time per ms of wall time is the same ratio as per second
+            'read_latency_ms': _ratio(rate('read_time'), rate('read_count')),
+            'write_latency_ms': _ratio(rate('write_time'), rate('write_count')),
+            'busy_percent': min(100.0, busy / 10) if has_busy_time and busy is not None else None,
+        }
+
+    metrics = rates()
+    metrics['averages'] = {window: rates(window) for window in WINDOWS}
+    metrics['latency_percentiles'] = {
+        window: {
+            'read': _percentiles(_latencies(ring, window, 'read_time', 'read_count')),
+            'write': _percentiles(_latencies(ring, window, 'write_time', 'write_count')),
+        }
+        for window in LATENCY_WINDOWS
+    }
+    return metrics
+
+
+def block_device(device, devices):
+    """Name in disk_io_counters() that a partition's device node belongs to.
+
+    Prefers the partition itself (Linux reports partitions too), then its
+    parent disk. /dev/mapper and /dev/disk/by-* symlinks are resolved first.
+    Returns None when nothing matches (e.g. network or Windows drive letters).
+    """
+    if not device:
+        return None
+    name = os.path.basename(os.path.realpath(device))
+    if name in devices:
+        return name
+    parent = PARTITION_SUFFIX.sub('', name)
+    if parent != name and parent in devices:
+        return parent
+    return None
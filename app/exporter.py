@@ -0,0 +1,228 @@
+import math
+from .processinfo import query_processes, status_histogram
+from .systeminfo import HOST_FACTS
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'sysmon_'
+MAX_TOP_PROCESSES = 100
+# Rendered series prefixes kept between scrapes, dropped wholesale past this
+# (process top-N labels churn)
+MAX_SERIES = 50000
+
+# name -> (type, help), in exposition order
+FAMILIES = {
+    'host_info': ('gauge', 'Host platform facts, always 1.'),
+    'boot_time_seconds': ('gauge', 'System boot time in seconds since the epoch.'),
+    'cpu_usage_percent': ('gauge', 'CPU usage since the previous sample.'),
+    'cpu_count': ('gauge', 'Number of logical CPUs.'),
+    'memory_bytes': ('gauge', 'Physical memory by state.'),
+    'memory_usage_percent': ('gauge', 'Physical memory in use.'),
+    'swap_bytes': ('gauge', 'Swap space by state.'),
+    'swap_usage_percent': ('gauge', 'Swap space in use.'),
+    'filesystem_size_bytes': ('gauge', 'Filesystem size per mount.'),
+    'filesystem_used_bytes': ('gauge', 'Filesystem space used per mount.'),
+    'filesystem_free_bytes': ('gauge', 'Filesystem space free per mount.'),
+    'filesystem_usage_percent': ('gauge', 'Filesystem space used per mount.'),
+    'disk_reads_completed_total': ('counter', 'Reads completed per disk.'),
+    'disk_writes_completed_total': ('counter', 'Writes completed per disk.'),
+    'disk_read_bytes_total': ('counter', 'Bytes read per disk.'),
+    'disk_written_bytes_total': ('counter', 'Bytes written per disk.'),
+    'disk_read_time_seconds_total': ('counter', 'Time spent reading per disk.'),
+    'disk_write_time_seconds_total': ('counter', 'Time spent writing per disk.'),
+    'disk_io_time_seconds_total': ('counter', 'Time spent doing I/O per disk (Linux only).'),
+    'network_receive_bytes_total': ('counter', 'Bytes received per interface.'),
+    'network_transmit_bytes_total': ('counter', 'Bytes sent per interface.'),
+    'network_receive_packets_total': ('counter', 'Packets received per interface.'),
+    'network_transmit_packets_total': ('counter', 'Packets sent per interface.'),
+    'network_receive_errors_total': ('counter', 'Receive errors per interface.'),
+    'network_transmit_errors_total': ('counter', 'Transmit errors per interface.'),
+    'network_receive_drop_total': ('counter', 'Incoming packets dropped per interface.'),
+    'network_transmit_drop_total': ('counter', 'Outgoing packets dropped per interface.'),
+    'network_up': ('gauge', 'Whether the interface is up.'),
+    'network_speed_bytes': ('gauge', 'Link speed in bytes per second, 0 when unknown.'),
+    'processes': ('gauge', 'Processes by status.'),
+    'processes_total': ('gauge', 'Number of processes.'),
+    'process_cpu_percent': ('gauge', 'CPU usage of the busiest processes.'),
+    'process_memory_percent': ('gauge', 'Memory usage of the busiest processes.'),
+    'process_threads': ('gauge', 'Threads of the busiest processes.'),
+    'battery_percent': ('gauge', 'Battery charge.'),
+    'battery_power_plugged': ('gauge', 'Whether the battery is on AC power.'),
+}
+
+HEADERS = {
+    name: f'# HELP {PREFIX}{name} {help}\n# TYPE {PREFIX}{name} {type}'
+    for name, (type, help) in FAMILIES.items()
+}
+
+# (name, label names, label values) -> 'prefix_name{label="value",...} '
+_series = {}
+
+# Network counters: family -> psutil field
+NET_COUNTERS = (
+    ('network_receive_bytes_total', 'bytes_recv'),
+    ('network_transmit_bytes_total', 'bytes_sent'),
+    ('network_receive_packets_total', 'packets_recv'),
+    ('network_transmit_packets_total', 'packets_sent'),
+    ('network_receive_errors_total', 'errin'),
+    ('network_transmit_errors_total', 'errout'),
+    ('network_receive_drop_total', 'dropin'),
+    ('network_transmit_drop_total', 'dropout'),
+)
+
+# Disk counters: family -> (psutil field, scale to base units)
+DISK_COUNTERS = (
+    ('disk_reads_completed_total', 'read_count', None),
+    ('disk_writes_completed_total', 'write_count', None),
+    ('disk_read_bytes_total', 'read_bytes', None),
+    ('disk_written_bytes_total', 'write_bytes', None),
+    ('disk_read_time_seconds_total', 'read_time', 0.001),
+    ('disk_write_time_seconds_total', 'write_time', 0.001),
+    ('disk_io_time_seconds_total', 'busy_time', 0.001),
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def series(name, labels=(), values=()):
+    """Rendered 'name{labels} ' prefix of one series, cached across scrapes."""
+    key = (name, labels, values)
+    rendered = _series.get(key)
+    if rendered is None:
+        if len(_series) >= MAX_SERIES:
+            _series.clear()
+        if labels:
+            pairs = ','.join(f'{label}="{_escape(value)}"' for label, value in zip(labels, values))
+            rendered = f'{PREFIX}{name}{{{pairs}}} '
+        else:
+            rendered = f'{PREFIX}{name} '
+        _series[key] = rendered
+    return rendered
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(int(value))
+
+
+class _Writer:
+    __slots__ = ('lines',)
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name):
+        self.lines.append(HEADERS[name])
+
+    def sample(self, name, value, labels=(), values=()):
+        if value is not None:
+            self.lines.append(series(name, labels, values) + _number(value))
+
+    def render(self):
+        self.lines.append('')
+        return '\n'.join(self.lines).encode('utf-8')
+
+
+def render_metrics(snapshot, processes=None, top=0):
+    """Prometheus text for a sampler snapshot and a process table snapshot.
+
+    Everything comes from data the sampler already collected: raw byte and
+    counter values, no formatting or psutil calls. With `top`, per-process
+    series are added for the `top` busiest processes by CPU.
+    """
+    out = _Writer()
+
+    out.family('host_info')
+    out.sample('host_info', 1, ('node', 'system', 'release', 'machine'),
+               (HOST_FACTS['node'], HOST_FACTS['system'], HOST_FACTS['release'], HOST_FACTS['machine']))
+    out.family('boot_time_seconds')
+    out.sample('boot_time_seconds', HOST_FACTS['boot_timestamp'])
+
+    cpu = snapshot.get('cpu')
+    if cpu:
+        out.family('cpu_usage_percent')
+        out.sample('cpu_usage_percent', cpu['percent'])
+        out.family('cpu_count')
+        out.sample('cpu_count', cpu['count'])
+
+    memory = snapshot.get('memory')
+    if memory:
+        out.family('memory_bytes')
+        for state in ('total', 'available', 'used', 'free'):
+            out.sample('memory_bytes', memory[state], ('state',), (state,))
+        out.family('memory_usage_percent')
+        out.sample('memory_usage_percent', memory['percent'])
+        out.family('swap_bytes')
+        for state in ('total', 'used', 'free'):
+            out.sample('swap_bytes', memory['swap_' + state], ('state',), (state,))
+        out.family('swap_usage_percent')
+        out.sample('swap_usage_percent', memory['swap_percent'])
+
+    disks = snapshot.get('disks')
+    if disks:
+        partitions = disks['partitions']
+        for name, field in (('filesystem_size_bytes', 'total'), ('filesystem_used_bytes', 'used'),
+                            ('filesystem_free_bytes', 'free'), ('filesystem_usage_percent', 'percent')):
+            out.family(name)
+            for partition in partitions:
+                out.sample(name, partition[field], ('device', 'mountpoint'),
+                           (partition['device'], partition['mountpoint']))
+
+    disk_io = snapshot.get('disk_io')
+    if disk_io:
+        for name, field, scale in DISK_COUNTERS:
+            out.family(name)
+            for device, counters in disk_io.items():
+                value = counters.get(field)
+                if value is not None and scale:
+                    value *= scale
+                out.sample(name, value, ('device',), (device,))
+
+    network = snapshot.get('network')
+    if network:
+        interfaces = [(name, data) for name, data in network.items() if data['has_counters']]
+        for name, field in NET_COUNTERS:
+            out.family(name)
+            for interface, data in interfaces:
+                out.sample(name, data[field], ('interface',), (interface,))
+        out.family('network_up')
+        for interface, data in network.items():
+            out.sample('network_up', int(data['isup']), ('interface',), (interface,))
+        out.family('network_speed_bytes')
+        for interface, data in network.items():
+            # Mbit/s to bytes/s
+            out.sample('network_speed_bytes', data['speed'] * 125000, ('interface',), (interface,))
+
+    if processes is not None:
+        stats = status_histogram(processes)
+        total = stats.pop('total')
+        out.family('processes')
+        for status, count in stats.items():
+            out.sample('processes', count, ('status',), (status,))
+        out.family('processes_total')
+        out.sample('processes_total', total)
+
+        if top:
+            rows, _ = query_processes(processes, limit=min(top, MAX_TOP_PROCESSES))
+            labels = ('pid', 'name', 'user')
+            for name, field in (('process_cpu_percent', 'cpu_percent'), ('process_memory_percent', 'memory_percent'),
+                                ('process_threads', 'num_threads')):
+                out.family(name)
+                for row in rows:
+                    out.sample(name, row[field], labels, (row['pid'], row['name'], row['username'] or ''))
+
+    battery = snapshot.get('battery')
+    if battery and battery['present']:
+        out.family('battery_percent')
+        out.sample('battery_percent', battery['percent'])
+        out.family('battery_power_plugged')
+        out.sample('battery_power_plugged', int(bool(battery['power_plugged'])))
+
+    return out.render()
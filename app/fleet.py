@@ -0,0 +1,198 @@
+import bisect
+import heapq
+import json
+import threading
+import time
+import zlib
+
+# Hosts that haven't reported for this long are flagged as stale
+STALE_AFTER = 30.0
+# Points of (timestamp, cpu, memory, disk) kept per host, an hour at 5s
+HISTORY_POINTS = 720
+TOP_N = 10
+# Limits on one pushed batch, after decompression
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+MAX_REPORTS = 1000
+MAX_HOST_LENGTH = 255
+# Concurrent ingest requests before agents are told to back off
+MAX_CONCURRENT_INGESTS = 8
+RETRY_AFTER = 5
+
+
+def decode_batch(body, encoding=None):
+    """Reports from a pushed request body, gzip or plain JSON.
+
+    The body is {"reports": [...]} or a bare list. Raises ValueError for
+    anything malformed or over MAX_BATCH_BYTES once decompressed.
+    """
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            body = decompressor.decompress(body, MAX_BATCH_BYTES)
+        except zlib.error as e:
+            raise ValueError(f'Invalid gzip body: {e}')
+        if decompressor.unconsumed_tail:
+            raise ValueError('Batch too large')
+    elif encoding not in (None, '', 'identity'):
+        raise ValueError(f'Unsupported Content-Encoding: {encoding}')
+    elif len(body) > MAX_BATCH_BYTES:
+        raise ValueError('Batch too large')
+
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise ValueError(f'Invalid JSON: {e}')
+    reports = payload.get('reports') if isinstance(payload, dict) else payload
+    if not isinstance(reports, list):
+        raise ValueError('Expected a list of reports')
+    if len(reports) > MAX_REPORTS:
+        raise ValueError(f'At most {MAX_REPORTS} reports per batch')
+    return reports
+
+
+def _valid(report):
+    return (isinstance(report, dict)
+            and isinstance(report.get('host'), str) and 0 < len(report['host']) <= MAX_HOST_LENGTH
+            and isinstance(report.get('timestamp'), (int, float)))
+
+
+def _number(report, *path):
+    value = report
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class HostState:
+    """Latest report of one host and a short history of its headline numbers."""
+
+    __slots__ = ('host', 'latest', 'received', 'reports', 'history')
+
+    def __init__(self, host):
+        self.host = host
+        self.latest = None
+        self.received = 0.0
+        self.reports = 0
+        self.history = []
+
+    def add(self, report, received):
+        self.reports += 1
+        self.received = received
+        point = (report['timestamp'], _number(report, 'cpu', 'percent'),
+                 _number(report, 'memory', 'percent'), _number(report, 'disk_percent'))
+        # Spooled batches arrive late, keep the history in time order. The
+        # search key is (timestamp,) alone so values, which may be None, are
+        # never compared; a timestamp already there is a re-sent report.
+        history = self.history
+        if not history or point[0] > history[-1][0]:
+            history.append(point)
+        else:
+            index = bisect.bisect_left(history, point[:1])
+            if index == len(history) or history[index][0] != point[0]:
+                history.insert(index, point)
+        if len(self.history) > HISTORY_POINTS:
+            del self.history[:len(self.history) - HISTORY_POINTS]
+        if self.latest is None or report['timestamp'] >= self.latest['timestamp']:
+            self.latest = report
+
+    def summary(self, now, stale_after):
+        latest = self.latest
+        age = now - self.received
+        return {
+            'host': self.host,
+            'stale': age > stale_after,
+            'last_seen': round(age, 1),
+            'timestamp': latest['timestamp'],
+            'cpu_percent': _number(latest, 'cpu', 'percent'),
+            'memory_percent': _number(latest, 'memory', 'percent'),
+            'disk_percent': _number(latest, 'disk_percent'),
+            'process_count': _number(latest, 'processes', 'count'),
+            'uptime': _number(latest, 'uptime'),
+            'system': (latest.get('platform') or {}).get('system'),
+            'reports': self.reports,
+        }
+
+
+class FleetStore:
+    """Per-host state for every agent pushing to this instance.
+
+    Staleness uses the time reports were received here, not the agents'
+    clocks, so skewed hosts are still judged correctly.
+    """
+
+    def __init__(self, stale_after=STALE_AFTER):
+        self.stale_after = stale_after
+        self.version = 0
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def ingest(self, reports, received=None):
+        """Store a batch of reports, returns how many were accepted."""
+        received = time.time() if received is None else received
+        accepted = 0
+        with self._lock:
+            try:
+                for report in reports:
+                    if not _valid(report):
+                        continue
+                    state = self._hosts.get(report['host'])
+                    if state is None:
+                        state = self._hosts[report['host']] = HostState(report['host'])
+                    state.add(report, received)
+                    accepted += 1
+            finally:
+                # Readers see whatever was applied, even if a report failed
+                if accepted:
+                    self.version += 1
+        return accepted
+
+    def forget(self, host):
+        with self._lock:
+            return self._hosts.pop(host, None) is not None
+
+    def overview(self, top=TOP_N, now=None):
+        """Every host's summary plus the top hosts by CPU, memory and disk."""
+        now = time.time() if now is None else now
+        with self._lock:
+            hosts = [state.summary(now, self.stale_after) for state in self._hosts.values()]
+        hosts.sort(key=lambda host: host['host'])
+        live = [host for host in hosts if not host['stale']]
+
+        def top_by(key):
+            ranked = heapq.nlargest(top, (host for host in live if host[key] is not None), key=lambda host: host[key])
+            return [{'host': host['host'], 'value': host[key]} for host in ranked]
+
+        return {
+            'version': self.version,
+            'total': len(hosts),
+            'stale': sum(1 for host in hosts if host['stale']),
+            'stale_after': self.stale_after,
+            'top_cpu': top_by('cpu_percent'),
+            'top_memory': top_by('memory_percent'),
+            'top_disk': top_by('disk_percent'),
+            'hosts': hosts,
+        }
+
+    def host(self, name, since=None, now=None):
+        """Latest report and history of one host, or None if it never reported."""
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._hosts.get(name)
+            if state is None:
+                return None
+            history = state.history
+            if since is not None:
+                history = history[bisect.bisect_left(history, (since,)):]
+            return {
+                'summary': state.summary(now, self.stale_after),
+                'latest': state.latest,
+                'history': [{'timestamp': ts, 'cpu_percent': cpu, 'memory_percent': memory, 'disk_percent': disk}
+                            for ts, cpu, memory, disk in history],
+            }
+
+
+fleet_store = FleetStore()
+# Ingests beyond this are answered with 503 and Retry-After
+ingest_slots = threading.BoundedSemaphore(MAX_CONCURRENT_INGESTS)
@@ -0,0 +1,398 @@
+import os
+import sqlite3
+import threading
+import time
+from .sampler import sampler
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'history.db')
+
+# name -> (bucket seconds, retention seconds)
+TIERS = {
+    'raw': (1, 2 * 24 * 3600),
+    '1m': (60, 35 * 24 * 3600),
+    '1h': (3600, 2 * 365 * 24 * 3600),
+}
+
+# Upper bound on points returned by one query, coarser steps are used above it
+MAX_POINTS = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS samples_raw (
+    metric_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (metric_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS samples_1m (
+    metric_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    sum REAL NOT NULL,
+    count INTEGER NOT NULL,
+    last REAL NOT NULL,
+    PRIMARY KEY (metric_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS samples_1h (
+    metric_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    sum REAL NOT NULL,
+    count INTEGER NOT NULL,
+    last REAL NOT NULL,
+    PRIMARY KEY (metric_id, ts)
+) WITHOUT ROWID;
+"""
+
+# Rolled up buckets can be written more than once (e.g. across a restart),
+# so merge them instead of replacing
+ROLLUP_UPSERT = """
+INSERT INTO samples_{tier} (metric_id, ts, min, max, sum, count, last)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (metric_id, ts) DO UPDATE SET
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    sum = sum + excluded.sum,
+    count = count + excluded.count,
+    last = excluded.last
+"""
+
+
+class _Bucket:
+    __slots__ = ('ts', 'min', 'max', 'sum', 'count', 'last')
+
+    def __init__(self, ts, value):
+        self.ts = ts
+        self.min = self.max = self.sum = self.last = value
+        self.count = 1
+
+    def add(self, value):
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        self.count += 1
+        self.last = value
+
+    def row(self, metric_id):
+        return (metric_id, self.ts, self.min, self.max, self.sum, self.count, self.last)
+
+
+class MetricStore:
+    """Embedded SQLite time-series store with 1-minute and 1-hour rollups.
+
+    record() only appends to an in-memory buffer. A writer thread flushes the
+    buffer with one executemany per table per batch, and finished minute and
+    hour buckets are aggregated in memory as samples arrive so the rollup
+    tables never have to be recomputed from raw data. Each tier has its own
+    retention and query() reads from the coarsest tier that still resolves
+    the requested step.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, flush_interval=10.0, prune_interval=600.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+        self._metric_ids = {}
+        self._pending = []
+        # Rows waiting to be written, kept until their transaction commits
+        self._raw = []
+        self._minute = {}   # metric_id -> _Bucket for the current minute
+        self._hour = {}     # metric_id -> _Bucket for the current hour
+        self._rollups = {'1m': [], '1h': []}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._local = threading.local()
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_prune = 0.0
+        self._initialized = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_db(self):
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = self._connect()
+            with conn:
+                conn.executescript(SCHEMA)
+                self._metric_ids = dict(conn.execute('SELECT name, id FROM metrics'))
+            self._writer = conn
+            self._initialized = True
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self._init_db()
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _metric_id(self, name):
+        metric_id = self._metric_ids.get(name)
+        if metric_id is None:
+            with self._writer:
+                self._writer.execute('INSERT OR IGNORE INTO metrics (name) VALUES (?)', (name,))
+                metric_id = self._writer.execute('SELECT id FROM metrics WHERE name = ?', (name,)).fetchone()[0]
+            self._metric_ids[name] = metric_id
+        return metric_id
+
+    def record(self, values, timestamp=None):
+        """Queue {metric name: value} samples taken at timestamp (epoch seconds)."""
+        ts = int(time.time() if timestamp is None else timestamp)
+        with self._lock:
+            self._pending.append((ts, values))
+        if self._thread is None:
+            self.start()
+
+    def _roll(self, metric_id, ts, value):
+        minute_ts = ts - ts % 60
+        bucket = self._minute.get(metric_id)
+        if bucket is None or bucket.ts != minute_ts:
+            if bucket is not None:
+                self._rollups['1m'].append(bucket.row(metric_id))
+                self._roll_hour(metric_id, bucket)
+            self._minute[metric_id] = _Bucket(minute_ts, value)
+        else:
+            bucket.add(value)
+
+    def _roll_hour(self, metric_id, minute):
+        hour_ts = minute.ts - minute.ts % 3600
+        bucket = self._hour.get(metric_id)
+        if bucket is None or bucket.ts != hour_ts:
+            if bucket is not None:
+                self._rollups['1h'].append(bucket.row(metric_id))
+            bucket = self._hour[metric_id] = _Bucket(hour_ts, minute.last)
+            bucket.min, bucket.max, bucket.sum, bucket.count = minute.min, minute.max, minute.sum, minute.count
+        else:
+            bucket.min = min(bucket.min, minute.min)
+            bucket.max = max(bucket.max, minute.max)
+            bucket.sum += minute.sum
+            bucket.count += minute.count
+            bucket.last = minute.last
+
+    def _close_buckets(self):
+        # The current minute and hour are written as they stand; the upsert
+        # merges them with whatever a restart records for the same buckets
+        for metric_id, minute in self._minute.items():
+            self._rollups['1m'].append(minute.row(metric_id))
+            self._roll_hour(metric_id, minute)
+        for metric_id, hour in self._hour.items():
+            self._rollups['1h'].append(hour.row(metric_id))
+        self._minute.clear()
+        self._hour.clear()
+
+    def flush(self, final=False):
+        """Write queued samples and finished buckets; `final` also writes the unfinished ones."""
+        with self._write_lock:
+            self._init_db()
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending and not self._raw and not (final and self._minute):
+                return 0
+
+            raw = self._raw
+            for index, (ts, values) in enumerate(pending):
+                try:
+                    samples = [(self._metric_id(name), float(value)) for name, value in values.items()
+                               if value is not None]
+                except sqlite3.Error:
+                    # Not rolled up yet, so these go back to the queue as they were
+                    with self._lock:
+                        self._pending[:0] = pending[index:]
+                    raise
+                for metric_id, value in samples:
+                    raw.append((metric_id, ts, value))
+                    self._roll(metric_id, ts, value)
+            if final:
+                self._close_buckets()
+
+            # If the write fails the rows stay in self._raw and self._rollups
+            # and go out with the next flush
+            rollups = self._rollups
+            with self._writer:
+                self._writer.executemany(
+                    'INSERT OR REPLACE INTO samples_raw (metric_id, ts, value) VALUES (?, ?, ?)', raw)
+                for tier, rows in rollups.items():
+                    if rows:
+                        self._writer.executemany(ROLLUP_UPSERT.format(tier=tier), rows)
+            self._raw = []
+            self._rollups = {'1m': [], '1h': []}
+
+            if time.monotonic() - self._last_prune >= self.prune_interval:
+                self.prune()
+            return len(raw)
+
+    def prune(self, now=None):
+        """Drop rows older than each tier's retention."""
+        now = time.time() if now is None else now
+        self._last_prune = time.monotonic()
+        with self._writer:
+            for tier, (_, retention) in TIERS.items():
+                cutoff = int(now - retention)
+                # Per metric so each delete is a primary key range scan
+                self._writer.executemany(
+                    f'DELETE FROM samples_{tier} WHERE metric_id = ? AND ts < ?',
+                    [(metric_id, cutoff) for metric_id in self._metric_ids.values()])
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Keep sampling, the next batch will try again
+                pass
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush(final=True)
+
+    def metrics(self):
+        conn = self._reader()
+        return [name for (name,) in conn.execute('SELECT name FROM metrics ORDER BY name')]
+
+    def pick_tier(self, start, end, step, now=None):
+        """Coarsest tier that resolves `step` and still retains `start`."""
+        now = time.time() if now is None else now
+        candidates = sorted(TIERS.items(), key=lambda item: item[1][0], reverse=True)
+        for tier, (resolution, retention) in candidates:
+            if resolution <= step and start >= now - retention:
+                return tier
+        # Nothing is fine enough that far back, use the finest tier that is
+        for tier, (resolution, retention) in reversed(candidates):
+            if start >= now - retention:
+                return tier
+        return candidates[0][0]
+
+    def query(self, metric, start, end, step=None):
+        """Points between start and end (epoch seconds), one per step.
+
+        Each point is (ts, min, max, avg, last).
+        """
+        start, end = int(start), int(end)
+        if end <= start:
+            raise ValueError('to must be after from')
+        span = end - start
+        step = int(max(step or 0, span / MAX_POINTS, 1))
+        tier = self.pick_tier(start, end, step)
+        step = max(step, TIERS[tier][0])
+
+        conn = self._reader()
+        row = conn.execute('SELECT id FROM metrics WHERE name = ?', (metric,)).fetchone()
+        # Samples still waiting for the writer, merged in below instead of
+        # flushing from the read path
+        unwritten = []
+        if tier == 'raw':
+            with self._lock:
+                pending = list(self._pending)
+            for ts, values in pending:
+                value = values.get(metric)
+                if value is not None and start <= ts < end:
+                    unwritten.append((ts, float(value)))
+        if row is None and not unwritten:
+            raise KeyError(metric)
+        metric_id = row[0] if row else None
+
+        if tier == 'raw':
+            columns = 'MIN(value), MAX(value), SUM(value), COUNT(*)'
+            last_column = 'value'
+        else:
+            columns = 'MIN(min), MAX(max), SUM(sum), SUM(count)'
+            last_column = 'last'
+
+        params = {'metric_id': metric_id, 'start': start, 'end': end, 'step': step}
+        where = 'metric_id = :metric_id AND ts >= :start AND ts < :end'
+        aggregates = conn.execute(
+            f'SELECT ts / :step * :step AS bucket, {columns} FROM samples_{tier} '
+            f'WHERE {where} GROUP BY bucket ORDER BY bucket', params).fetchall()
+        # With MAX() as the only aggregate SQLite returns the other column from the same row
+        lasts = dict((bucket, last) for bucket, last, _ in conn.execute(
+            f'SELECT ts / :step * :step AS bucket, {last_column}, MAX(ts) FROM samples_{tier} '
+            f'WHERE {where} GROUP BY bucket', params))
+
+        merged = {bucket: [low, high, total, count, lasts.get(bucket)]
+                  for bucket, low, high, total, count in aggregates}
+        for ts, value in unwritten:
+            bucket = ts // step * step
+            point = merged.get(bucket)
+            if point is None:
+                merged[bucket] = [value, value, value, 1, value]
+            else:
+                point[0] = min(point[0], value)
+                point[1] = max(point[1], value)
+                point[2] += value
+                point[3] += 1
+                point[4] = value
+
+        points = [
+            (bucket, low, high, total / count if count else None, last)
+            for bucket, (low, high, total, count, last) in sorted(merged.items())
+        ]
+        return {'metric': metric, 'tier': tier, 'step': step, 'from': start, 'to': end, 'points': points}
+
+
+def snapshot_metrics(snapshot):
+    """Flatten a sampler snapshot into {metric name: number}."""
+    values = {}
+    cpu = snapshot.get('cpu')
+    if cpu:
+        values['cpu.percent'] = cpu['percent']
+
+    memory = snapshot.get('memory')
+    if memory:
+        for key in ('percent', 'used', 'available', 'swap_percent', 'swap_used'):
+            values[f'memory.{key}'] = memory[key]
+
+    disks = snapshot.get('disks')
+    if disks:
+        for partition in disks['partitions']:
+            mount = partition['mountpoint']
+            values[f'disk.{mount}.percent'] = partition['percent']
+            values[f'disk.{mount}.used'] = partition['used']
+
+    for disk, counters in (snapshot.get('disk_io') or {}).items():
+        for key in ('read_bytes', 'write_bytes', 'read_count', 'write_count'):
+            values[f'disk_io.{disk}.{key}'] = counters[key]
+
+    for interface, counters in (snapshot.get('network') or {}).items():
+        if counters['has_counters']:
+            values[f'net.{interface}.bytes_sent'] = counters['bytes_sent']
+            values[f'net.{interface}.bytes_recv'] = counters['bytes_recv']
+
+    if snapshot.get('process_count') is not None:
+        values['processes.count'] = snapshot['process_count']
+
+    battery = snapshot.get('battery')
+    if battery and battery['present']:
+        values['battery.percent'] = battery['percent']
+
+    return values
+
+
+metric_store = MetricStore()
+
+
+@sampler.subscribe
+def record_snapshot(snapshot):
+    metric_store.record(snapshot_metrics(snapshot), snapshot.timestamp)
@@ -0,0 +1,197 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from flask import Response, current_app, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this go out uncompressed, the headers would eat the gain
+COMPRESS_THRESHOLD = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Serialized responses kept, one per (url, version)
+CACHE_SIZE = 128
+
+# Versions restart from zero with the process, so ETags carry a per-process
+# token to never match a representation from a previous run
+_TOKEN = os.urandom(4).hex()
+
+
+def dumps(payload):
+    """Serialize to compact JSON bytes, with orjson when it is installed.
+
+    Types JSON can't represent (dates, ...) are converted like jsonify()
+    does, and non-string keys become strings.
+    """
+    default = current_app.json.default
+    if orjson is not None:
+        return orjson.dumps(payload, default=default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(payload, default=default, separators=(',', ':')).encode('utf-8')
+
+
+def accepted_encoding(header):
+    """Best content coding we can produce for an Accept-Encoding header."""
+    accepted = set()
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.replace(' ', '').partition('q=')[2]
+        try:
+            if quality and float(quality) == 0:
+                # Explicitly refused
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 so the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _Entry:
+    """One serialized body and its compressed variants, built on demand."""
+
+    __slots__ = ('body', 'encoded', 'lock')
+
+    def __init__(self, body):
+        self.body = body
+        self.encoded = {}
+        self.lock = threading.Lock()
+
+    def encode(self, encoding):
+        if encoding is None or len(self.body) < COMPRESS_THRESHOLD:
+            return self.body, None
+        data = self.encoded.get(encoding)
+        if data is None:
+            with self.lock:
+                # Clients that raced here wait for the first one instead of compressing again
+                data = self.encoded.get(encoding)
+                if data is None:
+                    data = self.encoded[encoding] = compress(self.body, encoding)
+        return data, encoding
+
+
+class ResponseCache:
+    """LRU of serialized response bodies keyed by URL and data version.
+
+    Each version of a payload is serialized and compressed once, however
+    many clients poll it.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Entry for key, calling build() for its body bytes on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        # Built outside the lock, two first requests for a version may both build
+        entry = _Entry(build())
+        with self._lock:
+            self.misses += 1
+            entry = self._entries.setdefault(key, entry)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _opaque(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def _not_modified(etag):
+    # If-None-Match uses the weak comparison, so W/"x" matches "x" too
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(',')}
+
+
+def _headers(etag):
+    return {
+        'ETag': etag,
+        'Vary': 'Accept-Encoding',
+        # Always revalidate, a 304 is cheap
+        'Cache-Control': 'no-cache',
+    }
+
+
+def _respond(entry, etag, status=200, content_type='application/json'):
+    headers = _headers(etag)
+    body, encoding = entry.encode(accepted_encoding(request.headers.get('Accept-Encoding')))
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, status=status, content_type=content_type, headers=headers)
+
+
+def cached_response(version, build, content_type):
+    """Response for a body that only changes with `version`.
+
+    `version` identifies the data behind the current URL (a counter or a
+    tuple of them), `build` returns the body bytes and is only called the
+    first time a URL is requested at that version. Clients sending the
+    current ETag in If-None-Match get a 304 without anything being built.
+    """
+    if not isinstance(version, tuple):
+        version = (version,)
+    etag = 'W/"{}-{}"'.format(_TOKEN, '.'.join(str(part) for part in version))
+    if _not_modified(etag):
+        return Response(status=304, headers=_headers(etag))
+    entry = response_cache.get((request.path, request.query_string, version), build)
+    return _respond(entry, etag, content_type=content_type)
+
+
+def cached_json(version, build):
+    """cached_response() for a JSON payload, `build` returns the payload."""
+    return cached_response(version, lambda: dumps(build()), 'application/json')
+
+
+def json_response(payload, status=200):
+    """JSON response for a payload without a version, tagged by its content.
+
+    Saves the bytes on the wire when nothing changed, not the work of
+    building and serializing the payload.
+    """
+    entry = _Entry(dumps(payload))
+    etag = 'W/"{}"'.format(hashlib.blake2b(entry.body, digest_size=12).hexdigest())
+    if status == 200 and _not_modified(etag):
+        return Response(status=304, headers=_headers(etag))
+    return _respond(entry, etag, status)
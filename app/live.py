@@ -0,0 +1,194 @@
+import threading
+import time
+from flask import request
+from flask_socketio import emit, join_room, leave_room
+from app import socketio
+from .sampler import sampler
+from .pidwatch import pid_watch
+from .alerts import alert_engine
+from .views import build_system_stats, build_system_info, build_process_update, build_network_stats, build_disk_stats
+
+NAMESPACE = '/live'
+
+# topic -> (event name, default seconds between pushes, minimum seconds between pushes)
+TOPICS = {
+    'system': ('system_update', 1.0, 1.0),
+    'processes': ('process_update', 2.0, 2.0),
+    'process': ('process_stats_update', 1.0, 1.0),
+    'network': ('network_update', 1.0, 1.0),
+    'disks': ('disk_update', 1.0, 1.0),
+    # Pushed by the alert engine as rules fire and resolve, not per tick
+    'alerts': ('alert_update', 0.0, 0.0),
+}
+
+
+class Subscription:
+    __slots__ = ('sid', 'topic', 'key', 'interval', 'last_sent', 'version')
+
+    def __init__(self, sid, topic, key, interval):
+        self.sid = sid
+        self.topic = topic
+        self.key = key
+        self.interval = interval
+        self.last_sent = 0.0
+        # Last process table version this client has, for delta pushes
+        self.version = None
+
+
+_lock = threading.Lock()
+# (topic, key) -> {sid: Subscription}
+_subscriptions = {}
+
+
+def _room(topic, key):
+    return topic if key is None else f"{topic}:{key}"
+
+
+def _parse_request(data):
+    data = data or {}
+    topic = data.get('topic')
+    if topic not in TOPICS:
+        raise ValueError(f"Unknown topic '{topic}'")
+
+    key = None
+    if topic == 'process':
+        try:
+            key = int(data.get('pid'))
+        except (TypeError, ValueError):
+            raise ValueError('A pid is required for the process topic')
+
+    _, default_interval, min_interval = TOPICS[topic]
+    try:
+        interval = float(data.get('interval', default_interval))
+    except (TypeError, ValueError):
+        interval = default_interval
+    return topic, key, max(interval, min_interval)
+
+
+def _process_payload(pid):
+    # Reading through the watch registry also keeps the pid watched
+    return dict(pid_watch.stats(pid), pid=pid)
+
+
+def _build(topic, key, snapshot):
+    if topic == 'system':
+        return {'stats': build_system_stats(snapshot), 'info': build_system_info(snapshot)}
+    if topic == 'network':
+        return build_network_stats(snapshot)
+    if topic == 'disks':
+        return build_disk_stats(snapshot)
+    if topic == 'process':
+        return _process_payload(key)
+    if topic == 'alerts':
+        return {'events': [], 'active': alert_engine.active()}
+    raise ValueError(topic)
+
+
+def _publish(snapshot):
+    """Fan each topic out once per tick to every subscriber that is due."""
+    now = time.monotonic()
+    with _lock:
+        groups = [(topic, key, list(subs.values())) for (topic, key), subs in _subscriptions.items()]
+
+    for topic, key, subs in groups:
+        if topic == 'alerts':
+            continue
+        due = [sub for sub in subs if now - sub.last_sent >= sub.interval - 0.05]
+        if not due:
+            continue
+        event = TOPICS[topic][0]
+
+        if topic == 'processes':
+            # Clients at the same table version share one delta payload
+            by_version = {}
+            for sub in due:
+                by_version.setdefault(sub.version, []).append(sub)
+            for version, group in by_version.items():
+                if version is not None and version == snapshot['processes']['version']:
+                    continue
+                payload = build_process_update(version)
+                socketio.emit(event, payload, namespace=NAMESPACE, to=[sub.sid for sub in group])
+                for sub in group:
+                    sub.version = payload['version']
+                    sub.last_sent = now
+            continue
+
+        try:
+            payload = _build(topic, key, snapshot)
+        except Exception as e:
+            payload = {'error': str(e)}
+        if len(due) == len(subs):
+            socketio.emit(event, payload, namespace=NAMESPACE, to=_room(topic, key))
+        else:
+            socketio.emit(event, payload, namespace=NAMESPACE, to=[sub.sid for sub in due])
+        for sub in due:
+            sub.last_sent = now
+
+
+sampler.subscribe(_publish)
+
+
+def _push_alert(event):
+    socketio.emit(TOPICS['alerts'][0], {'events': [event], 'active': alert_engine.active()},
+                  namespace=NAMESPACE, to=_room('alerts', None))
+
+
+alert_engine.add_sink(_push_alert)
+
+
+def _drop(sid, topic, key):
+    subs = _subscriptions.get((topic, key))
+    if subs is None or subs.pop(sid, None) is None:
+        return
+    if not subs:
+        del _subscriptions[(topic, key)]
+
+
+@socketio.on('subscribe', namespace=NAMESPACE)
+def on_subscribe(data):
+    try:
+        topic, key, interval = _parse_request(data)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+
+    snapshot = sampler.snapshot()
+    sub = Subscription(request.sid, topic, key, interval)
+
+    if topic == 'process':
+        stats = pid_watch.stats(key)
+        if 'error' in stats:
+            return {'success': False, 'error': stats['error']}
+
+    with _lock:
+        _subscriptions.setdefault((topic, key), {})[request.sid] = sub
+    join_room(_room(topic, key))
+
+    # Send the current state right away instead of waiting for the next tick
+    if topic == 'processes':
+        payload = build_process_update()
+        sub.version = payload['version']
+    else:
+        payload = _build(topic, key, snapshot)
+    sub.last_sent = time.monotonic()
+    emit(TOPICS[topic][0], payload)
+
+    return {'success': True, 'topic': topic, 'interval': interval}
+
+
+@socketio.on('unsubscribe', namespace=NAMESPACE)
+def on_unsubscribe(data):
+    try:
+        topic, key, _ = _parse_request(data)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    with _lock:
+        _drop(request.sid, topic, key)
+    leave_room(_room(topic, key))
+    return {'success': True}
+
+
+@socketio.on('disconnect', namespace=NAMESPACE)
+def on_disconnect(*args):
+    with _lock:
+        for topic, key in list(_subscriptions):
+            _drop(request.sid, topic, key)
@@ -0,0 +1,261 @@
+import os
+import platform
+import stat
+import threading
+import time
+from .logrotation import split_name
+
+APP_LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+
+# Common log file extensions
+LOG_EXTENSIONS = ('.log', '.txt', '.evt', '.evtx', '.etl', '.wer', '.dmp', '.journal', '.out', '.err')
+
+# Files in system log directories that are logs despite having no extension
+LOG_NAMES = ('syslog', 'messages', 'dmesg', 'secure', 'maillog', 'cron', 'boot', 'kern', 'auth', 'daemon', 'debug')
+
+SECURITY_WORDS = ('auth', 'secure', 'security', 'audit')
+
+
+def _windows_roots():
+    system_root = os.environ.get('SYSTEMROOT', 'C:\\Windows')
+    system_drive = os.environ.get('SYSTEMDRIVE', 'C:')
+    return [
+        os.path.join(system_root, 'Logs'),
+        os.path.join(system_root, 'debug'),
+        os.path.join(system_root, 'system32', 'winevt', 'Logs'),
+        os.path.join(system_root, 'System32', 'LogFiles'),
+        os.path.join(system_root, 'System32', 'config'),
+        os.path.join(system_drive, 'ProgramData', 'Microsoft', 'Windows', 'WER'),
+    ]
+
+
+def default_roots(system=None):
+    """System log directories to index on this platform.
+
+    LOG_ROOTS (os.pathsep separated) replaces the platform defaults.
+    """
+    configured = os.environ.get('LOG_ROOTS')
+    if configured:
+        return [root for root in configured.split(os.pathsep) if root]
+
+    system = system or platform.system()
+    if system == 'Windows':
+        return _windows_roots()
+    if system == 'Darwin':
+        return ['/var/log', '/Library/Logs', os.path.expanduser('~/Library/Logs')]
+    # Linux and other unixes; journal exports are picked up by extension
+    return ['/var/log']
+
+
+def log_type(path, default):
+    name = os.path.basename(path).lower()
+    if any(word in name for word in SECURITY_WORDS):
+        return 'security'
+    return default
+
+
+def is_log_file(name):
+    # Rotated and compressed members count when their base name does
+    lowered = split_name(name)[0].lower()
+    if lowered.endswith(LOG_EXTENSIONS):
+        return True
+    return lowered in LOG_NAMES
+
+
+class LogFile:
+    __slots__ = ('name', 'path', 'size', 'modified', 'type', 'members')
+
+    def __init__(self, name, path, size, modified, type, members=None):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.modified = modified
+        self.type = type
+        # Files of the rotation set, newest first; just [path] when not rotated
+        self.members = members or [path]
+
+
+def group_rotations(files):
+    """Fold rotated members (syslog.1, syslog.2.gz, ...) into one entry per set.
+
+    The entry's path is the active file's path, its size the total on disk
+    and its modified time the newest member's.
+    """
+    sets = {}
+    for log_file in files:
+        base, index, _ = split_name(log_file.name)
+        directory = os.path.dirname(log_file.path)
+        sets.setdefault((directory, base), []).append((index, -log_file.modified, log_file))
+
+    grouped = []
+    for (directory, base), members in sets.items():
+        # By rotation number, see sort_members()
+        members.sort(key=lambda member: member[:2])
+        files = [member[2] for member in members]
+        if len(files) == 1 and files[0].name == base:
+            grouped.append(files[0])
+            continue
+        grouped.append(LogFile(
+            base, os.path.join(directory, base),
+            sum(f.size for f in files),
+            max(f.modified for f in files),
+            files[0].type,
+            [f.path for f in files]
+        ))
+    return grouped
+
+
+class _Directory:
+    __slots__ = ('mtime', 'files', 'subdirs')
+
+    def __init__(self, mtime):
+        self.mtime = mtime
+        self.files = []     # (name, path) of log files directly in this directory
+        self.subdirs = []
+
+
+class LogCatalog:
+    """Index of log files under a set of root directories.
+
+    A background thread rescans every `interval` seconds. Directories whose
+    mtime has not changed since the last scan are not listed again; only
+    the log files already known in them are stat'ed for size and mtime.
+    Requests read the last finished scan and never touch the disk.
+    """
+
+    def __init__(self, roots=None, app_dir=APP_LOG_DIR, interval=30.0, max_depth=8):
+        self.roots = [(root, 'system') for root in (default_roots() if roots is None else roots)]
+        if app_dir:
+            self.roots.append((app_dir, 'application'))
+        self.interval = interval
+        self.max_depth = max_depth
+        self.version = 0
+        self.refreshed = None
+        self._files = []
+        self._dirs = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+
+    def _stat_file(self, name, path, kind):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return LogFile(name, path, st.st_size, st.st_mtime, log_type(path, kind))
+
+    def _scan_dir(self, path, kind, depth, dirs, found):
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return
+
+        directory = self._dirs.get(path)
+        if directory is None or directory.mtime != mtime:
+            # New or changed directory: list it again, one stat per entry
+            directory = _Directory(mtime)
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                directory.subdirs.append(entry.path)
+                            elif is_log_file(entry.name):
+                                st = entry.stat()
+                                if stat.S_ISREG(st.st_mode):
+                                    directory.files.append((entry.name, entry.path))
+                                    found.append(LogFile(entry.name, entry.path, st.st_size,
+                                                         st.st_mtime, log_type(entry.path, kind)))
+                        except OSError:
+                            continue
+            except OSError:
+                # Unreadable (usually permission denied), leave it out
+                return
+        else:
+            # Same set of files, only sizes and mtimes can have moved
+            for name, file_path in directory.files:
+                log_file = self._stat_file(name, file_path, kind)
+                if log_file is not None:
+                    found.append(log_file)
+
+        dirs[path] = directory
+        if depth < self.max_depth:
+            for subdir in directory.subdirs:
+                self._scan_dir(subdir, kind, depth + 1, dirs, found)
+
+    def refresh(self):
+        """Rescan all roots and swap in the new file list."""
+        with self._refresh_lock:
+            dirs = {}
+            found = []
+            seen = set()
+            for root, kind in self.roots:
+                root = os.path.abspath(root)
+                if root in seen:
+                    continue
+                seen.add(root)
+                self._scan_dir(root, kind, 0, dirs, found)
+
+            found = group_rotations(found)
+            found.sort(key=lambda log_file: log_file.modified, reverse=True)
+            changed = [(f.path, f.size, f.modified, len(f.members)) for f in found] != \
+                      [(f.path, f.size, f.modified, len(f.members)) for f in self._files]
+            with self._lock:
+                self._dirs = dirs
+                self._files = found
+                if changed:
+                    self.version += 1
+                self.refreshed = time.time()
+            self._ready.set()
+            return len(found)
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                # A bad scan must not stop the refresher, the last list stays
+                pass
+            # Never leave files() waiting, even when the first scan failed
+            self._ready.set()
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='log-catalog', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def files(self):
+        """All known log files, newest first. Waits for the first scan."""
+        if self._thread is None:
+            self.start()
+        self._ready.wait()
+        return self._files
+
+    def page(self, offset=0, limit=50, type=None, query=None):
+        """(files, total matching) for one page of the catalog."""
+        files = self.files()
+        if type and type != 'all':
+            files = [f for f in files if f.type == type]
+        if query:
+            query = query.lower()
+            files = [f for f in files if query in f.path.lower()]
+        offset = max(0, offset)
+        return files[offset:offset + max(0, limit)], len(files)
+
+
+log_catalog = LogCatalog()
@@ -0,0 +1,599 @@
+import bz2
+import codecs
+import gzip
+import lzma
+import os
+import threading
+from collections import deque
+from .logrotation import split_name, rotation_members
+
+BLOCK_SIZE = 64 * 1024
+INDEX_BLOCK_SIZE = 1024 * 1024
+SAMPLE_SIZE = 64 * 1024
+MAX_LINES = 5000
+# Decompressed bytes held per step when streaming an archive
+CHUNK_SIZE = 1024 * 1024
+
+
+class BinaryLogError(ValueError):
+    pass
+
+
+class _Encoding:
+    """How to find line boundaries and decode bytes for one file encoding."""
+
+    def __init__(self, name, bom=b'', width=1, big_endian=False):
+        self.name = name
+        self.bom = bom
+        self.width = width
+        self.big_endian = big_endian
+
+    def boundary(self, block, index, offset):
+        """Offset just past the newline whose b'\\n' byte is block[index], or None.
+
+        `offset` is the file offset of block[0]. For UTF-16 the b'\\n' byte has
+        to sit in the right half of an aligned code unit.
+        """
+        if self.width == 1:
+            return offset + index + 1
+        absolute = offset + index - len(self.bom)
+        if self.big_endian:
+            if absolute % 2 == 1 and index > 0 and block[index - 1] == 0:
+                return offset + index + 1
+        elif absolute % 2 == 0 and index + 1 < len(block) and block[index + 1] == 0:
+            return offset + index + 2
+        return None
+
+
+UTF8 = _Encoding('utf-8')
+UTF8_SIG = _Encoding('utf-8-sig', bom=codecs.BOM_UTF8)
+UTF16_LE = _Encoding('utf-16-le', bom=codecs.BOM_UTF16_LE, width=2)
+UTF16_BE = _Encoding('utf-16-be', bom=codecs.BOM_UTF16_BE, width=2, big_endian=True)
+LATIN1 = _Encoding('latin-1')
+
+# Per-file caches, keyed by path so a rotated or rewritten file replaces its
+# entry instead of adding one, which keeps them the size of the log set.
+# path -> (file id, _Encoding), so a file is only sniffed once
+_encodings = {}
+# path -> LineIndex
+_line_indexes = {}
+# path -> ((path, inode, size, mtime), (uncompressed size, newline count)) of an archive
+_archive_meta = {}
+_lock = threading.Lock()
+
+
+def _file_id(path, st):
+    return (path, st.st_ino, st.st_dev)
+
+
+def _cached(cache, key):
+    """Value cached for the path key[0], if it was stored for this same file."""
+    entry = cache.get(key[0])
+    return entry[1] if entry is not None and entry[0] == key else None
+
+
+def _remember(cache, key, value):
+    with _lock:
+        cache[key[0]] = (key, value)
+
+
+def _detect_encoding(f, st, path):
+    key = _file_id(path, st)
+    encoding = _cached(_encodings, key)
+    if encoding is not None:
+        return encoding
+
+    f.seek(0)
+    sample = f.read(SAMPLE_SIZE)
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = UTF8_SIG
+    elif sample.startswith(codecs.BOM_UTF16_LE):
+        encoding = UTF16_LE
+    elif sample.startswith(codecs.BOM_UTF16_BE):
+        encoding = UTF16_BE
+    elif b'\x00' in sample:
+        raise BinaryLogError('Unable to read log file - it may be binary')
+    else:
+        # Start optimistic, _decode() downgrades to latin-1 if utf-8 fails later
+        encoding = UTF8
+
+    _remember(_encodings, key, encoding)
+    return encoding
+
+
+def _decode(data, encoding, key):
+    if encoding is UTF8 or encoding is UTF8_SIG:
+        try:
+            return data.decode('utf-8'), len(data)
+        except UnicodeDecodeError as e:
+            if e.reason == 'unexpected end of data':
+                # A multi-byte character is still being written at EOF
+                return data[:e.start].decode('utf-8'), e.start
+            # Remember for this file so later pages skip the utf-8 attempt
+            _remember(_encodings, key, LATIN1)
+            return data.decode('latin-1'), len(data)
+    if encoding.width == 2:
+        usable = len(data) - len(data) % 2
+        return data[:usable].decode(encoding.name, errors='replace'), usable
+    return data.decode(encoding.name), len(data)
+
+
+def _scan_back(f, end, count, encoding, floor):
+    """Offset where the `count`-th line before `end` starts (never below floor)."""
+    found = 0
+    search_end = end
+    # The newline terminating the last line before `end` doesn't start a new one
+    first = True
+    while search_end > floor:
+        start = max(floor, search_end - BLOCK_SIZE)
+        f.seek(start)
+        # One extra byte so a UTF-16 newline split across blocks is still seen whole
+        block = f.read(min(search_end + 1, end) - start)
+        index = search_end - start
+        while True:
+            index = block.rfind(b'\n', 0, index)
+            if index < 0:
+                break
+            boundary = encoding.boundary(block, index, start)
+            if boundary is None:
+                continue
+            if first and boundary >= end:
+                first = False
+                continue
+            first = False
+            found += 1
+            if found == count:
+                return boundary
+        search_end = start
+    return floor
+
+
+def _scan_forward(f, start, count, encoding, size):
+    """Offset just past the `count`-th line starting at `start`, or size."""
+    found = 0
+    offset = start
+    while offset < size:
+        f.seek(offset)
+        limit = min(BLOCK_SIZE, size - offset)
+        # One extra byte so a UTF-16 newline split across blocks is still seen whole
+        block = f.read(limit + 1)
+        index = -1
+        while True:
+            index = block.find(b'\n', index + 1, limit)
+            if index < 0:
+                break
+            boundary = encoding.boundary(block, index, offset)
+            if boundary is None:
+                continue
+            found += 1
+            if found == count:
+                return boundary
+        offset += BLOCK_SIZE
+    return size
+
+
+class LineIndex:
+    """Sparse map from line numbers to byte offsets for one file.
+
+    Every `stride`-th line start is recorded. The index is built on demand,
+    cached per (path, inode) and extended incrementally when the file grows,
+    so jumping to a line only scans up to `stride` lines past a checkpoint.
+    """
+
+    def __init__(self, file_id, encoding, stride=1000):
+        self.file_id = file_id
+        self.encoding = encoding
+        self.stride = stride
+        self.offsets = [0]     # offsets[i] is the start of line i * stride
+        self.lines = 0         # complete lines seen so far
+        self.size = 0          # bytes indexed so far
+        self._lock = threading.Lock()
+
+    def extend(self, f, size):
+        with self._lock:
+            offset = self.size
+            while offset < size:
+                f.seek(offset)
+                limit = min(INDEX_BLOCK_SIZE, size - offset)
+                block = f.read(limit + 1)
+                next_checkpoint = len(self.offsets) * self.stride
+                newlines = block.count(b'\n', 0, limit) if self.encoding.width == 1 else None
+                if newlines is not None and self.lines + newlines < next_checkpoint:
+                    # No checkpoint falls inside this block, counting is enough
+                    self.lines += newlines
+                else:
+                    index = -1
+                    while True:
+                        index = block.find(b'\n', index + 1, limit)
+                        if index < 0:
+                            break
+                        boundary = self.encoding.boundary(block, index, offset)
+                        if boundary is None:
+                            continue
+                        self.lines += 1
+                        if self.lines % self.stride == 0:
+                            self.offsets.append(boundary)
+                offset += limit
+            self.size = size
+
+    def locate(self, line):
+        """(checkpoint offset, lines still to skip) for a 0-based line number."""
+        checkpoint = min(line // self.stride, len(self.offsets) - 1)
+        return self.offsets[checkpoint], line - checkpoint * self.stride
+
+
+def _line_index(path, f, st, encoding):
+    file_id = _file_id(path, st)
+    with _lock:
+        index = _line_indexes.get(path)
+        # A different inode or a shrunken file means the log was rotated or truncated
+        if index is None or index.file_id != file_id or index.size > st.st_size:
+            index = _line_indexes[path] = LineIndex(file_id, encoding)
+    if index.size < st.st_size:
+        index.extend(f, st.st_size)
+    return index
+
+
+def _count_window(content):
+    if not content:
+        return 0
+    return content.count('\n') + (0 if content.endswith('\n') else 1)
+
+
+def _read_plain(path, lines, before=None, after=None, line=None):
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        encoding = _detect_encoding(f, st, path)
+        floor = len(encoding.bom)
+
+        result = {}
+        if line is not None:
+            index = _line_index(path, f, st, encoding)
+            checkpoint, skip = index.locate(max(0, line))
+            start = _scan_forward(f, max(checkpoint, floor), skip, encoding, size) if skip else max(checkpoint, floor)
+            end = _scan_forward(f, start, lines, encoding, size)
+            result['line'] = line
+            result['total_lines'] = index.lines
+        elif after is not None:
+            start = min(max(after, floor), size)
+            end = _scan_forward(f, start, lines, encoding, size)
+        else:
+            end = size if before is None else min(max(before, floor), size)
+            start = _scan_back(f, end, lines, encoding, floor)
+
+        f.seek(start)
+        data = f.read(end - start)
+
+    content, used = _decode(data, encoding, _file_id(path, st))
+    end = start + used
+    result.update({
+        'content': content,
+        'start': start,
+        'end': end,
+        'size': size,
+        'encoding': (_cached(_encodings, _file_id(path, st)) or encoding).name,
+        'has_before': start > floor,
+        'has_after': end < size,
+    })
+    return result
+
+
+def _plain_lines(path):
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        return _line_index(path, f, st, _detect_encoding(f, st, path)).lines
+
+
+def _open_compressed(path, compression):
+    if compression == 'gz':
+        return gzip.open(path, 'rb')
+    if compression == 'bz2':
+        return bz2.open(path, 'rb')
+    return lzma.open(path, 'rb')
+
+
+def decompressed_chunks(path, compression):
+    """Decompressed data in CHUNK_SIZE pieces, never more than one at a time."""
+    with _open_compressed(path, compression) as f:
+        first = True
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            if first:
+                first = False
+                if b'\x00' in chunk[:SAMPLE_SIZE]:
+                    raise BinaryLogError('Unable to read log file - it may be binary')
+            yield chunk
+
+
+def _compressed_key(path):
+    st = os.stat(path)
+    return (path, st.st_ino, st.st_size, st.st_mtime)
+
+
+def _compressed_meta(path, compression):
+    """(uncompressed size, newline count) of an archive, from one streaming pass.
+
+    Rotated archives don't change, so this is cached until the path's
+    inode, size or mtime does.
+    """
+    key = _compressed_key(path)
+    meta = _cached(_archive_meta, key)
+    if meta is None:
+        size = newlines = 0
+        for chunk in decompressed_chunks(path, compression):
+            size += len(chunk)
+            newlines += chunk.count(b'\n')
+        meta = (size, newlines)
+        _remember(_archive_meta, key, meta)
+    return meta
+
+
+def _read_compressed(path, compression, lines, before=None, after=None, line=None):
+    """Same window as _read_plain() for a .gz/.bz2/.xz file, streamed.
+
+    Archives can't seek backwards, so tails stream through the whole file
+    keeping only the last few chunks; forward reads stop once they have
+    enough lines. Memory stays at a few chunks plus the window itself.
+    """
+    key = _compressed_key(path)
+    chunks = decompressed_chunks(path, compression)
+    offset = 0
+    newlines = 0
+    floor = 0
+    result = {}
+    has_after = False
+
+    def note_bom(chunk):
+        return len(codecs.BOM_UTF8) if offset == 0 and chunk.startswith(codecs.BOM_UTF8) else 0
+
+    if line is None and after is None:
+        # Keep just enough trailing chunks to hold `lines` lines
+        held = deque()
+        held_newlines = 0
+        for chunk in chunks:
+            if offset == 0:
+                floor = note_bom(chunk)
+            if before is not None and offset + len(chunk) >= before:
+                chunk = chunk[:max(0, before - offset)]
+                has_after = True
+            count = chunk.count(b'\n')
+            held.append((offset, chunk, count))
+            held_newlines += count
+            while len(held) > 1 and held_newlines - held[0][2] > lines:
+                held_newlines -= held.popleft()[2]
+            offset += len(chunk)
+            newlines += count
+            if has_after:
+                break
+        if not has_after:
+            _remember(_archive_meta, key, (offset, newlines))
+        data = b''.join(chunk for _, chunk, _ in held)
+        base = held[0][0] if held else 0
+        end = offset
+
+        search_end = len(data) - 1 if data.endswith(b'\n') else len(data)
+        start_local = 0
+        for _ in range(lines):
+            index = data.rfind(b'\n', 0, search_end)
+            if index < 0:
+                start_local = 0
+                break
+            start_local = search_end = index
+        else:
+            start_local += 1
+        start = max(base + start_local, floor)
+        data = data[start - base:]
+    else:
+        target_line = None if line is None else max(0, line)
+        start = None
+        collected = []
+        found = 0
+        for chunk in chunks:
+            if offset == 0:
+                floor = note_bom(chunk)
+            local = None
+            if start is not None:
+                local = 0
+            elif target_line is not None:
+                count = chunk.count(b'\n')
+                if target_line == 0:
+                    local = floor
+                elif newlines + count >= target_line:
+                    local = -1
+                    for _ in range(target_line - newlines):
+                        local = chunk.find(b'\n', local + 1)
+                    local += 1
+                else:
+                    newlines += count
+            elif offset + len(chunk) > max(after, floor):
+                local = max(after, floor) - offset
+
+            if local is None:
+                offset += len(chunk)
+                continue
+            if start is None:
+                start = offset + local
+
+            piece = chunk[local:]
+            index = -1
+            while found < lines:
+                index = piece.find(b'\n', index + 1)
+                if index < 0:
+                    break
+                found += 1
+            if found >= lines:
+                collected.append(piece[:index + 1])
+                has_after = index + 1 < len(piece) or next(chunks, None) is not None
+                break
+            collected.append(piece)
+            offset += len(chunk)
+        chunks.close()
+
+        data = b''.join(collected)
+        if start is None:
+            # Past the end (or past the last line)
+            start = offset
+        end = start + len(data)
+        if target_line is not None:
+            result['line'] = target_line
+
+    size, total_lines = _compressed_meta(path, compression)
+    if 'line' in result:
+        result['total_lines'] = total_lines
+    content, used = _decode(data, UTF8, key)
+    end = start + used
+    result.update({
+        'content': content,
+        'start': start,
+        'end': end,
+        'size': size,
+        'encoding': (_cached(_encodings, key) or UTF8).name,
+        'has_before': start > floor,
+        'has_after': has_after or end < size,
+    })
+    return result
+
+
+def _read_member(member, lines, before=None, after=None, line=None):
+    if member.compression:
+        return _read_compressed(member.path, member.compression, lines, before, after, line)
+    return _read_plain(member.path, lines, before, after, line)
+
+
+def _member_size(member):
+    if member.compression:
+        return _compressed_meta(member.path, member.compression)[0]
+    return member.size
+
+
+def _member_lines(member):
+    if member.compression:
+        return _compressed_meta(member.path, member.compression)[1]
+    return _plain_lines(member.path)
+
+
+def _read_set(members, lines, before=None, after=None, line=None):
+    """One window over a whole rotation set.
+
+    The active file keeps its own byte offsets and line numbers (0 is its
+    first byte/line); rotated members sit before it at negative offsets
+    and line numbers, newest nearest to zero. So following the active
+    file works exactly as for a plain file and paging backwards from its
+    start walks into the archives.
+    """
+    starts = [0]    # starts[k] is the logical offset of members[k]
+
+    def start_of(k):
+        while len(starts) <= k:
+            starts.append(starts[-1] - _member_size(members[len(starts)]))
+        return starts[k]
+
+    active = members[0]
+    result = {}
+
+    if line is None and after is None:
+        k = 0
+        local_before = before
+        if before is not None and before <= 0:
+            # Find the archive whose range (start, end] holds `before`
+            k = 1
+            while k < len(members) and start_of(k) >= before:
+                k += 1
+            if k == len(members):
+                k -= 1
+                local_before = 0
+            else:
+                local_before = before - start_of(k)
+        windows = [(k, _read_member(members[k], lines, before=local_before))]
+        remaining = lines - _count_window(windows[0][1]['content'])
+        while remaining > 0 and not windows[0][1]['has_before'] and k + 1 < len(members):
+            k += 1
+            window = _read_member(members[k], remaining)
+            windows.insert(0, (k, window))
+            remaining -= _count_window(window['content'])
+    else:
+        if line is not None:
+            k = 0
+            local = line
+            while local < 0 and k + 1 < len(members):
+                k += 1
+                local += _member_lines(members[k])
+            local = max(0, local)
+            window = _read_member(members[k], lines, line=local)
+            result['line'] = line
+        else:
+            k = 0
+            local = after
+            while local < 0 and k + 1 < len(members):
+                k += 1
+                local = after - start_of(k)
+            local = max(0, local)
+            window = _read_member(members[k], lines, after=local)
+        windows = [(k, window)]
+        remaining = lines - _count_window(window['content'])
+        while remaining > 0 and not windows[-1][1]['has_after'] and k > 0:
+            k -= 1
+            window = _read_member(members[k], remaining, after=0)
+            windows.append((k, window))
+            remaining -= _count_window(window['content'])
+
+    first_k, first = windows[0]
+    last_k, last = windows[-1]
+    parts = []
+    for _, window in windows:
+        content = window['content']
+        # An archive's last line may lack its newline, don't glue it to the next member
+        if parts and parts[-1] and not parts[-1].endswith('\n'):
+            parts[-1] += '\n'
+        parts.append(content)
+
+    active_size = _member_size(active)
+    result.update({
+        'content': ''.join(parts),
+        'start': start_of(first_k) + first['start'],
+        'end': start_of(last_k) + last['end'],
+        'size': active_size,
+        'encoding': first['encoding'],
+        'has_before': first['has_before'] or first_k + 1 < len(members),
+        'has_after': last['has_after'] or last_k > 0,
+        'members': [member.path for member in members],
+    })
+    if 'line' in result:
+        result['total_lines'] = _member_lines(active)
+    return result
+
+
+def read_log(path, lines=100, before=None, after=None, line=None):
+    """Read a window of `lines` lines from a log file without reading all of it.
+
+    By default this is the last `lines` lines. `before` returns the lines
+    ending at a byte offset, `after` the lines starting at one, and `line`
+    jumps to a 0-based line number through the sparse line index. Offsets
+    in the result can be passed back as before/after to page.
+
+    Compressed files (.gz, .bz2, .xz) are decompressed as streams. When
+    `path` is the active file of a rotation set (syslog, syslog.1,
+    syslog.2.gz, ...) the whole set reads as one stream, see _read_set().
+    """
+    lines = max(1, min(int(lines), MAX_LINES))
+    before = None if before is None else int(before)
+    after = None if after is None else int(after)
+    line = None if line is None else int(line)
+
+    path = os.path.abspath(path)
+    _, index, compression = split_name(os.path.basename(path))
+    if index == 0 and not compression:
+        members = rotation_members(path)
+        if not members:
+            raise FileNotFoundError(path)
+        if len(members) > 1 or members[0].path != path:
+            return _read_set(members, lines, before, after, line)
+        return _read_plain(path, lines, before, after, line)
+
+    # A single rotated member opened directly, e.g. from a search result
+    if compression:
+        return _read_compressed(path, compression, lines, before, after, line)
+    return _read_plain(path, lines, before, after, line)
@@ -0,0 +1,80 @@
+import os
+import re
+
+# Compressed member extension -> compression name used by logreader
+COMPRESSIONS = {'.gz': 'gz', '.bz2': 'bz2', '.xz': 'xz'}
+
+# syslog.1, app.log.12, dpkg.log.old, messages-20261018, kern.log.2026-10-18
+ROTATION_SUFFIX = re.compile(r'(?:\.(\d+)|\.old|-(\d{8})|\.(\d{4}-\d{2}-\d{2}))$')
+
+
+class Member:
+    __slots__ = ('path', 'compression', 'index', 'mtime', 'size', 'ino')
+
+    def __init__(self, path, compression, index, st):
+        self.path = path
+        self.compression = compression
+        self.index = index
+        self.mtime = st.st_mtime
+        self.size = st.st_size
+        self.ino = st.st_ino
+
+
+def split_name(name):
+    """(base name, rotation index, compression) for a log file name.
+
+    The active file has index 0. Numbered members keep their number,
+    dated and .old members get 1 and are ordered by mtime instead.
+    """
+    compression = None
+    lowered = name.lower()
+    for extension, kind in COMPRESSIONS.items():
+        if lowered.endswith(extension):
+            compression = kind
+            name = name[:-len(extension)]
+            break
+
+    match = ROTATION_SUFFIX.search(name)
+    if match is None:
+        # A compressed file without a rotation number is still an archive
+        return name, (1 if compression else 0), compression
+    index = int(match.group(1)) if match.group(1) else 1
+    return name[:match.start()], index, compression
+
+
+def sort_members(members):
+    """Newest first: the active file, then rotated members by number.
+
+    Only members sharing a number (dated and .old ones) are ordered by
+    mtime, which a copy or recompress can change.
+    """
+    members.sort(key=lambda m: (m.index, -m.mtime))
+    return members
+
+
+def rotation_members(path):
+    """Every existing member of the rotation set `path` belongs to, newest first.
+
+    `path` can be the active file (even if it does not exist right now) or
+    any rotated member of the set.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    base, _, _ = split_name(name)
+    members = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.startswith(base):
+                    continue
+                member_base, index, compression = split_name(entry.name)
+                if member_base != base:
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if entry.is_file():
+                    members.append(Member(entry.path, compression, index, st))
+    except OSError:
+        return []
+    return sort_members(members)
@@ -0,0 +1,271 @@
+import lzma
+import mmap
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .logcatalog import log_catalog
+from .logreader import decompressed_chunks, BinaryLogError
+from .logrotation import split_name
+
+# Files at least this big are read in chunks, or memory-mapped if they are
+# rotated members nothing writes to any more; smaller ones are read in one go.
+# A live file can be truncated under a mapping (logrotate copytruncate), and
+# touching mapped pages past its new end raises SIGBUS.
+MMAP_THRESHOLD = 4 * 1024 * 1024
+# Files are searched in line-aligned chunks of this size so stop requests
+# and the deadline are checked regularly even inside huge files
+CHUNK_SIZE = 8 * 1024 * 1024
+SAMPLE_SIZE = 64 * 1024
+MAX_LINE_LENGTH = 1000
+
+DEFAULT_RESULTS = 1000
+MAX_RESULTS = 10000
+DEFAULT_TIME_BUDGET = 10.0
+MAX_TIME_BUDGET = 30.0
+
+# Shared by all searches, so concurrent broad queries queue up instead of
+# each starting their own threads
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='log-search')
+
+
+def compile_pattern(query=None, regex=None, ignore_case=False):
+    """Compile a literal query or a regular expression to a bytes pattern.
+
+    Raises ValueError for a missing query or an invalid expression.
+    """
+    if regex:
+        source = regex
+    elif query:
+        source = re.escape(query)
+    else:
+        raise ValueError('A q or regex parameter is required')
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    try:
+        return re.compile(source.encode('utf-8'), flags)
+    except re.error as e:
+        raise ValueError(f'Invalid regex: {e}')
+
+
+def select_files(paths=None, since=None):
+    """Catalog files to search, newest first.
+
+    `paths` restricts the search to these files or directories, `since`
+    (epoch seconds) skips files not modified after it.
+    """
+    files = log_catalog.files()
+    if paths:
+        prefixes = tuple(os.path.join(os.path.abspath(path), '') for path in paths)
+        exact = {os.path.abspath(path) for path in paths}
+        files = [f for f in files
+                 if f.path in exact or f.path.startswith(prefixes) or any(member in exact for member in f.members)]
+    if since is not None:
+        files = [f for f in files if f.modified >= since]
+    return files
+
+
+def _count_lines(buf, start, end):
+    count = 0
+    while start < end:
+        # Count in bounded slices, slicing an mmap copies
+        stop = min(start + CHUNK_SIZE, end)
+        count += buf[start:stop].count(b'\n')
+        start = stop
+    return count
+
+
+def _plain_chunks(buf, size):
+    """Line-aligned (buffer, start, end, base offset) ranges of a read or mapped file."""
+    pos = 0
+    while pos < size:
+        end = min(pos + CHUNK_SIZE, size)
+        if end < size:
+            # Only whole lines, so a match never straddles two chunks
+            newline = buf.rfind(b'\n', pos, end)
+            if newline < 0:
+                newline = buf.find(b'\n', end)
+            end = size if newline < 0 else newline + 1
+        yield buf, pos, end, 0
+        pos = end
+
+
+def _aligned_chunks(chunks):
+    """Line-aligned ranges of a stream of byte chunks, one chunk in memory at a time."""
+    carry = b''
+    offset = 0
+    for chunk in chunks:
+        data = carry + chunk if carry else chunk
+        cut = data.rfind(b'\n') + 1
+        if cut == 0:
+            carry = data
+            continue
+        yield data, 0, cut, offset
+        offset += cut
+        carry = data[cut:]
+    if carry:
+        yield carry, 0, len(carry), offset
+
+
+def _archive_chunks(path, compression):
+    """Line-aligned ranges of a decompressed archive."""
+    return _aligned_chunks(decompressed_chunks(path, compression))
+
+
+def _read_chunks(f, size):
+    """The first `size` bytes of an open file in CHUNK_SIZE reads, fewer if it shrank meanwhile."""
+    f.seek(0)
+    while size > 0:
+        chunk = f.read(min(CHUNK_SIZE, size))
+        if not chunk:
+            return
+        size -= len(chunk)
+        yield chunk
+
+
+def _search_chunks(path, chunks, pattern, stop, deadline, emit):
+    line = 0
+    for buf, pos, end, base in chunks:
+        if stop.is_set():
+            return 'stopped'
+        if time.monotonic() > deadline:
+            return 'timeout'
+
+        counted = pos
+        last_line_start = -1
+        for match in pattern.finditer(buf, pos, end):
+            line_start = buf.rfind(b'\n', pos, match.start()) + 1 or pos
+            if line_start == last_line_start:
+                # One result per line
+                continue
+            last_line_start = line_start
+            line_end = buf.find(b'\n', match.start(), end)
+            if line_end < 0:
+                line_end = end
+
+            line += _count_lines(buf, counted, line_start)
+            counted = line_start
+            text = buf[line_start:min(line_end, line_start + MAX_LINE_LENGTH * 4)]
+            if not emit({
+                'path': path,
+                'offset': base + line_start,
+                'line': line,
+                'text': text.decode('utf-8', errors='replace').rstrip('\r')[:MAX_LINE_LENGTH],
+            }):
+                return 'stopped'
+        line += _count_lines(buf, counted, end)
+    return 'done'
+
+
+def _search_file(path, pattern, stop, deadline, emit):
+    """Find matching lines in one file and emit() them. Returns a status."""
+    _, index, compression = split_name(os.path.basename(path))
+    if compression:
+        try:
+            return _search_chunks(path, _archive_chunks(path, compression), pattern, stop, deadline, emit)
+        except BinaryLogError:
+            return 'binary'
+        except (EOFError, lzma.LZMAError) as e:
+            return f'error: {e}'
+
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 'done'
+        if b'\x00' in f.read(SAMPLE_SIZE):
+            return 'binary'
+
+        if size >= MMAP_THRESHOLD and index == 0:
+            # The active file may still be written or truncated, so no mmap;
+            # only search what was there at fstat
+            return _search_chunks(path, _aligned_chunks(_read_chunks(f, size)), pattern, stop, deadline, emit)
+        if size >= MMAP_THRESHOLD:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            f.seek(0)
+            buf = f.read()
+
+        try:
+            # The file may have grown since fstat, only search what we mapped/read
+            return _search_chunks(path, _plain_chunks(buf, len(buf)), pattern, stop, deadline, emit)
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+
+
+def search_logs(pattern, files, max_results=DEFAULT_RESULTS, time_budget=DEFAULT_TIME_BUDGET):
+    """Search files in parallel and yield matches as they are found.
+
+    Each match is {path, offset, line, text}, where path is the member of a
+    rotation set the line is in and `line` is 0-based like the line
+    parameter of read_log(). The last item is a summary with
+    'done': True. The search stops after `max_results` matches or
+    `time_budget` seconds, whichever comes first, and stops the workers
+    as soon as the consumer stops iterating.
+    """
+    deadline = time.monotonic() + time_budget
+    stop = threading.Event()
+    # Bounded, so a slow client pauses the workers instead of buffering matches
+    results = queue.Queue(maxsize=256)
+
+    def emit(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(path):
+        if stop.is_set() or time.monotonic() > deadline:
+            status = 'skipped'
+        else:
+            try:
+                status = _search_file(path, pattern, stop, deadline, emit)
+            except OSError as e:
+                status = f'error: {e.strerror or e}'
+        emit((path, status))
+
+    # Every member of a rotation set is searched, archives included
+    paths = [path for log_file in files for path in log_file.members]
+    for path in paths:
+        _executor.submit(run, path)
+
+    matches = 0
+    pending = len(paths)
+    statuses = {}
+    timed_out = False
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            try:
+                item = results.get(timeout=remaining)
+            except queue.Empty:
+                timed_out = True
+                break
+            if isinstance(item, tuple):
+                path, status = item
+                statuses[path] = status
+                timed_out = timed_out or status == 'timeout'
+                pending -= 1
+                continue
+            yield item
+            matches += 1
+            if matches >= max_results:
+                break
+    finally:
+        stop.set()
+
+    yield {
+        'done': True,
+        'matches': matches,
+        'truncated': matches >= max_results,
+        'timed_out': timed_out,
+        'files_searched': sum(1 for status in statuses.values() if status == 'done'),
+        'files_skipped': [path for path, status in statuses.items() if status not in ('done', 'stopped', 'timeout')],
+    }
@@ -0,0 +1,88 @@
+import threading
+import time
+import psutil
+from .sampler import sampler
+from .processinfo import sample_process_stats
+
+
+class _Watched:
+    __slots__ = ('process', 'stats', 'last_requested')
+
+    def __init__(self, process):
+        self.process = process
+        self.stats = None
+        self.last_requested = time.monotonic()
+
+
+class PidWatch:
+    """Registry of pids someone is looking at, sampled together on each tick.
+
+    The first request for a pid starts tracking it. The sampler then refreshes
+    every watched pid in one pass, and requests just read the latest values.
+    A pid nobody has asked about for `ttl` seconds is dropped again.
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _error(self, pid, message):
+        return {'pid': pid, 'error': message}
+
+    def stats(self, pid):
+        """Latest stats for pid, starting to watch it if needed. Never sleeps."""
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry is None:
+                try:
+                    entry = _Watched(psutil.Process(pid))
+                    # First reading primes cpu_percent, later ones come from the sampler
+                    entry.stats = sample_process_stats(entry.process)
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
+                    return self._error(pid, str(e))
+                self._entries[pid] = entry
+            entry.last_requested = time.monotonic()
+            return entry.stats
+
+    def stats_many(self, pids):
+        return {pid: self.stats(pid) for pid in pids}
+
+    def refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.items())
+
+        expired = []
+        for pid, entry in entries:
+            if now - entry.last_requested > self.ttl:
+                expired.append(pid)
+                continue
+            try:
+                # is_running() compares create times, so a reused pid counts as gone
+                if not entry.process.is_running():
+                    raise psutil.NoSuchProcess(pid)
+                entry.stats = sample_process_stats(entry.process)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
+                entry.stats = self._error(pid, str(e))
+                expired.append(pid)
+
+        with self._lock:
+            for pid in expired:
+                entry = self._entries.get(pid)
+                # Keep entries that were re-requested while we were sampling
+                if entry is not None and (entry.stats.get('error') or now - entry.last_requested > self.ttl):
+                    del self._entries[pid]
+
+        return len(self._entries)
+
+    def __contains__(self, pid):
+        return pid in self._entries
+
+
+pid_watch = PidWatch()
+
+
+@sampler.plugin('watched_pids')
+def collect_watched_pids():
+    return pid_watch.refresh()
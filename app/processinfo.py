@@ -2,25 +2,113 @@ import psutil
 from psutil._common import bytes2human
 from datetime import datetime
 from .systeminfo import get_user_info
+from .sampler import sampler
+from .proctable import process_table
 import os
+import re
+import heapq
+from collections import Counter
+
+SORT_KEYS = ('cpu_percent', 'memory_percent', 'pid', 'name', 'username', 'status', 'num_threads', 'create_time')
+
+# Status histogram keys as returned by the API, mapped from psutil status names
+STATUS_KEYS = {
+    'running': 'running',
+    'sleeping': 'sleeping',
+    'stopped': 'stopped',
+    'zombie': 'zombie',
+    'disk-sleep': 'disk_sleep',
+    'idle': 'idle',
+}
+
+def current_username():
+    return os.environ.get('USER', os.environ.get('USERNAME'))
+
+def status_histogram(snapshot):
+    stats = {key: 0 for key in STATUS_KEYS.values()}
+    # Single pass over the status column instead of one scan per status
+    for status, count in Counter(snapshot.statuses).items():
+        key = STATUS_KEYS.get(status.lower())
+        if key is not None:
+            stats[key] += count
+    stats['total'] = len(snapshot)
+    return stats
+
+def query_processes(snapshot, sort='cpu_percent', descending=True, limit=None, offset=0,
+                    user=None, status=None, name=None, regex=False, search=None):
+    """Filter, sort and page a ProcessSnapshot. Returns (rows, matched_count).
+
+    Filtering and sorting work on row indices over the snapshot columns, and
+    dict rows are only built for the returned page. With a limit only the
+    first offset+limit indices are selected with a heap instead of sorting
+    the whole table. `search` matches a substring of the name or the
+    username, like the process page's search box. Raises ValueError for an
+    unknown sort key or an invalid name regex.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort}'")
+
+    if status:
+        statuses = {s.strip().lower() for s in status.split(',')} if isinstance(status, str) else set(status)
+    else:
+        statuses = None
+
+    if name and regex:
+        try:
+            name_match = re.compile(name, re.IGNORECASE).search
+        except re.error as e:
+            raise ValueError(f"Invalid name pattern: {e}")
+    elif name:
+        needle = name.lower()
+        name_match = lambda value: needle in value.lower()
+    else:
+        name_match = None
+    term = search.lower() if search else None
+
+    indices = range(len(snapshot))
+    if user or statuses or name_match or term:
+        names = snapshot.names
+        usernames = snapshot.usernames
+        status_column = snapshot.statuses
+        indices = [
+            i for i in indices
+            if (not user or usernames[i] == user)
+            and (not statuses or status_column[i].lower() in statuses)
+            and (not name_match or name_match(names[i]))
+            and (not term or term in names[i].lower() or term in (usernames[i] or '').lower())
+        ]
+
+    matched = len(indices)
+    column = snapshot.column(sort)
+    if sort in ('cpu_percent', 'memory_percent'):
+        # Ties on the primary key fall back to the other resource column
+        other = snapshot.column('memory_percent' if sort == 'cpu_percent' else 'cpu_percent')
+        key = lambda i: (column[i], other[i])
+    elif sort in ('name', 'username', 'status'):
+        key = lambda i: column[i].lower()
+    else:
+        key = column.__getitem__
+
+    offset = max(offset or 0, 0)
+    if limit is not None and offset + limit < matched:
+        select = heapq.nlargest if descending else heapq.nsmallest
+        page = select(offset + limit, indices, key=key)[offset:]
+    else:
+        page = sorted(indices, key=key, reverse=descending)[offset:]
+        if limit is not None:
+            page = page[:limit]
+
+    return snapshot.rows(page), matched
 
 def get_process_list(filter_by_user=False):
     processes_list = {}
-    # List of attribues we want to list
-    process_attributes_list = ['pid', 'name', 'username', 'status', 'create_time', 'memory_percent', 'cpu_percent']
-
-    for processes in psutil.process_iter(process_attributes_list):
-        # Either show all processes or filter by current user
-        if not filter_by_user or processes.info['username'] == os.environ.get('USER', os.environ.get('USERNAME')):
-            processes_list[processes.pid] = {
-                'pid': processes.info['pid'],
-                'name': processes.info['name'],
-                'username': processes.info['username'], 
-                'status': processes.info['status'], 
-                'create_time': datetime.fromtimestamp(processes.info['create_time']), 
-                'memory_percent': processes.info['memory_percent'], 
-                'cpu_percent': processes.info['cpu_percent'],
-                }
+    sampler.snapshot()
+
+    # Either show all processes or filter by current user
+    user = current_username() if filter_by_user else None
+    rows, _ = query_processes(process_table.snapshot(), user=user)
+    for process in rows:
+        processes_list[process['pid']] = process
     return processes_list
 
 def get_process_details(pid):
@@ -42,4 +130,59 @@ def get_process_details(pid):
         }
         return process_data
     else:
-        return None
\ No newline at end of file
+        return None
+
+def sample_process_stats(process):
+    """Live stats for a psutil.Process the caller keeps between calls.
+
+    cpu_percent() is measured against the previous call on the same object,
+    so this never sleeps. The first sample of a new object reports 0.0.
+    """
+    with process.oneshot():  # Get all info in a single system call
+        cpu_percent = process.cpu_percent(interval=None)
+
+        # Get memory info directly
+        memory_info = process.memory_info()
+        memory_percent = process.memory_percent()
+        
+        # Get I/O counters safely
+        try:
+            io_counters = process.io_counters()
+            io_info = {
+                'read_bytes': io_counters.read_bytes,
+                'write_bytes': io_counters.write_bytes
+            }
+        except (psutil.AccessDenied, AttributeError):
+            io_info = {'read_bytes': 0, 'write_bytes': 0}
+        
+        # Get process status
+        try:
+            status = process.status()
+        except (psutil.AccessDenied, AttributeError):
+            status = "unknown"
+        
+        # Get thread count
+        try:
+            num_threads = process.num_threads()
+        except (psutil.AccessDenied, AttributeError):
+            num_threads = 0
+
+    return {
+        'cpu_percent': cpu_percent,
+        'memory_percent': memory_percent,
+        'memory_info': {
+            'rss': getattr(memory_info, 'rss', 0),  # Physical memory
+            'vms': getattr(memory_info, 'vms', 0)   # Virtual memory
+        },
+        'num_threads': num_threads,
+        'status': status,
+        'io_info': io_info
+    }
+
+@sampler.plugin('processes', interval=2.0)
+def collect_processes():
+    version = process_table.refresh()
+    return {
+        'version': version,
+        'count': len(process_table)
+    }
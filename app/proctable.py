@@ -0,0 +1,246 @@
+import sys
+import threading
+from array import array
+from collections import deque
+from datetime import datetime
+import psutil
+
+
+def _format_create_time(create_time):
+    return datetime.fromtimestamp(create_time).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ProcessSnapshot:
+    """Columnar, read-only view of the process table at one version.
+
+    Numeric fields live in parallel typed arrays and the string fields hold
+    interned strings, so a snapshot of tens of thousands of processes is a
+    handful of objects rather than a dict per process. Dict rows are only
+    built by row()/rows() for the entries actually rendered or serialized.
+    """
+
+    __slots__ = ('version', 'pids', 'cpu_percent', 'memory_percent', 'num_threads',
+                 'create_time', 'names', 'usernames', 'statuses')
+
+    COLUMNS = ('pid', 'name', 'username', 'status', 'cpu_percent', 'memory_percent',
+               'num_threads', 'create_time')
+
+    def __init__(self, version=0):
+        self.version = version
+        self.pids = array('q')
+        self.cpu_percent = array('d')
+        self.memory_percent = array('d')
+        self.num_threads = array('l')
+        self.create_time = array('d')
+        self.names = []
+        self.usernames = []
+        self.statuses = []
+
+    def append(self, pid, name, username, status, cpu_percent, memory_percent, num_threads, create_time):
+        self.pids.append(pid)
+        self.names.append(name)
+        self.usernames.append(username)
+        self.statuses.append(status)
+        self.cpu_percent.append(cpu_percent)
+        self.memory_percent.append(memory_percent)
+        self.num_threads.append(num_threads)
+        self.create_time.append(create_time)
+
+    def __len__(self):
+        return len(self.pids)
+
+    def column(self, name):
+        """Sequence holding one field for every row, indexed like the snapshot."""
+        return {
+            'pid': self.pids,
+            'name': self.names,
+            'username': self.usernames,
+            'status': self.statuses,
+            'cpu_percent': self.cpu_percent,
+            'memory_percent': self.memory_percent,
+            'num_threads': self.num_threads,
+            'create_time': self.create_time,
+        }[name]
+
+    def row(self, index):
+        return {
+            'pid': self.pids[index],
+            'name': self.names[index],
+            'username': self.usernames[index],
+            'status': self.statuses[index],
+            'cpu_percent': self.cpu_percent[index],
+            'memory_percent': self.memory_percent[index],
+            'num_threads': self.num_threads[index],
+            'create_time': _format_create_time(self.create_time[index])
+        }
+
+    def rows(self, indices=None):
+        if indices is None:
+            indices = range(len(self))
+        return [self.row(i) for i in indices]
+
+
+class _Entry:
+    __slots__ = ('process', 'key', 'name', 'username', 'create_time', 'sample', 'added', 'changed')
+
+    def __init__(self, process, key, name, username, version):
+        self.process = process
+        self.key = key
+        self.name = name
+        self.username = username
+        self.create_time = key[1]
+        self.sample = None
+        self.added = version
+        self.changed = version
+
+    def row(self):
+        status, cpu_percent, memory_percent, num_threads = self.sample
+        return {
+            'pid': self.key[0],
+            'name': self.name,
+            'username': self.username,
+            'status': status,
+            'cpu_percent': cpu_percent,
+            'memory_percent': memory_percent,
+            'num_threads': num_threads,
+            'create_time': _format_create_time(self.create_time)
+        }
+
+
+def _field(read, default):
+    """read(), or default when the process won't tell us."""
+    try:
+        return read()
+    except (psutil.AccessDenied, psutil.ZombieProcess):
+        return default
+
+
+class ProcessTable:
+    """Long-lived process table keyed by (pid, create_time).
+
+    psutil.Process objects are kept between refreshes so cpu_percent() has a
+    previous sample to diff against, and the static fields (name, username,
+    create_time) are only read once per process. Every refresh that changes
+    something bumps a monotonically increasing version so clients can ask for
+    just the rows that changed since the version they already have.
+    """
+
+    def __init__(self, history=120):
+        self.version = 0
+        self._entries = {}
+        self._snapshot = ProcessSnapshot()
+        # (version, [pids]) for recent refreshes that removed processes
+        self._removed = deque(maxlen=history)
+        # Oldest version a delta can still be computed from
+        self._horizon = 0
+        self._lock = threading.Lock()
+
+    def _new_entry(self, process, version):
+        key = (process.pid, process.create_time())
+        with process.oneshot():
+            username = _field(process.username, None)
+            name = _field(process.name, '')
+        # Interned so repeated names and users share one string object
+        return _Entry(process, key, sys.intern(name or ''), sys.intern(username or 'N/A'), version)
+
+    def _sample(self, process):
+        # Fields we may not read (system processes for a non-root user,
+        # zombies) are zeroed rather than dropping the process
+        with process.oneshot():
+            status = _field(process.status, 'unknown')
+            cpu_percent = _field(lambda: process.cpu_percent(interval=None), 0.0)
+            memory_percent = _field(process.memory_percent, 0.0)
+            num_threads = _field(process.num_threads, 0)
+        return (sys.intern(status), round(cpu_percent, 1), round(memory_percent, 1), num_threads)
+
+    def refresh(self):
+        """Sample every process once and return the (possibly unchanged) version."""
+        with self._lock:
+            version = self.version + 1
+            entries = self._entries
+            current = {}
+            removed = []
+            dirty = False
+
+            for pid in psutil.pids():
+                entry = entries.get(pid)
+                try:
+                    # Same pid but a different process, treat as a new row
+                    if entry is not None and not entry.process.is_running():
+                        removed.append(pid)
+                        entry = None
+
+                    if entry is None:
+                        entry = self._new_entry(psutil.Process(pid), version)
+                        entry.sample = self._sample(entry.process)
+                        dirty = True
+                    else:
+                        sample = self._sample(entry.process)
+                        if sample != entry.sample:
+                            entry.sample = sample
+                            entry.changed = version
+                            dirty = True
+                    current[pid] = entry
+                except (psutil.AccessDenied, psutil.ZombieProcess):
+                    # Still running, keep the row (and its last sample) if we have one
+                    if entry is not None:
+                        current[pid] = entry
+                except psutil.NoSuchProcess:
+                    continue
+
+            removed.extend(pid for pid in entries if pid not in current)
+            if removed:
+                self._removed.append((version, removed))
+                dirty = True
+                if len(self._removed) == self._removed.maxlen:
+                    self._horizon = self._removed[0][0] - 1
+
+            self._entries = current
+            if dirty:
+                self.version = version
+                snapshot = ProcessSnapshot(version)
+                for entry in current.values():
+                    snapshot.append(entry.key[0], entry.name, entry.username, *entry.sample, entry.create_time)
+                self._snapshot = snapshot
+            return self.version
+
+    def snapshot(self):
+        """Latest ProcessSnapshot. It is never mutated after being published."""
+        return self._snapshot
+
+    def delta(self, since):
+        """Rows added, changed and removed after `since`, or None if too old."""
+        with self._lock:
+            if since > self.version or since < self._horizon:
+                return None
+
+            added = []
+            changed = []
+            for entry in self._entries.values():
+                if entry.added > since:
+                    added.append(entry.row())
+                elif entry.changed > since:
+                    changed.append(entry.row())
+
+            removed = []
+            for version, pids in self._removed:
+                if version > since:
+                    removed.extend(pids)
+
+            # A pid can be removed and re-added (pid reuse) in the same window
+            added_pids = {row['pid'] for row in added}
+            removed = [pid for pid in removed if pid not in added_pids]
+
+            return {
+                'version': self.version,
+                'since': since,
+                'added': added,
+                'changed': changed,
+                'removed': removed
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+process_table = ProcessTable()
@@ -0,0 +1,360 @@
+import json
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import date as Date, timedelta
+from typing import Dict, List, Iterable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class ProductivityStore(ABC):
+    """Where ProductivityTracker keeps activities, workblocks and settings.
+
+    Records are dicts with an `id` assigned by the store and a `date`
+    ('YYYY-MM-DD'). Backends index them by date (and activities by
+    category) so the tracker never scans the whole history. `version`
+    changes whenever the stored data does, so readers can cache anything
+    derived from it. Backends implement every abstract method, refresh()
+    is only needed by those other processes can write to.
+    """
+
+    version = 0
+
+    def refresh(self) -> None:
+        """Pick up changes made by other writers, bumping `version` if there were any."""
+
+    @abstractmethod
+    def add_activities(self, records: Iterable[Dict]) -> List[Dict]:
+        """Store activity records in one write, returns them with their ids."""
+
+    @abstractmethod
+    def add_workblocks(self, records: Iterable[Dict]) -> List[Dict]:
+        """Store workblock records in one write, returns them with their ids."""
+
+    @abstractmethod
+    def add_records(self, activities: Iterable[Dict], workblocks: Iterable[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Store activities and workblocks together in one write, all of them or none."""
+
+    @abstractmethod
+    def activities(self, date: str, category: Optional[str] = None) -> List[Dict]:
+        """Activities on one date, optionally of one category only."""
+
+    @abstractmethod
+    def activities_by_category(self, category: str) -> List[Dict]:
+        """Activities of one category on any date."""
+
+    @abstractmethod
+    def workblocks(self, date: str) -> List[Dict]:
+        """Workblocks on one date."""
+
+    @abstractmethod
+    def dates(self) -> List[str]:
+        """Dates that have activities, oldest first."""
+
+    @abstractmethod
+    def rollups(self, start: str, end: str) -> Dict[str, Dict[str, float]]:
+        """Minutes per category for each date from start to end (inclusive) that has activities."""
+
+    @abstractmethod
+    def settings(self) -> Dict:
+        """The settings, {"categories": []} if none were stored."""
+
+    @abstractmethod
+    def set_settings(self, settings: Dict) -> None:
+        """Replace the settings."""
+
+    @abstractmethod
+    def clear_date(self, date: str) -> None:
+        """Delete the activities and workblocks of one date."""
+
+    @abstractmethod
+    def export(self) -> Dict:
+        """Everything in the legacy {"activities", "workblocks", "settings"} layout."""
+
+    @abstractmethod
+    def replace(self, data: Dict) -> None:
+        """Replace everything stored with `data` (legacy layout)."""
+
+
+def new_id() -> str:
+    # Unique without coordinating with other writers
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive lock shared by every process using `path`, held on `path`.lock.
+
+    The lock lives in its own file because the data file itself gets
+    replaced by renames.
+    """
+    with open(path + '.lock', 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_atomic(path: str, text: str) -> None:
+    """Replace path with text: readers see the old file or the new one, never half of it."""
+    with open(path + '.tmp', 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _line(entry) -> str:
+    return json.dumps(entry, separators=(',', ':')) + '\n'
+
+
+class LogStore(ProductivityStore):
+    """Append-only JSON lines log with in-memory indexes.
+
+    Every write appends one line ({"op": ..., ...}, a batch being a
+    single "batch" line) to the log, so a write costs the same whatever the
+    size of the history and a batch is applied entirely or not at all. The
+    indexes are built once by replaying the log and then kept current by
+    reading only the bytes appended since, which also picks up records
+    written by other processes. A log that shrank or was replaced (see
+    replace()) is replayed from the start.
+
+    Writers in every process serialize on file_lock(). A line left
+    unfinished by a crash is skipped on replay and terminated before the
+    next append, so it never swallows the following record.
+    """
+
+    def __init__(self, path: str, legacy_file: Optional[str] = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_id = None
+        self._offset = 0
+        self.version = 0
+        self._reset()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path) and legacy_file and os.path.exists(legacy_file):
+            self._import(legacy_file)
+        self.refresh()
+
+    def _reset(self):
+        self._activities = {}  # id -> record, in insertion order
+        self._workblocks = {}
+        self._by_date = {}  # date -> {id: record}
+        self._by_category = {}  # category -> {id: record}
+        self._workblocks_by_date = {}
+        # date -> {category: minutes}, kept up to date as records are applied
+        self._rollups = {}
+        self._settings = None
+
+    def _import(self, legacy_file):
+        # One-time migration from the old whole-file JSON format
+        try:
+            with open(legacy_file) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        with file_lock(self.path):
+            # Another process may have imported it meanwhile
+            if not os.path.exists(self.path):
+                write_atomic(self.path, self._entries(data))
+
+    # Reading
+
+    def refresh(self) -> None:
+        """Apply whatever was appended to the log since the last read."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if (stat.st_dev, stat.st_ino) == self._file_id and stat.st_size == self._offset:
+                return
+            with open(self.path, 'rb') as f:
+                # The file opened, which may have been replaced since the stat
+                stat = os.fstat(f.fileno())
+                file_id = (stat.st_dev, stat.st_ino)
+                if file_id != self._file_id or stat.st_size < self._offset:
+                    self._reset()
+                    self._file_id = file_id
+                    self._offset = 0
+                    self.version += 1
+                f.seek(self._offset)
+                chunk = f.read(stat.st_size - self._offset)
+            # A writer may be halfway through a line, leave it for next time
+            end = chunk.rfind(b'\n') + 1
+            for line in chunk[:end].splitlines():
+                if line.strip():
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+            if end:
+                self._offset += end
+                self.version += 1
+
+    def _apply(self, entry):
+        op = entry['op']
+        if op == 'batch':
+            for item in entry['entries']:
+                self._apply(item)
+        elif op == 'activity':
+            record = entry['record']
+            self._activities[record['id']] = record
+            self._by_date.setdefault(record['date'], {})[record['id']] = record
+            self._by_category.setdefault(record['category'], {})[record['id']] = record
+            day = self._rollups.setdefault(record['date'], {})
+            day[record['category']] = day.get(record['category'], 0) + record.get('duration', 0)
+        elif op == 'workblock':
+            record = entry['record']
+            self._workblocks[record['id']] = record
+            self._workblocks_by_date.setdefault(record['date'], {})[record['id']] = record
+        elif op == 'settings':
+            self._settings = entry['settings']
+        elif op == 'clear_date':
+            date = entry['date']
+            self._rollups.pop(date, None)
+            for record in self._by_date.pop(date, {}).values():
+                del self._activities[record['id']]
+                self._by_category[record['category']].pop(record['id'], None)
+            for record in self._workblocks_by_date.pop(date, {}).values():
+                del self._workblocks[record['id']]
+
+    def activities(self, date, category=None):
+        with self._lock:
+            self.refresh()
+            records = self._by_date.get(date, {}).values()
+            if category is not None:
+                return [record for record in records if record['category'] == category]
+            return list(records)
+
+    def activities_by_category(self, category):
+        with self._lock:
+            self.refresh()
+            return list(self._by_category.get(category, {}).values())
+
+    def workblocks(self, date):
+        with self._lock:
+            self.refresh()
+            return list(self._workblocks_by_date.get(date, {}).values())
+
+    def dates(self):
+        with self._lock:
+            self.refresh()
+            return sorted(date for date, records in self._by_date.items() if records)
+
+    def rollups(self, start, end):
+        # One lookup per day in the range, however many activities they hold
+        with self._lock:
+            self.refresh()
+            day, last = Date.fromisoformat(start), Date.fromisoformat(end)
+            found = {}
+            while day <= last:
+                minutes = self._rollups.get(day.isoformat())
+                if minutes:
+                    found[day.isoformat()] = dict(minutes)
+                day += timedelta(days=1)
+            return found
+
+    def settings(self):
+        with self._lock:
+            self.refresh()
+            return self._settings or {"categories": []}
+
+    def export(self):
+        with self._lock:
+            self.refresh()
+            return {
+                "activities": list(self._activities.values()),
+                "workblocks": list(self._workblocks.values()),
+                "settings": self.settings(),
+            }
+
+    # Writing
+
+    def _append(self, entries):
+        entries = list(entries)
+        line = _line(entries[0] if len(entries) == 1 else {'op': 'batch', 'entries': entries})
+        with self._lock, file_lock(self.path):
+            with open(self.path, 'ab') as f:
+                if f.tell() > 0:
+                    with open(self.path, 'rb') as tail:
+                        tail.seek(-1, os.SEEK_END)
+                        if tail.read(1) != b'\n':
+                            # Finish the line a crashed writer left behind
+                            line = '\n' + line
+                f.write(line.encode('utf-8'))
+            self.refresh()
+
+    @staticmethod
+    def _with_ids(records):
+        added = []
+        for record in records:
+            record = dict(record)
+            record.setdefault('id', new_id())
+            added.append(record)
+        return added
+
+    def add_records(self, activities, workblocks):
+        activities, workblocks = self._with_ids(activities), self._with_ids(workblocks)
+        entries = ([{'op': 'activity', 'record': record} for record in activities] +
+                   [{'op': 'workblock', 'record': record} for record in workblocks])
+        if entries:
+            # One line for both kinds, so a crash can't keep only some of them
+            self._append(entries)
+        return activities, workblocks
+
+    def add_activities(self, records):
+        return self.add_records(records, ())[0]
+
+    def add_workblocks(self, records):
+        return self.add_records((), records)[1]
+
+    def set_settings(self, settings):
+        self._append([{'op': 'settings', 'settings': settings}])
+
+    def clear_date(self, date):
+        self._append([{'op': 'clear_date', 'date': date}])
+
+    @staticmethod
+    def _entries(data):
+        entries = [{'op': 'settings', 'settings': data.get('settings') or {"categories": []}}]
+        for op, key in (('activity', 'activities'), ('workblock', 'workblocks')):
+            seen = set()
+            for record in data.get(key) or []:
+                # Legacy ids were len() + 1 and can repeat
+                record_id = str(record.get('id') or '')
+                if not record_id or record_id in seen:
+                    record_id = new_id()
+                seen.add(record_id)
+                entries.append({'op': op, 'record': dict(record, id=record_id)})
+        return ''.join(_line(entry) for entry in entries)
+
+    def replace(self, data):
+        """Rewrite the log to hold exactly `data` (legacy layout)."""
+        text = self._entries(data)
+        with self._lock, file_lock(self.path):
+            write_atomic(self.path, text)
+            self.refresh()
+
+    def compact(self) -> None:
+        """Rewrite the log without cleared records and superseded settings."""
+        with self._lock, file_lock(self.path):
+            self.refresh()
+            write_atomic(self.path, self._entries(self.export()))
+            self.refresh()
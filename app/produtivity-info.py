@@ -1,97 +1,208 @@
 from datetime import datetime, timedelta
-import json
 import os
+import threading
 from typing import Dict, List, Tuple, Any
+from .productivity_store import ProductivityStore, LogStore
+
+# The dashboard's three scores and the detailed categories that count towards
+# each on days without Focus/Breaks summary entries of their own
+SCORE_GROUPS = {
+    "Focus": ("Focus", "Code", "Documentation", "Design"),
+    "Meetings": ("Meetings",),
+    "Breaks": ("Breaks", "Messaging", "Email", "Task Management", "Productivity", "Miscellaneous")
+}
+MAX_REPORT_DAYS = 366
+
+def _format_minutes(minutes) -> str:
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours} hr {minutes} min"
+
+def _day_scores(minutes: Dict[str, float]) -> Dict[str, float]:
+    """Focus, Meetings and Breaks minutes from one day's minutes per category."""
+    if minutes.get("Focus") or minutes.get("Breaks"):
+        # Summary entries (as generate_mock_data writes) already add up the details
+        return {name: minutes.get(name, 0) for name in SCORE_GROUPS}
+    return {name: sum(minutes.get(c, 0) for c in categories) for name, categories in SCORE_GROUPS.items()}
+
+def _as_datetime(value) -> datetime:
+    """A naive local datetime from a datetime or an ISO 8601 string.
+
+    Times with a UTC offset are converted to local time, as everything else
+    in the tracker compares against datetime.now() and keys dates locally.
+    """
+    if isinstance(value, str):
+        # fromisoformat() before Python 3.11 doesn't take the Z suffix
+        value = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    elif not isinstance(value, datetime):
+        raise ValueError(f"Expected a datetime or ISO 8601 string, got {value!r}")
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+def _date_key(date) -> str:
+    """The 'YYYY-MM-DD' key records are indexed by, from a date, datetime or string."""
+    if isinstance(date, datetime):
+        return date.date().isoformat()
+    return date if isinstance(date, str) else date.isoformat()
 
 class ProductivityTracker:
-    def __init__(self, data_file=None):
-        """Initialize the productivity tracker with optional data file path."""
+    def __init__(self, data_file=None, store: ProductivityStore = None):
+        """Initialize the productivity tracker with optional data file path or storage backend."""
         self.data_file = data_file or os.path.join(os.path.dirname(__file__), 'data', 'productivity_data.json')
-        self.today = datetime.now().date()
+        # Records are appended to a log next to the old JSON file, which is imported once
+        self.store = store or LogStore(os.path.splitext(self.data_file)[0] + '.log', legacy_file=self.data_file)
+        # Values derived from the store, dropped whenever its version changes
+        self._cache = {}
+        self._cache_version = None
+        self._cache_lock = threading.Lock()
         self._ensure_data_file()
 
+    @property
+    def today(self):
+        """Today's date, read on every use so a long-lived tracker rolls over at midnight."""
+        return datetime.now().date()
+
     def _ensure_data_file(self):
-        """Ensure the data file exists, create it if it doesn't."""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        if not os.path.exists(self.data_file):
-            with open(self.data_file, 'w') as f:
-                json.dump({
-                    "activities": [],
-                    "workblocks": [],
-                    "settings": {
-                        "categories": [
-                            {"name": "Focus", "color": "#00E5B9"},
-                            {"name": "Meetings", "color": "#9747FF"},
-                            {"name": "Breaks", "color": "#3E7BFA"},
-                            {"name": "Code", "color": "#00E5B9"},
-                            {"name": "Documentation", "color": "#00E5B9"},
-                            {"name": "Design", "color": "#00E5B9"},
-                            {"name": "Messaging", "color": "#9747FF"},
-                            {"name": "Email", "color": "#9747FF"},
-                            {"name": "Task Management", "color": "#3E7BFA"},
-                            {"name": "Productivity", "color": "#3E7BFA"},
-                            {"name": "Miscellaneous", "color": "#888888"}
-                        ]
-                    }
-                }, f, indent=2)
+        """Ensure the store has settings, write the default categories if it doesn't."""
+        if not self.store.settings().get("categories"):
+            self.store.set_settings({
+                "categories": [
+                    {"name": "Focus", "color": "#00E5B9"},
+                    {"name": "Meetings", "color": "#9747FF"},
+                    {"name": "Breaks", "color": "#3E7BFA"},
+                    {"name": "Code", "color": "#00E5B9"},
+                    {"name": "Documentation", "color": "#00E5B9"},
+                    {"name": "Design", "color": "#00E5B9"},
+                    {"name": "Messaging", "color": "#9747FF"},
+                    {"name": "Email", "color": "#9747FF"},
+                    {"name": "Task Management", "color": "#3E7BFA"},
+                    {"name": "Productivity", "color": "#3E7BFA"},
+                    {"name": "Miscellaneous", "color": "#888888"}
+                ]
+            })
 
     def load_data(self) -> Dict:
-        """Load productivity data from the JSON file."""
-        try:
-            with open(self.data_file, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {"activities": [], "workblocks": [], "settings": {"categories": []}}
+        """Load all productivity data (activities, workblocks and settings)."""
+        return self.store.export()
 
     def save_data(self, data: Dict) -> None:
-        """Save productivity data to the JSON file."""
-        with open(self.data_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Replace all productivity data."""
+        self.store.replace(data)
+
+    def _cached(self, key, build):
+        """Return build() for key, built once per store version."""
+        self.store.refresh()
+        with self._cache_lock:
+            if self._cache_version != self.store.version:
+                self._cache = {}
+                self._cache_version = self.store.version
+            if key not in self._cache:
+                self._cache[key] = build()
+            return self._cache[key]
+
+    def _colors(self) -> Dict[str, str]:
+        """Category name to color, from the settings."""
+        return self._cached("colors", lambda: {c["name"]: c["color"] for c in self.store.settings()["categories"]})
+
+    def _day(self, date_str: str) -> Dict[str, Any]:
+        """Minutes per category and display-ready workblocks for one date."""
+        def build():
+            minutes = self.store.rollups(date_str, date_str).get(date_str, {})
+
+            # Sort by start time and format for display
+            workblocks = sorted(self.store.workblocks(date_str), key=lambda x: x["start_time"])
+            formatted_blocks = [{
+                "time": datetime.fromisoformat(block["start_time"]).strftime("%H:%M"),
+                "activity": block["activity"]
+            } for block in workblocks]
 
-    def add_activity(self, category: str, start_time: datetime, end_time: datetime, description: str = "") -> None:
-        """Add a new activity to the tracker."""
-        data = self.load_data()
+            return {"minutes": minutes, "workblocks": formatted_blocks}
+        return self._cached(("day", date_str), build)
 
-        # Calculate duration in minutes
-        duration = (end_time - start_time).total_seconds() / 60
+    def _activity_record(self, category, start_time, end_time, description="") -> Dict[str, Any]:
+        """Validate one activity and build the record stored for it."""
+        if not isinstance(category, str) or not category:
+            raise ValueError("An activity needs a category")
+        start_time, end_time = _as_datetime(start_time), _as_datetime(end_time)
+        if end_time < start_time:
+            raise ValueError(f"Activity ends before it starts ({start_time.isoformat()})")
 
-        activity = {
-            "id": len(data["activities"]) + 1,
+        return {
             "category": category,
             "start_time": start_time.isoformat(),
             "end_time": end_time.isoformat(),
-            "duration": duration,
-            "description": description,
+            # Duration in minutes
+            "duration": (end_time - start_time).total_seconds() / 60,
+            "description": description or "",
             "date": start_time.date().isoformat()
         }
 
-        data["activities"].append(activity)
-        self.save_data(data)
+    def _workblock_record(self, start_time, activity) -> Dict[str, Any]:
+        """Validate one workblock and build the record stored for it."""
+        if not isinstance(activity, str) or not activity:
+            raise ValueError("A workblock needs an activity")
+        start_time = _as_datetime(start_time)
 
-    def add_workblock(self, start_time: datetime, activity: str) -> None:
-        """Add a new workblock to the tracker."""
-        data = self.load_data()
-
-        workblock = {
-            "id": len(data["workblocks"]) + 1,
+        return {
             "start_time": start_time.isoformat(),
             "activity": activity,
             "date": start_time.date().isoformat()
         }
 
-        data["workblocks"].append(workblock)
-        self.save_data(data)
+    def add_activity(self, category: str, start_time: datetime, end_time: datetime, description: str = "") -> Dict:
+        """Add a new activity to the tracker."""
+        return self.store.add_activities([self._activity_record(category, start_time, end_time, description)])[0]
+
+    def add_workblock(self, start_time: datetime, activity: str) -> Dict:
+        """Add a new workblock to the tracker."""
+        return self.store.add_workblocks([self._workblock_record(start_time, activity)])[0]
+
+    def _activity_records(self, activities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        records = []
+        for index, activity in enumerate(activities):
+            try:
+                records.append(self._activity_record(activity["category"], activity["start_time"],
+                                                     activity["end_time"], activity.get("description", "")))
+            except KeyError as e:
+                raise ValueError(f"Activity {index}: missing {e}")
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Activity {index}: {e}")
+        return records
+
+    def _workblock_records(self, workblocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        records = []
+        for index, workblock in enumerate(workblocks):
+            try:
+                records.append(self._workblock_record(workblock["start_time"], workblock["activity"]))
+            except KeyError as e:
+                raise ValueError(f"Workblock {index}: missing {e}")
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Workblock {index}: {e}")
+        return records
+
+    def add_activities(self, activities: List[Dict[str, Any]]) -> List[Dict]:
+        """Add several activities in one write, all of them or none.
+
+        Each is a dict with category, start_time and end_time (datetimes or
+        ISO 8601 strings) and an optional description. Raises ValueError
+        naming the first invalid one.
+        """
+        return self.store.add_activities(self._activity_records(activities))
+
+    def add_workblocks(self, workblocks: List[Dict[str, Any]]) -> List[Dict]:
+        """Add several workblocks ({start_time, activity} dicts) in one write, all of them or none."""
+        return self.store.add_workblocks(self._workblock_records(workblocks))
+
+    def add_bulk(self, activities=(), workblocks=()) -> Tuple[List[Dict], List[Dict]]:
+        """Validate every activity and workblock first, then write them all in one batch."""
+        return self.store.add_records(self._activity_records(activities), self._workblock_records(workblocks))
 
     def get_daily_scores(self, date=None) -> Dict[str, Dict[str, Any]]:
         """Get the daily scores for focus, meetings, and breaks."""
-        date = date or self.today
-        date_str = date.isoformat() if isinstance(date, datetime) else date
-
-        data = self.load_data()
-        activities = [a for a in data["activities"] if a["date"] == date_str]
+        day_minutes = self._day(_date_key(date or self.today))["minutes"]
 
         # Calculate total minutes for the day
-        total_minutes = sum(a["duration"] for a in activities)
+        total_minutes = sum(day_minutes.values())
 
         # Group by main categories
         categories = {
@@ -100,10 +211,9 @@ class ProductivityTracker:
             "Breaks": {"minutes": 0, "percentage": 0, "color": "#3E7BFA"}
         }
 
-        for activity in activities:
-            category = activity["category"]
+        for category, minutes in day_minutes.items():
             if category in categories:
-                categories[category]["minutes"] += activity["duration"]
+                categories[category]["minutes"] += minutes
 
         # Calculate percentages
         if total_minutes > 0:
@@ -117,48 +227,22 @@ class ProductivityTracker:
 
     def get_workblocks(self, date=None) -> List[Dict[str, Any]]:
         """Get the workblocks for a specific date."""
-        date = date or self.today
-        date_str = date.isoformat() if isinstance(date, datetime) else date
-
-        data = self.load_data()
-        workblocks = [w for w in data["workblocks"] if w["date"] == date_str]
-
-        # Sort by start time
-        workblocks.sort(key=lambda x: x["start_time"])
-
-        # Format for display
-        formatted_blocks = []
-        for block in workblocks:
-            start_time = datetime.fromisoformat(block["start_time"])
-            formatted_blocks.append({
-                "time": start_time.strftime("%H:%M"),
-                "activity": block["activity"]
-            })
-
-        return formatted_blocks
+        # Copies, the cached blocks are shared with other callers
+        return [dict(block) for block in self._day(_date_key(date or self.today))["workblocks"]]
 
     def get_time_breakdown(self, date=None) -> List[Dict[str, Any]]:
         """Get the time breakdown by activity category."""
-        date = date or self.today
-        date_str = date.isoformat() if isinstance(date, datetime) else date
-
-        data = self.load_data()
-        activities = [a for a in data["activities"] if a["date"] == date_str]
+        day_minutes = self._day(_date_key(date or self.today))["minutes"]
+        colors = self._colors()
 
         # Group by all categories
         categories = {}
-        for activity in activities:
-            category = activity["category"]
-            if category not in categories:
-                # Find color from settings
-                color = next((c["color"] for c in data["settings"]["categories"]
-                             if c["name"] == category), "#888888")
-                categories[category] = {
-                    "minutes": 0,
-                    "percentage": 0,
-                    "color": color
-                }
-            categories[category]["minutes"] += activity["duration"]
+        for category, minutes in day_minutes.items():
+            categories[category] = {
+                "minutes": minutes,
+                "percentage": 0,
+                "color": colors.get(category, "#888888")
+            }
 
         # Calculate total minutes
         total_minutes = sum(categories[c]["minutes"] for c in categories)
@@ -176,17 +260,107 @@ class ProductivityTracker:
 
         return breakdown
 
+    def get_range_report(self, start, end) -> Dict[str, Any]:
+        """Totals per category, a daily trend and focus/meeting ratios from start to end (inclusive).
+
+        Built from the store's daily rollups, so it costs one lookup per day
+        however many activities the range holds. Category totals are compared
+        with the period of the same length just before it.
+        """
+        start_str, end_str = _date_key(start), _date_key(end)
+        first = datetime.fromisoformat(start_str).date()
+        last = datetime.fromisoformat(end_str).date()
+        if last < first:
+            raise ValueError("The report ends before it starts")
+        days = (last - first).days + 1
+        if days > MAX_REPORT_DAYS:
+            raise ValueError(f"Reports cover at most {MAX_REPORT_DAYS} days")
+
+        rollups = self.store.rollups(start_str, end_str)
+        previous = self.store.rollups((first - timedelta(days=days)).isoformat(),
+                                      (first - timedelta(days=1)).isoformat())
+        colors = self._colors()
+
+        # Totals per category and per score, and the day by day trend
+        totals = {}
+        scores = {name: 0 for name in SCORE_GROUPS}
+        daily = []
+        for offset in range(days):
+            day = (first + timedelta(days=offset)).isoformat()
+            minutes = rollups.get(day, {})
+            for category, value in minutes.items():
+                totals[category] = totals.get(category, 0) + value
+            day_scores = _day_scores(minutes)
+            for name, value in day_scores.items():
+                scores[name] += value
+            daily.append({"date": day, "minutes": sum(minutes.values()),
+                          **{name.lower(): value for name, value in day_scores.items()}})
+
+        previous_totals = {}
+        for minutes in previous.values():
+            for category, value in minutes.items():
+                previous_totals[category] = previous_totals.get(category, 0) + value
+
+        total_minutes = sum(totals.values())
+        categories = []
+        for category, minutes in totals.items():
+            before = previous_totals.get(category, 0)
+            categories.append({
+                "category": category,
+                "minutes": minutes,
+                "percentage": round((minutes / total_minutes) * 100) if total_minutes else 0,
+                "color": colors.get(category, "#888888"),
+                "formatted_time": _format_minutes(minutes),
+                "daily_average": minutes / days,
+                "previous_minutes": before,
+                # None when there is nothing to compare with
+                "change_percent": round((minutes - before) / before * 100) if before else None
+            })
+        categories.sort(key=lambda x: x["minutes"], reverse=True)
+
+        scored = sum(scores.values())
+        return {
+            "start": start_str,
+            "end": end_str,
+            "days": days,
+            "active_days": len(rollups),
+            "total_minutes": total_minutes,
+            "formatted_time": _format_minutes(total_minutes),
+            "previous_total_minutes": sum(previous_totals.values()),
+            "categories": categories,
+            "scores": {name: {"minutes": minutes, "formatted_time": _format_minutes(minutes),
+                              "color": colors.get(name, "#888888")} for name, minutes in scores.items()},
+            "ratios": {
+                "focus": scores["Focus"] / scored if scored else 0,
+                "meetings": scores["Meetings"] / scored if scored else 0,
+                "breaks": scores["Breaks"] / scored if scored else 0,
+                "focus_to_meetings": scores["Focus"] / scores["Meetings"] if scores["Meetings"] else None
+            },
+            "daily": daily
+        }
+
+    def get_weekly_report(self, date=None) -> Dict[str, Any]:
+        """Report for the week (Monday to Sunday) containing date."""
+        day = datetime.fromisoformat(_date_key(date or self.today)).date()
+        monday = day - timedelta(days=day.weekday())
+        return self.get_range_report(monday, monday + timedelta(days=6))
+
+    def get_monthly_report(self, date=None) -> Dict[str, Any]:
+        """Report for the calendar month containing date."""
+        day = datetime.fromisoformat(_date_key(date or self.today)).date()
+        first = day.replace(day=1)
+        next_month = (first + timedelta(days=32)).replace(day=1)
+        return self.get_range_report(first, next_month - timedelta(days=1))
+
     def get_upcoming_meeting(self) -> Dict[str, Any]:
         """Get the next upcoming meeting."""
         now = datetime.now()
-        data = self.load_data()
 
         # Filter activities for today and future that are meetings
         today_str = now.date().isoformat()
         upcoming_meetings = [
-            a for a in data["activities"]
+            a for a in self.store.activities_by_category("Meetings")
             if a["date"] >= today_str and
-            a["category"] == "Meetings" and
             datetime.fromisoformat(a["start_time"]) > now
         ]
 
@@ -213,9 +387,7 @@ class ProductivityTracker:
             date = datetime.fromisoformat(date).date()
 
         # Clear existing data for this date
-        data = self.load_data()
-        data["activities"] = [a for a in data["activities"] if a["date"] != date.isoformat()]
-        data["workblocks"] = [w for w in data["workblocks"] if w["date"] != date.isoformat()]
+        self.store.clear_date(date.isoformat())
 
         # Generate workblocks
         workblocks = [
@@ -229,10 +401,12 @@ class ProductivityTracker:
             {"time": "17:10", "activity": "Documentation"}
         ]
 
+        blocks = []
         for block in workblocks:
             hour, minute = map(int, block["time"].split(":"))
             block_time = datetime.combine(date, datetime.min.time().replace(hour=hour, minute=minute))
-            self.add_workblock(block_time, block["activity"])
+            blocks.append({"start_time": block_time, "activity": block["activity"]})
+        self.add_workblocks(blocks)
 
         # Generate activities with durations
         activities = [
@@ -255,27 +429,44 @@ class ProductivityTracker:
         # Add main category activities
         start_time = datetime.combine(date, datetime.min.time().replace(hour=9))
 
-        self.add_activity("Focus", start_time, start_time + timedelta(minutes=focus_time))
-        self.add_activity("Meetings", start_time, start_time + timedelta(minutes=meeting_time))
-        self.add_activity("Breaks", start_time, start_time + timedelta(minutes=break_time))
+        records = [
+            {"category": "Focus", "start_time": start_time, "end_time": start_time + timedelta(minutes=focus_time)},
+            {"category": "Meetings", "start_time": start_time, "end_time": start_time + timedelta(minutes=meeting_time)},
+            {"category": "Breaks", "start_time": start_time, "end_time": start_time + timedelta(minutes=break_time)}
+        ]
 
         # Add detailed activities
         current_time = start_time
         for activity in activities:
             end_time = current_time + timedelta(minutes=activity["duration"])
-            self.add_activity(activity["category"], current_time, end_time)
+            records.append({"category": activity["category"], "start_time": current_time, "end_time": end_time})
             current_time = end_time
 
         # Add upcoming meeting in 54 minutes from now
         now = datetime.now()
         meeting_time = now + timedelta(minutes=54)
-        self.add_activity("Meetings", meeting_time, meeting_time + timedelta(minutes=30), "Team Sync")
+        records.append({"category": "Meetings", "start_time": meeting_time,
+                        "end_time": meeting_time + timedelta(minutes=30), "description": "Team Sync"})
+
+        # One write for the whole day
+        self.add_activities(records)
 
         print(f"Generated mock data for {date.isoformat()}")
 
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_tracker() -> ProductivityTracker:
+    """The shared tracker, so each render reuses its loaded store and cache."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ProductivityTracker()
+        return _tracker
+
 def get_productivity_data():
     """Get all productivity data for the dashboard."""
-    tracker = ProductivityTracker()
+    tracker = get_tracker()
 
     # For demo purposes, generate mock data if no data exists
     if not tracker.get_workblocks():
@@ -285,5 +476,6 @@ def get_productivity_data():
         "scores": tracker.get_daily_scores(),
         "workblocks": tracker.get_workblocks(),
         "time_breakdown": tracker.get_time_breakdown(),
-        "upcoming_meeting": tracker.get_upcoming_meeting()
+        "upcoming_meeting": tracker.get_upcoming_meeting(),
+        "weekly_report": tracker.get_weekly_report()
     }
\ No newline at end of file
@@ -0,0 +1,180 @@
+import time
+from array import array
+from collections import deque
+
+# Counters that were 32-bit on the kernel side wrap at this value
+WRAP_32 = 2 ** 32
+
+# Moving average windows reported by summary(), in seconds
+WINDOWS = {'avg_1m': 60, 'avg_5m': 300, 'avg_15m': 900}
+
+
+class _Window:
+    """Running totals over the newest `seconds` of a CounterRing."""
+
+    __slots__ = ('seconds', 'tail', 'elapsed', 'totals')
+
+    def __init__(self, seconds, fields):
+        self.seconds = seconds
+        self.tail = 0       # sequence number of the oldest entry included
+        self.elapsed = 0.0
+        self.totals = dict.fromkeys(fields, 0)
+
+
+class CounterRing:
+    """Fixed-size history of per-interval deltas for one device's counters.
+
+    add() takes cumulative counters with a monotonic timestamp and stores
+    the delta since the previous call and the elapsed time in preallocated
+    arrays, overwriting the oldest entry once full. A counter that goes
+    backwards is treated as a 32-bit wrap when that explains it, otherwise
+    as a reset (interface or device re-created) and that interval is
+    skipped rather than reported as a huge or negative rate.
+
+    Moving averages and the peak are maintained incrementally on add(), so
+    reading a summary never walks the history.
+    """
+
+    def __init__(self, fields, capacity=900, windows=WINDOWS):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.resets = 0
+        self._elapsed = array('d', bytes(8 * capacity))
+        self._deltas = {field: array('d', bytes(8 * capacity)) for field in self.fields}
+        self._sequence = 0  # entries ever stored, entry n lives at n % capacity
+        self._last = None   # (timestamp, {field: counter})
+        self._windows = {name: _Window(seconds, self.fields) for name, seconds in windows.items()}
+        # Per field, (sequence, rate) candidates for the peak in decreasing rate order
+        self._peaks = {field: deque() for field in self.fields}
+
+    def add(self, counters, timestamp=None):
+        """Record cumulative counters. Returns False if no interval was stored."""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        last = self._last
+        self._last = (timestamp, counters)
+        if last is None:
+            return False
+        last_timestamp, last_counters = last
+        elapsed = timestamp - last_timestamp
+        if elapsed <= 0:
+            return False
+
+        deltas = []
+        for field in self.fields:
+            delta = counters[field] - last_counters[field]
+            if delta < 0:
+                previous = last_counters[field]
+                if previous < WRAP_32 and previous - counters[field] > WRAP_32 // 2:
+                    delta += WRAP_32
+                else:
+                    self.resets += 1
+                    return False
+            deltas.append(delta)
+
+        sequence = self._sequence
+        oldest = sequence - self.capacity
+        # The slot about to be overwritten leaves every window that still holds it
+        for window in self._windows.values():
+            if window.tail <= oldest:
+                self._evict(window)
+
+        index = sequence % self.capacity
+        self._elapsed[index] = elapsed
+        for field, delta in zip(self.fields, deltas):
+            self._deltas[field][index] = delta
+            peaks = self._peaks[field]
+            rate = delta / elapsed
+            while peaks and peaks[-1][1] <= rate:
+                peaks.pop()
+            peaks.append((sequence, rate))
+            if peaks[0][0] <= oldest:
+                peaks.popleft()
+        self._sequence = sequence + 1
+
+        for window in self._windows.values():
+            window.elapsed += elapsed
+            for field, delta in zip(self.fields, deltas):
+                window.totals[field] += delta
+            # Drop old entries while the window still spans `seconds` without them
+            while window.tail < sequence and window.elapsed - self._elapsed[window.tail % self.capacity] >= window.seconds:
+                self._evict(window)
+        return True
+
+    def _evict(self, window):
+        index = window.tail % self.capacity
+        window.elapsed -= self._elapsed[index]
+        for field in self.fields:
+            window.totals[field] -= self._deltas[field][index]
+        window.tail += 1
+
+    def current(self, field):
+        """Rate over the latest interval, or None before two samples."""
+        if not self._sequence:
+            return None
+        index = (self._sequence - 1) % self.capacity
+        return self._deltas[field][index] / self._elapsed[index]
+
+    def average(self, field, window):
+        """Time-weighted rate over one of the WINDOWS, e.g. 'avg_5m'."""
+        window = self._windows[window]
+        return window.totals[field] / window.elapsed if window.elapsed > 0 else None
+
+    def peak(self, field):
+        """Highest single-interval rate still in the history."""
+        peaks = self._peaks[field]
+        return peaks[0][1] if peaks else None
+
+    def recent(self, seconds, fields):
+        """(elapsed, deltas...) per interval over the newest `seconds`, newest first."""
+        columns = [self._deltas[field] for field in fields]
+        covered = 0.0
+        sequence = self._sequence - 1
+        oldest = max(0, self._sequence - self.capacity)
+        while sequence >= oldest and covered < seconds:
+            index = sequence % self.capacity
+            elapsed = self._elapsed[index]
+            covered += elapsed
+            yield (elapsed,) + tuple(column[index] for column in columns)
+            sequence -= 1
+
+    def summary(self, field):
+        result = {'current': self.current(field), 'peak': self.peak(field)}
+        for name in self._windows:
+            result[name] = self.average(field, name)
+        return result
+
+    def summaries(self):
+        return {field: self.summary(field) for field in self.fields}
+
+
+class RateRegistry:
+    """One CounterRing per device name, created on first sight.
+
+    update() is fed the full set of devices on every sample, so devices
+    that disappear (unplugged NICs, detached disks) are dropped and start
+    from scratch if they come back.
+    """
+
+    def __init__(self, fields, seconds=900, interval=1.0):
+        self.fields = tuple(fields)
+        self.capacity = int(seconds / interval) + 1
+        self._rings = {}
+
+    def update(self, counters, timestamp=None):
+        """counters: {device: {field: cumulative value}}."""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        for name in list(self._rings):
+            if name not in counters:
+                del self._rings[name]
+        for name, values in counters.items():
+            ring = self._rings.get(name)
+            if ring is None:
+                ring = self._rings[name] = CounterRing(self.fields, self.capacity)
+            ring.add(values, timestamp)
+
+    def get(self, name):
+        return self._rings.get(name)
+
+    def summaries(self, name):
+        ring = self._rings.get(name)
+        return ring.summaries() if ring is not None else None
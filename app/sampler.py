@@ -0,0 +1,147 @@
+import threading
+import time
+from types import MappingProxyType
+
+
+class Snapshot:
+    """Immutable view of the most recent values produced by every plugin."""
+
+    __slots__ = ('version', 'timestamp', 'data', 'errors')
+
+    def __init__(self, version, timestamp, data, errors):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'timestamp', timestamp)
+        object.__setattr__(self, 'data', MappingProxyType(data))
+        object.__setattr__(self, 'errors', MappingProxyType(errors))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Snapshot is immutable')
+
+    def get(self, name, default=None):
+        return self.data.get(name, default)
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def __contains__(self, name):
+        return name in self.data
+
+
+class Sampler:
+    """Collects system metrics on a fixed cadence in a single background thread.
+
+    Collectors are registered as plugins. Each tick runs the plugins that are
+    due, then publishes a new Snapshot that request handlers read without
+    touching psutil themselves.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._plugins = {}
+        self._next_run = {}
+        self._subscribers = []
+        self._snapshot = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._tick_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._published = threading.Event()
+        self._thread = None
+
+    def register(self, name, collector, interval=None):
+        # interval=None means the plugin runs on every tick
+        self._plugins[name] = (collector, interval)
+        self._next_run[name] = 0.0
+
+    def plugin(self, name, interval=None):
+        def decorator(collector):
+            self.register(name, collector, interval)
+            return collector
+        return decorator
+
+    def subscribe(self, callback):
+        # callback(snapshot) is invoked from the sampler thread after each tick
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        try:
+            self._subscribers.remove(callback)
+        except ValueError:
+            pass
+
+    def tick(self):
+        with self._tick_lock:
+            now = time.monotonic()
+            previous = self._snapshot
+            data = dict(previous.data) if previous else {}
+            errors = dict(previous.errors) if previous else {}
+
+            for name, (collector, interval) in list(self._plugins.items()):
+                if interval is not None and now < self._next_run[name]:
+                    continue
+                try:
+                    data[name] = collector()
+                    errors.pop(name, None)
+                except Exception as e:
+                    # Keep serving the last good value for this plugin
+                    errors[name] = str(e)
+                if interval is not None:
+                    self._next_run[name] = now + interval
+
+            with self._lock:
+                self._version += 1
+                snapshot = Snapshot(self._version, time.time(), data, errors)
+                self._snapshot = snapshot
+            self._published.set()
+
+        for callback in list(self._subscribers):
+            try:
+                callback(snapshot)
+            except Exception:
+                pass
+
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.tick()
+            elapsed = time.monotonic() - started
+            self._stop.wait(max(0.0, self.interval - elapsed))
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self):
+        """Return the latest snapshot, starting the sampler on first use."""
+        if not self.running:
+            self.start()
+        if self._snapshot is None:
+            # Wait for the first tick rather than racing the sampler thread
+            self._published.wait(timeout=max(self.interval * 2, 5.0))
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.tick()
+        return snapshot
+
+    def get(self, name, default=None):
+        return self.snapshot().get(name, default)
+
+
+sampler = Sampler()
@@ -0,0 +1,31 @@
+// Alert notifications on every page: a toast when a rule fires or resolves
+// and a badge with the number of alerts currently firing.
+(function() {
+    const container = document.createElement('div');
+    container.className = 'alert-toasts';
+    document.body.appendChild(container);
+
+    function toast(event) {
+        const div = document.createElement('div');
+        div.className = `alert-toast alert-toast-${event.state}`;
+        const value = typeof event.value === 'number' ? ` (${+event.value.toFixed(2)})` : '';
+        div.textContent = `${event.state === 'firing' ? 'Firing' : 'Resolved'}: ${event.name}${value}`;
+        container.appendChild(div);
+        setTimeout(() => div.remove(), event.state === 'firing' ? 15000 : 6000);
+    }
+
+    function updateBadge(active) {
+        const badge = document.getElementById('alerts-badge');
+        if (!badge) {
+            return;
+        }
+        badge.textContent = active.length;
+        badge.title = active.map(alert => alert.name).join('\n');
+        badge.style.display = active.length ? '' : 'none';
+    }
+
+    Live.subscribe('alerts', {}, data => {
+        data.events.forEach(toast);
+        updateBadge(data.active);
+    });
+})();
@@ -0,0 +1,57 @@
+// Subscriptions to the /live Socket.IO namespace.
+//
+// Live.subscribe(topic, options, handler) asks the server to push a topic
+// ('system', 'processes', 'process', 'network', 'disks', 'alerts') and calls handler
+// with every update. It returns false when the Socket.IO client could not be
+// loaded so pages can fall back to polling the REST API.
+const Live = (function() {
+    const EVENTS = {
+        system: 'system_update',
+        processes: 'process_update',
+        process: 'process_stats_update',
+        network: 'network_update',
+        disks: 'disk_update',
+        alerts: 'alert_update'
+    };
+
+    let socket = null;
+    const subscriptions = [];
+
+    function connect() {
+        if (socket || typeof io === 'undefined') {
+            return socket;
+        }
+        socket = io('/live');
+        // Subscriptions live on the server per connection, so replay them
+        // after every (re)connect
+        socket.on('connect', () => {
+            subscriptions.forEach(request => socket.emit('subscribe', request, ack => {
+                if (ack && !ack.success) {
+                    console.error(`Subscription to ${request.topic} failed:`, ack.error);
+                }
+            }));
+        });
+        return socket;
+    }
+
+    function subscribe(topic, options, handler) {
+        const s = connect();
+        if (!s) {
+            return false;
+        }
+        const request = Object.assign({ topic: topic }, options || {});
+        subscriptions.push(request);
+        s.on(EVENTS[topic], data => {
+            if (topic === 'process' && data.pid !== request.pid) {
+                return;
+            }
+            handler(data);
+        });
+        if (s.connected) {
+            s.emit('subscribe', request);
+        }
+        return true;
+    }
+
+    return { subscribe: subscribe };
+})();
@@ -1,11 +1,23 @@
 import platform
 import psutil
 from datetime import datetime
+from types import MappingProxyType
 from psutil._common import bytes2human
+from .sampler import sampler
+from .battery import BatteryModel
+from .rates import RateRegistry
+from .diskio import disk_rates, disk_metrics, block_device
 
-def get_platform_info():
+battery_model = BatteryModel()
+
+NET_FIELDS = ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv', 'errin', 'errout', 'dropin', 'dropout')
+# 15 minutes of per-tick deltas for every NIC
+net_rates = RateRegistry(NET_FIELDS, seconds=15 * 60, interval=sampler.interval)
+
+def _host_facts():
+    # platform.processor() and architecture() can fork a subprocess, and none
+    # of this changes while we run, so it is read once at import
     uname = platform.uname()
-    boot_time = psutil.boot_time()
     if psutil.MACOS:
         os_name = 'apple'
     elif psutil.WINDOWS:
@@ -15,48 +27,60 @@ def get_platform_info():
     else:
         os_name = 'Unknown'
 
-    platform_info = {
+    return {
         'os_name': os_name,
+        'node': uname.node,
         'node_name': uname.node.split('.')[0],
-        'system_name': uname.system,
-        'release_version': uname.release,
+        'system': uname.system,
+        'release': uname.release,
+        'version': uname.version,
+        'machine': uname.machine,
+        'processor': uname.processor,
         'architecture': platform.architecture()[0],
         'processor_type': platform.processor(),
-        'boot_time': datetime.now() - datetime.fromtimestamp(boot_time),
+        'boot_timestamp': psutil.boot_time(),
+    }
+
+HOST_FACTS = MappingProxyType(_host_facts())
 
+def get_uptime():
+    return datetime.now() - datetime.fromtimestamp(HOST_FACTS['boot_timestamp'])
+
+def get_platform_info():
+    platform_info = {
+        'os_name': HOST_FACTS['os_name'],
+        'node_name': HOST_FACTS['node_name'],
+        'system_name': HOST_FACTS['system'],
+        'release_version': HOST_FACTS['release'],
+        'architecture': HOST_FACTS['architecture'],
+        'processor_type': HOST_FACTS['processor_type'],
+        'boot_time': get_uptime(),
     }
 
     return platform_info
 
 def get_power_info():
-    try:
-        power_data = psutil.sensors_battery()
-        if power_data is None:
-            return {
-                'percent': 0,
-                'time_remaining': 'No battery',
-                'power_source': 'AC Power'
-            }
-
-        if power_data.secsleft in (psutil.POWER_TIME_UNKNOWN, psutil.POWER_TIME_UNLIMITED):
-            time_remaining = 'Calculating'
-        else:
-            time_remaining = str(round(power_data.secsleft / 3600, 2)) + ' hrs'
-
-        power_info = {
-            'percent': int(power_data.percent),
-            'time_remaining': time_remaining,
-            'power_source': 'AC Power' if power_data.power_plugged else 'Battery Power'
-        }
-        
-        return power_info
-    except Exception:
+    battery = sampler.get('battery')
+    if not battery['present']:
         return {
             'percent': 0,
-            'time_remaining': 'Error',
-            'power_source': 'Unknown'
+            'time_remaining': 'No battery',
+            'power_source': 'AC Power'
         }
 
+    if battery['secs_left'] is None:
+        time_remaining = 'Calculating'
+    else:
+        time_remaining = str(round(battery['secs_left'] / 3600, 2)) + ' hrs'
+
+    power_info = {
+        'percent': int(battery['percent']),
+        'time_remaining': time_remaining,
+        'power_source': 'AC Power' if battery['power_plugged'] else 'Battery Power'
+    }
+
+    return power_info
+
 def get_user_info():
     user_data = psutil.users()
     user_info = {}
@@ -73,68 +97,261 @@ def get_user_info():
     return user_info
 
 def get_memory_info():
-    vmemory_data = psutil.virtual_memory()
-    smemory_data = psutil.swap_memory()
+    memory = sampler.get('memory')
 
     memory_data = {
-        'svmem_total': bytes2human(vmemory_data.total),
-        'svem_percent': vmemory_data.percent,
-        'smem_total': bytes2human(smemory_data.total),
-        'smem_percent': smemory_data.percent
+        'svmem_total': bytes2human(memory['total']),
+        'svem_percent': memory['percent'],
+        'smem_total': bytes2human(memory['swap_total']),
+        'smem_percent': memory['swap_percent']
     }
     
     return memory_data
 
 def get_disks_info():
     disk_data = {}
-    disk_partitions = psutil.disk_partitions(all=False)
-    for counter,partition in enumerate(disk_partitions):
-        try:
-            usage_data = psutil.disk_usage(partition.mountpoint)
-            disk_data[counter] = {
-                'device': partition.device,
-                'mounted': partition.mountpoint,
-                'total': bytes2human(usage_data.total),
-                'used': bytes2human(usage_data.used),
-                'free': bytes2human(usage_data.free),
-                'percent': usage_data.percent
-            }
-        except (PermissionError, OSError):
-            continue
+    disk_io = sampler.get('disk_io') or {}
+    for counter, partition in enumerate(sampler.get('disks')['partitions']):
+        # Live I/O of the block device behind the mount, next to its capacity
+        io_device = block_device(partition['device'], disk_io)
+        disk_data[counter] = {
+            'device': partition['device'],
+            'mounted': partition['mountpoint'],
+            'total': bytes2human(partition['total']),
+            'used': bytes2human(partition['used']),
+            'free': bytes2human(partition['free']),
+            'percent': partition['percent'],
+            'io_device': io_device,
+            'io': disk_io[io_device]['metrics'] if io_device else None
+        }
     return disk_data
 
+def _format_rate(interface, field):
+    rates = interface['rates']
+    if not rates or rates[field]['current'] is None:
+        return None
+    return bytes2human(rates[field]['current']) + '/s'
+
 def get_network_info():
     network_data = {}
-    if_addrs = psutil.net_if_addrs()
-    io_counter = psutil.net_io_counters(pernic=True)
 
-    for interface_name, interface_addresses in if_addrs.items():
-        for address in interface_addresses:
-            if int(address.family) == 2:
-                if interface_name in io_counter:
-                    io = io_counter[interface_name]
-                    network_data[interface_name] = {
-                        'name': interface_name,
-                        'ip_address': address.address,
-                        'sent_bytes': bytes2human(io.bytes_sent),
-                        'received_bytes': bytes2human(io.bytes_recv),
-                    }
+    for interface_name, interface in sampler.get('network').items():
+        if interface['address'] is not None and interface['has_counters']:
+            network_data[interface_name] = {
+                'name': interface_name,
+                'ip_address': interface['address'],
+                'sent_bytes': bytes2human(interface['bytes_sent']),
+                'received_bytes': bytes2human(interface['bytes_recv']),
+                'sent_rate': _format_rate(interface, 'bytes_sent'),
+                'received_rate': _format_rate(interface, 'bytes_recv'),
+                'speed': interface['speed'],
+            }
 
     return network_data
 
 def get_disk_io():
+    return sampler.get('disk_io')
+
+# Sampler plugins. These are the only places that query psutil for the
+# shared metrics, every route reads the results from the latest snapshot.
+
+@sampler.plugin('cpu')
+def collect_cpu():
+    # interval=None measures usage since the previous tick instead of sleeping
+    return {
+        'percent': psutil.cpu_percent(interval=None),
+        'count': psutil.cpu_count()
+    }
+
+@sampler.plugin('memory')
+def collect_memory():
+    vmemory_data = psutil.virtual_memory()
+    smemory_data = psutil.swap_memory()
+
+    return {
+        'total': vmemory_data.total,
+        'available': vmemory_data.available,
+        'used': vmemory_data.used,
+        'free': vmemory_data.free,
+        'percent': vmemory_data.percent,
+        'swap_total': smemory_data.total,
+        'swap_used': smemory_data.used,
+        'swap_free': smemory_data.free,
+        'swap_percent': smemory_data.percent
+    }
+
+def _disk_usage(device, mountpoint):
+    usage_data = psutil.disk_usage(mountpoint)
+    return {
+        'device': device,
+        'mountpoint': mountpoint,
+        'total': usage_data.total,
+        'used': usage_data.used,
+        'free': usage_data.free,
+        'percent': usage_data.percent
+    }
+
+@sampler.plugin('disks', interval=5.0)
+def collect_disks():
+    partitions = []
+    for partition in psutil.disk_partitions(all=False):
+        try:
+            partitions.append(_disk_usage(partition.device, partition.mountpoint))
+        except (PermissionError, OSError):
+            continue
+
+    try:
+        root = _disk_usage(None, '/')
+    except (PermissionError, OSError):
+        root = None
+
+    return {
+        'partitions': partitions,
+        'root': root
+    }
+
+@sampler.plugin('disk_io')
+def collect_disk_io():
     disk_io = {}
     try:
-        io_counters = psutil.disk_io_counters(perdisk=True)
-        for disk_name, counters in io_counters.items():
-            disk_io[disk_name] = {
-                'read_count': counters.read_count,
-                'write_count': counters.write_count,
-                'read_bytes': counters.read_bytes,
-                'write_bytes': counters.write_bytes,
-                'read_time': counters.read_time,
-                'write_time': counters.write_time
-            }
+        io_counters = psutil.disk_io_counters(perdisk=True) or {}
     except (PermissionError, OSError):
-        pass
-    return disk_io
\ No newline at end of file
+        return disk_io
+
+    # busy_time only exists on Linux (and FreeBSD)
+    has_busy_time = any(hasattr(counters, 'busy_time') for counters in io_counters.values())
+    disk_rates.update({
+        disk_name: {field: getattr(counters, field, 0) for field in disk_rates.fields}
+        for disk_name, counters in io_counters.items()
+    })
+
+    for disk_name, counters in io_counters.items():
+        disk_io[disk_name] = {
+            'read_count': counters.read_count,
+            'write_count': counters.write_count,
+            'read_bytes': counters.read_bytes,
+            'write_bytes': counters.write_bytes,
+            'read_time': counters.read_time,
+            'write_time': counters.write_time,
+            'busy_time': getattr(counters, 'busy_time', None),
+            'metrics': disk_metrics(disk_name, has_busy_time)
+        }
+    return disk_io
+
+def _utilisation(rates, speed):
+    # Percent of link capacity in each direction (links are full duplex)
+    if not rates or not speed:
+        return None
+    capacity = speed * 1000000 / 8
+    sent = rates['bytes_sent']['current']
+    recv = rates['bytes_recv']['current']
+    return {
+        'sent': round(sent / capacity * 100, 2) if sent is not None else None,
+        'recv': round(recv / capacity * 100, 2) if recv is not None else None
+    }
+
+@sampler.plugin('network')
+def collect_network():
+    network_data = {}
+    if_addrs = psutil.net_if_addrs()
+    io_counters = psutil.net_io_counters(pernic=True)
+    stats = psutil.net_if_stats()
+
+    # Rates come from monotonic deltas kept per NIC across ticks
+    net_rates.update({name: io._asdict() for name, io in io_counters.items()})
+
+    for interface_name, interface_addresses in if_addrs.items():
+        ipv4_addr = next((addr.address for addr in interface_addresses if int(addr.family) == 2), None)
+        io = io_counters.get(interface_name)
+        interface_stats = stats.get(interface_name)
+        # Link speed in Mbit/s, 0 when the driver doesn't report one (loopback, wifi, VMs)
+        speed = interface_stats.speed if interface_stats else 0
+        rates = net_rates.summaries(interface_name)
+        network_data[interface_name] = {
+            'address': ipv4_addr,
+            'has_counters': io is not None,
+            'bytes_sent': io.bytes_sent if io else 0,
+            'bytes_recv': io.bytes_recv if io else 0,
+            'packets_sent': io.packets_sent if io else 0,
+            'packets_recv': io.packets_recv if io else 0,
+            'errin': io.errin if io else 0,
+            'errout': io.errout if io else 0,
+            'dropin': io.dropin if io else 0,
+            'dropout': io.dropout if io else 0,
+            'isup': interface_stats.isup if interface_stats else False,
+            'speed': speed,
+            'rates': rates,
+            'utilisation': _utilisation(rates, speed)
+        }
+
+    return network_data
+
+@sampler.plugin('process_count')
+def collect_process_count():
+    return len(psutil.pids())
+
+def _format_duration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, _ = divmod(remainder, 60)
+    return f"{hours}h {minutes}m"
+
+@sampler.plugin('battery', interval=5.0)
+def collect_battery():
+    battery_info = {
+        'present': False,
+        'percent': 0,
+        'power_plugged': False,
+        'status': 'Unknown',
+        'time_remaining': 'Unknown',
+        'secs_left': None,
+        'drain_rate': None
+    }
+
+    try:
+        battery = psutil.sensors_battery()
+    except Exception:
+        battery = None
+
+    if battery is None:
+        # Battery might not be available on desktop systems
+        battery_info['status'] = "Not available"
+        battery_info['time_remaining'] = "N/A"
+        return battery_info
+
+    battery_model.add_sample(battery.percent, battery.power_plugged)
+
+    battery_info['present'] = True
+    battery_info['percent'] = battery.percent
+    battery_info['power_plugged'] = battery.power_plugged
+
+    if battery.power_plugged:
+        if battery.percent >= 100:
+            battery_info['status'] = 'Fully Charged'
+            battery_info['time_remaining'] = "Fully charged"
+        else:
+            battery_info['status'] = 'Charging'
+            battery_info['time_remaining'] = "Charging"
+        return battery_info
+
+    battery_info['status'] = 'Discharging'
+
+    rate = battery_model.discharge_rate()
+    secs_left = battery_model.time_remaining()
+    if rate is not None:
+        battery_info['drain_rate'] = round(rate * 3600, 2)  # percent per hour
+
+    if secs_left is not None:
+        battery_info['time_remaining'] = f"{_format_duration(secs_left)} remaining"
+    elif 0 < battery.secsleft < 43200:
+        # Not enough history yet, use the OS estimate if it looks sane
+        secs_left = battery.secsleft
+        battery_info['time_remaining'] = f"{_format_duration(secs_left)} remaining"
+    elif battery.percent > 0:
+        # Very rough estimate as last resort, assuming 4 hours at 100%
+        secs_left = battery.percent / 100.0 * 4 * 3600
+        battery_info['time_remaining'] = f"{_format_duration(secs_left)} remaining (estimated)"
+    else:
+        battery_info['time_remaining'] = "Low battery"
+
+    battery_info['secs_left'] = secs_left
+    return battery_info
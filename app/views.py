@@ -1,7 +1,21 @@
 from app import app
-from flask import render_template, url_for, redirect, jsonify, request, send_file
+from flask import render_template, url_for, redirect, jsonify, request, send_file, Response, stream_with_context
 from .systeminfo import *
-from .processinfo import get_process_list, get_process_details
+from .processinfo import get_process_list, get_process_details, query_processes, status_histogram
+from .sampler import sampler
+from .proctable import process_table
+from .pidwatch import pid_watch
+from .history import metric_store
+from .logreader import read_log, BinaryLogError
+from .logcatalog import log_catalog, APP_LOG_DIR
+from .logrotation import rotation_members
+from .connections import connection_collector, DEFAULT_PAGE_SIZE
+from .httpcache import cached_json, cached_response, json_response, dumps
+from . import exporter
+from .fleet import fleet_store, decode_batch, ingest_slots, RETRY_AFTER, TOP_N as FLEET_TOP_N
+from .alerts import alert_engine
+from .activitycapture import ActivityCapture
+from . import logsearch
 import os
 import psutil
 from datetime import datetime
@@ -10,6 +24,24 @@ import platform
 import signal
 import ctypes
 import socket
+import hmac
+import importlib
+import atexit
+
+# The module name has a hyphen, so it can't be imported with a plain import statement
+productivity = importlib.import_module('.produtivity-info', __package__)
+
+# Opt-in: record which kinds of apps are in use as productivity activities
+activity_capture = None
+if os.environ.get('ACTIVITY_CAPTURE'):
+    activity_capture = ActivityCapture(productivity.get_tracker(),
+                                       interval=float(os.environ.get('ACTIVITY_CAPTURE_INTERVAL', 5)))
+    activity_capture.start()
+    # The running activity and unflushed ones are written on shutdown
+    atexit.register(activity_capture.stop)
+
+LOG_PAGE_SIZE = 50
+MAX_LOG_PAGE_SIZE = 500
 
 @app.route('/')
 def main():
@@ -49,10 +81,15 @@ def process_details(process_id=None):
 
 @app.route('/network')
 def network():
+    # Connections come from the background collector, not a scan per render
+    inventory = connection_collector.inventory()
+    connections, matched = inventory.query()
     context = {
         'platform_info': get_platform_info(),
         'network_info': get_network_info(),
-        'network_connections': psutil.net_connections(kind='inet'),
+        'network_connections': connections,
+        'connections_matched': matched,
+        'connection_summary': inventory.summary,
     }
     return render_template("network.html", context=context)
 
@@ -61,277 +98,298 @@ def disks():
     context = {
         'platform_info': get_platform_info(),
         'disk_info': get_disks_info(),
-        'disk_io': psutil.disk_io_counters(perdisk=True),
+        'disk_io': get_disk_io(),
     }
     return render_template("disks.html", context=context)
 
+@app.route('/fleet')
+def fleet():
+    context = {
+        'platform_info': get_platform_info(),
+        'fleet': fleet_store.overview(),
+    }
+    return render_template("fleet.html", context=context)
+
 @app.route('/logs')
 def logs():
-    log_files = []
-    
-    # Windows-specific log directories and event logs
-    windows_logs = [
-        os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'Logs'),
-        os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'debug'),
-        os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'system32', 'winevt', 'Logs'),
-        os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'System32', 'LogFiles'),
-        os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'System32', 'config'),
-        os.path.join(os.environ.get('SYSTEMDRIVE', 'C:'), 'ProgramData', 'Microsoft', 'Windows', 'WER'),
-        'C:\\ProgramData\\Microsoft\\Windows\\WER\\ReportArchive',
-        'C:\\ProgramData\\Microsoft\\Windows\\WER\\ReportQueue'
-    ]
-    
-    # Common log file extensions
-    log_extensions = ['.log', '.txt', '.evt', '.evtx', '.etl', '.wer', '.dmp']
-    
-    # Check Windows logs
-    for log_dir in windows_logs:
-        if os.path.exists(log_dir):
-            try:
-                for root, dirs, files in os.walk(log_dir):
-                    for file in files:
-                        file_ext = os.path.splitext(file)[1].lower()
-                        if file_ext in log_extensions:
-                            try:
-                                full_path = os.path.join(root, file)
-                                file_size = os.path.getsize(full_path)
-                                log_files.append({
-                                    'name': file,
-                                    'path': full_path,
-                                    'size': bytes2human(file_size),
-                                    'modified': datetime.fromtimestamp(os.path.getmtime(full_path))
-                                })
-                                # Limit to 50 files to prevent overload
-                                if len(log_files) >= 50:
-                                    break
-                            except (PermissionError, OSError):
-                                continue
-                    if len(log_files) >= 50:
-                        break
-            except (PermissionError, OSError):
-                pass
-    
-    # Also check application logs
-    app_log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-    if not os.path.exists(app_log_dir):
-        os.makedirs(app_log_dir, exist_ok=True)
+    # Make sure there is at least one application log to show
+    if not os.path.exists(APP_LOG_DIR):
+        os.makedirs(APP_LOG_DIR, exist_ok=True)
         # Create a sample log file
-        with open(os.path.join(app_log_dir, 'app.log'), 'w') as f:
+        with open(os.path.join(APP_LOG_DIR, 'app.log'), 'w') as f:
             f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Application started\n")
-    
-    # Add application logs
-    if os.path.exists(app_log_dir):
-        for file in os.listdir(app_log_dir):
-            if file.endswith(tuple(log_extensions)):
-                full_path = os.path.join(app_log_dir, file)
-                log_files.append({
-                    'name': file,
-                    'path': full_path,
-                    'size': bytes2human(os.path.getsize(full_path)),
-                    'modified': datetime.fromtimestamp(os.path.getmtime(full_path))
-                })
-    
-    # Sort logs by modification time (newest first)
-    log_files.sort(key=lambda x: x['modified'], reverse=True)
-    
+        log_catalog.refresh()
+
+    page, total = log_catalog.page(0, LOG_PAGE_SIZE)
+    log_files = [{
+        'name': log_file.name,
+        'path': log_file.path,
+        'size': bytes2human(log_file.size),
+        'modified': datetime.fromtimestamp(log_file.modified),
+        'type': log_file.type,
+        'rotated': len(log_file.members) - 1
+    } for log_file in page]
+
     context = {
         'platform_info': get_platform_info(),
         'log_files': log_files,
+        'log_total': total,
+        'log_page_size': LOG_PAGE_SIZE,
     }
     return render_template("logs.html", context=context)
 
-@app.route('/api/system-stats')
-def system_stats():
-    import psutil
-    
-    # Get CPU usage as percentage
-    cpu_percent = psutil.cpu_percent(interval=0.1)
-    
-    # Get memory usage
-    memory = psutil.virtual_memory()
-    memory_percent = memory.percent
-    
-    # Get disk usage for the main disk
-    disk = psutil.disk_usage('/')
-    disk_percent = disk.percent
-    
-    # Get process count
-    process_count = len(psutil.pids())
-    
-    # Get battery information
-    battery_info = {
-        'percent': 0,
-        'power_plugged': False,
-        'status': 'Unknown',
-        'time_remaining': 'Unknown'
+def build_system_stats(snapshot):
+    # Everything here comes from the background sampler, no psutil calls
+    root_disk = snapshot['disks']['root']
+
+    return {
+        'cpu_percent': snapshot['cpu']['percent'],
+        'memory_percent': snapshot['memory']['percent'],
+        'disk_percent': root_disk['percent'] if root_disk else 0,
+        'process_count': snapshot['process_count'],
+        'battery': snapshot['battery']
     }
-    
-    try:
-        battery = psutil.sensors_battery()
-        if battery:
-            battery_info['percent'] = battery.percent
-            battery_info['power_plugged'] = battery.power_plugged
-            
-            # Determine status
-            if battery.power_plugged:
-                if battery.percent >= 100:
-                    battery_info['status'] = 'Fully Charged'
-                else:
-                    battery_info['status'] = 'Charging'
-            else:
-                battery_info['status'] = 'Discharging'
-            
-            # Calculate time remaining
-            if not battery.power_plugged:
-                try:
-                    # Get battery drain rate over last minute
-                    battery_rate = psutil.sensors_battery().percent
-                    # Wait for a short time to calculate rate
-                    time.sleep(0.5)
-                    current_percent = psutil.sensors_battery().percent
-                    drain_rate = (battery_rate - current_percent) * 2  # percent per minute
-
-                    if drain_rate > 0:  # If battery is actually draining
-                        # Calculate minutes remaining based on current drain rate
-                        minutes_remaining = current_percent / drain_rate if drain_rate > 0 else 0
-                        hours = int(minutes_remaining // 60)
-                        minutes = int(minutes_remaining % 60)
-                        battery_info['time_remaining'] = f"{hours}h {minutes}m remaining"
-                    else:
-                        # Fallback to system provided value if available and reasonable
-                        if battery.secsleft > 0 and battery.secsleft < 43200:  # Less than 12 hours
-                            hours, remainder = divmod(battery.secsleft, 3600)
-                            minutes, _ = divmod(remainder, 60)
-                            battery_info['time_remaining'] = f"{hours}h {minutes}m remaining"
-                        else:
-                            # Very rough estimate as last resort
-                            hours = int((battery.percent / 100.0) * 4)  # Assuming 4 hours at 100%
-                            minutes = int(((battery.percent / 100.0) * 4 - hours) * 60)
-                            battery_info['time_remaining'] = f"{hours}h {minutes}m remaining (estimated)"
-                except:
-                    # Fallback to basic calculation if rate calculation fails
-                    if battery.percent > 0:
-                        hours = int((battery.percent / 100.0) * 4)  # Assuming 4 hours at 100%
-                        minutes = int(((battery.percent / 100.0) * 4 - hours) * 60)
-                        battery_info['time_remaining'] = f"{hours}h {minutes}m remaining (estimated)"
-                    else:
-                        battery_info['time_remaining'] = "Low battery"
-            elif battery.power_plugged:
-                if battery.percent >= 100:
-                    battery_info['time_remaining'] = "Fully charged"
-                else:
-                    battery_info['time_remaining'] = "Charging"
-    except Exception as e:
-        # Battery might not be available on desktop systems
-        battery_info['status'] = "Not available"
-        battery_info['time_remaining'] = "N/A"
-    
-    return jsonify({
-        'cpu_percent': cpu_percent,
-        'memory_percent': memory_percent,
-        'disk_percent': disk_percent,
-        'process_count': process_count,
-        'battery': battery_info
-    })
 
-@app.route('/api/system-info')
-def system_info():
-    import psutil
-    import platform
-    from datetime import datetime
-    
-    # Get platform information
-    uname = platform.uname()
-    boot_time = psutil.boot_time()
+def build_system_info(snapshot):
+    # Platform facts are read once at startup, only the uptime moves
     platform_info = {
-        'system': uname.system,
-        'node': uname.node,
-        'release': uname.release,
-        'version': uname.version,
-        'machine': uname.machine,
-        'processor': uname.processor,
-        'boot_time': str(datetime.now() - datetime.fromtimestamp(boot_time))
+        'system': HOST_FACTS['system'],
+        'node': HOST_FACTS['node'],
+        'release': HOST_FACTS['release'],
+        'version': HOST_FACTS['version'],
+        'machine': HOST_FACTS['machine'],
+        'processor': HOST_FACTS['processor'],
+        'boot_time': str(get_uptime())
     }
-    
+
     # Get memory information
-    memory = psutil.virtual_memory()
-    swap = psutil.swap_memory()
+    memory = snapshot['memory']
     memory_info = {
-        'total': memory.total,
-        'available': memory.available,
-        'used': memory.used,
-        'free': memory.free,
-        'swap_total': swap.total,
-        'swap_used': swap.used
+        'total': memory['total'],
+        'available': memory['available'],
+        'used': memory['used'],
+        'free': memory['free'],
+        'swap_total': memory['swap_total'],
+        'swap_used': memory['swap_used']
     }
     
     # Get network information
     network_info = {}
-    interfaces = psutil.net_if_addrs()
-    io_counters = psutil.net_io_counters(pernic=True)
-    stats = psutil.net_if_stats()
-    
-    for interface, addrs in interfaces.items():
-        ipv4_addr = next((addr.address for addr in addrs if addr.family == 2), None)
+    for interface, data in snapshot['network'].items():
         network_info[interface] = {
-            'address': ipv4_addr,
-            'bytes_sent': io_counters[interface].bytes_sent if interface in io_counters else 0,
-            'bytes_recv': io_counters[interface].bytes_recv if interface in io_counters else 0,
-            'isup': stats[interface].isup if interface in stats else False
+            'address': data['address'],
+            'bytes_sent': data['bytes_sent'],
+            'bytes_recv': data['bytes_recv'],
+            'isup': data['isup']
         }
     
-    return jsonify({
+    return {
         'platform_info': platform_info,
         'memory_info': memory_info,
         'network_info': network_info
-    })
+    }
+
+def build_process_update(since=None):
+    """Full process table, or the delta since a version the client already has."""
+    snapshot = process_table.snapshot()
+    process_stats = status_histogram(snapshot)
+
+    if since is not None:
+        delta = process_table.delta(since)
+        # None means the client is too far behind, fall through to a full table
+        if delta is not None:
+            delta['full'] = False
+            delta['stats'] = process_stats
+            return delta
+
+    return {
+        'full': True,
+        'version': snapshot.version,
+        'processes': snapshot.rows(),
+        'stats': process_stats
+    }
+
+def connection_query(args):
+    # Filters and paging for the connection detail list, from request args
+    return {
+        'offset': args.get('offset', 0, type=int),
+        'limit': args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+        'status': args.get('status'),
+        'pid': args.get('pid', type=int),
+        'port': args.get('port', type=int),
+        'remote': args.get('remote'),
+        'type': args.get('type'),
+    }
+
+def build_network_stats(snapshot, query=None):
+    # Get network interfaces information
+    interfaces = {}
+    for interface, data in snapshot['network'].items():
+        interfaces[interface] = {
+            'address': data['address'],
+            'bytes_sent': data['bytes_sent'],
+            'bytes_recv': data['bytes_recv'],
+            'isup': data['isup'],
+            # Link speed in Mbit/s (0 if unknown) and rates computed by the sampler
+            'speed': data['speed'],
+            'rates': data['rates'],
+            'utilisation': data['utilisation']
+        }
+    
+    # Connections come from the background collector's last scan
+    inventory = connection_collector.inventory()
+    connections, matched = inventory.query(**(query or {}))
+
+    return {
+        'interfaces': interfaces,
+        'connections': connections,
+        'connections_matched': matched,
+        'connection_summary': inventory.summary
+    }
+
+def build_disk_stats(snapshot):
+    return {
+        'disk_info': get_disks_info(),
+        'disk_io': snapshot['disk_io'],
+        'success': True
+    }
+
+# Sections of /api/snapshot. Each builder gets the sampler snapshot and the
+# part of the field after the first dot, e.g. 'rates' for net.rates
+SNAPSHOT_FIELDS = ('cpu', 'memory', 'disks', 'net', 'processes', 'battery')
+MAX_TOP_PROCESSES = 100
+
+def _subfield(value, field, name):
+    if field is None:
+        return value
+    if field not in value:
+        raise ValueError(f"Unknown field '{name}'")
+    return value[field]
+
+def _snapshot_host(snapshot, field, name):
+    host = dict(HOST_FACTS, uptime=time.time() - HOST_FACTS['boot_timestamp'])
+    return _subfield(host, field, name)
+
+def _snapshot_disks(snapshot, field, name):
+    disks = dict(snapshot['disks'], io=snapshot['disk_io'])
+    return _subfield(disks, field, name)
+
+def _snapshot_net(snapshot, field, name):
+    interfaces = snapshot['network']
+    if field == 'connections':
+        return connection_collector.inventory().summary
+    if field is None:
+        return interfaces
+    # One attribute of every interface, e.g. net.rates
+    return {interface: _subfield(data, field, name) for interface, data in interfaces.items()}
+
+def _snapshot_processes(snapshot, field, name):
+    table = process_table.snapshot()
+    if field is None:
+        return {'version': table.version, 'count': len(table), 'stats': status_histogram(table)}
+    if field == 'stats':
+        return status_histogram(table)
+    if field.startswith('top') and field[3:].isdigit():
+        # processes.top10: the busiest processes by CPU
+        limit = max(1, min(int(field[3:]), MAX_TOP_PROCESSES))
+        rows, _ = query_processes(table, limit=limit)
+        return rows
+    raise ValueError(f"Unknown field '{name}'")
+
+SNAPSHOT_SECTIONS = {
+    'host': _snapshot_host,
+    'cpu': lambda snapshot, field, name: _subfield(snapshot['cpu'], field, name),
+    'memory': lambda snapshot, field, name: _subfield(snapshot['memory'], field, name),
+    'disks': _snapshot_disks,
+    'net': _snapshot_net,
+    'processes': _snapshot_processes,
+    'battery': lambda snapshot, field, name: _subfield(snapshot['battery'], field, name),
+    'stats': lambda snapshot, field, name: _subfield(build_system_stats(snapshot), field, name),
+    'info': lambda snapshot, field, name: _subfield(build_system_info(snapshot), field, name),
+}
+
+def build_snapshot(snapshot, fields=SNAPSHOT_FIELDS):
+    """Only the requested sections of one sampler snapshot.
+
+    `fields` are section names ('cpu') or dotted sub-fields ('net.rates',
+    'processes.top10'), and each one is a key of the result as written.
+    Raises ValueError for an unknown field.
+    """
+    result = {'version': snapshot.version, 'timestamp': snapshot.timestamp}
+    for name in fields:
+        section, _, field = name.partition('.')
+        builder = SNAPSHOT_SECTIONS.get(section)
+        if builder is None:
+            raise ValueError(f"Unknown field '{name}'")
+        result[name] = builder(snapshot, field or None, name)
+    return result
+
+@app.route('/api/snapshot')
+def get_snapshot():
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    try:
+        snapshot = sampler.snapshot()
+        version = (snapshot.version, process_table.snapshot().version)
+        if 'net.connections' in fields:
+            version += (connection_collector.inventory().version,)
+        return cached_json(version, lambda: build_snapshot(snapshot, fields or SNAPSHOT_FIELDS))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'fields': sorted(SNAPSHOT_SECTIONS)}), 400
+
+@app.route('/api/system-stats')
+def system_stats():
+    snapshot = sampler.snapshot()
+    return cached_json(snapshot.version, lambda: build_system_stats(snapshot))
+
+@app.route('/api/system-info')
+def system_info():
+    snapshot = sampler.snapshot()
+    return cached_json(snapshot.version, lambda: build_system_info(snapshot))
 
 @app.route('/api/processes')
 def get_processes():
-    import psutil
-    from datetime import datetime
-    
-    processes = []
     try:
-        # Get all processes with detailed info
-        for proc in psutil.process_iter(['pid', 'name', 'username', 'status', 'cpu_percent', 'memory_percent', 'create_time', 'num_threads']):
-            try:
-                pinfo = proc.info
-                # Format create time
-                create_time = datetime.fromtimestamp(pinfo['create_time'])
-                pinfo['create_time'] = create_time.strftime('%Y-%m-%d %H:%M:%S')
-                
-                processes.append({
-                    'pid': pinfo['pid'],
-                    'name': pinfo['name'],
-                    'username': pinfo['username'] or 'N/A',
-                    'status': pinfo['status'],
-                    'cpu_percent': pinfo['cpu_percent'] or 0.0,
-                    'memory_percent': round(pinfo['memory_percent'] or 0.0, 1),
-                    'num_threads': pinfo['num_threads'],
-                    'create_time': pinfo['create_time']
-                })
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
-        
-        # Calculate accurate process statistics
-        process_stats = {
-            'total': len(processes),
-            'running': len([p for p in processes if p['status'].lower() == 'running']),
-            'sleeping': len([p for p in processes if p['status'].lower() == 'sleeping']),
-            'stopped': len([p for p in processes if p['status'].lower() == 'stopped']),
-            'zombie': len([p for p in processes if p['status'].lower() == 'zombie']),
-            'disk_sleep': len([p for p in processes if p['status'].lower() == 'disk-sleep']),
-            'idle': len([p for p in processes if p['status'].lower() == 'idle'])
+        # Make sure the table has been sampled at least once
+        sampler.snapshot()
+        snapshot = process_table.snapshot()
+
+        args = request.args
+        query = {
+            'user': args.get('user'),
+            'status': args.get('status'),
+            'name': args.get('name'),
+            'search': args.get('search'),
         }
-        
-        # Sort processes by CPU usage for most active first
-        processes.sort(key=lambda x: (x['cpu_percent'], x['memory_percent']), reverse=True)
-        
-        return jsonify({
-            'processes': processes,
-            'stats': process_stats
-        })
+        filtered = any(query.values())
+
+        # Deltas describe the whole table, so they only apply to unfiltered requests
+        since = args.get('since', type=int)
+        if since is not None and not filtered:
+            return cached_json(snapshot.version, lambda: build_process_update(since))
+
+        def build():
+            page, matched = query_processes(
+                snapshot,
+                sort=args.get('sort', 'cpu_percent'),
+                descending=args.get('order', 'desc').lower() != 'asc',
+                limit=args.get('limit', type=int),
+                offset=args.get('offset', 0, type=int),
+                regex=args.get('regex', 'false').lower() == 'true',
+                **query
+            )
+            return {
+                'full': True,
+                'version': snapshot.version,
+                'processes': page,
+                'matched': matched,
+                'stats': status_histogram(snapshot)
+            }
+
+        # The table version only moves when a process changed, so idle polls get a 304
+        try:
+            return cached_json(snapshot.version, build)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'processes': [], 'stats': status_histogram(snapshot)}), 400
         
     except Exception as e:
         return jsonify({
@@ -458,121 +516,49 @@ def kill_process(pid):
             'error': str(e)
         })
 
+def _process_stats_response(stats):
+    if 'error' not in stats:
+        return stats
+    return {
+        'error': stats['error'],
+        'cpu_percent': 0.0,
+        'memory_percent': 0.0,
+        'memory_info': {
+            'rss': 0,
+            'vms': 0
+        },
+        'io_info': {
+            'read_bytes': 0,
+            'write_bytes': 0
+        },
+        'num_threads': 0,
+        'status': 'unknown'
+    }
+
 @app.route('/api/processes/<int:pid>/stats')
 def get_process_stats(pid):
+    # Values come from the watch registry, refreshed on every sampler tick
+    snapshot = sampler.snapshot()
+    return cached_json(snapshot.version, lambda: _process_stats_response(pid_watch.stats(pid)))
+
+@app.route('/api/processes/stats')
+def get_processes_stats():
     try:
-        process = psutil.Process(pid)
-        with process.oneshot():  # Get all info in a single system call
-            # Get initial CPU percent
-            process.cpu_percent()
-            time.sleep(0.1)  # Wait for accurate measurement
-            
-            # Get memory info directly
-            memory_info = process.memory_info()
-            memory_percent = process.memory_percent()
-            
-            # Get I/O counters safely
-            try:
-                io_counters = process.io_counters()
-                io_info = {
-                    'read_bytes': io_counters.read_bytes,
-                    'write_bytes': io_counters.write_bytes
-                }
-            except (psutil.AccessDenied, AttributeError):
-                io_info = {'read_bytes': 0, 'write_bytes': 0}
-            
-            # Get process status
-            try:
-                status = process.status()
-            except (psutil.AccessDenied, AttributeError):
-                status = "unknown"
-            
-            # Get thread count
-            try:
-                num_threads = process.num_threads()
-            except (psutil.AccessDenied, AttributeError):
-                num_threads = 0
-            
-            return jsonify({
-                'cpu_percent': process.cpu_percent(),
-                'memory_percent': memory_percent,
-                'memory_info': {
-                    'rss': getattr(memory_info, 'rss', 0),  # Physical memory
-                    'vms': getattr(memory_info, 'vms', 0)   # Virtual memory
-                },
-                'num_threads': num_threads,
-                'status': status,
-                'io_info': io_info
-            })
-            
-    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
-        return jsonify({
-            'error': str(e),
-            'cpu_percent': 0.0,
-            'memory_percent': 0.0,
-            'memory_info': {
-                'rss': 0,
-                'vms': 0
-            },
-            'io_info': {
-                'read_bytes': 0,
-                'write_bytes': 0
-            },
-            'num_threads': 0,
-            'status': 'unknown'
-        })
+        pids = [int(pid) for pid in request.args.get('pids', '').split(',') if pid.strip()]
+    except ValueError:
+        return jsonify({'error': 'pids must be a comma separated list of integers', 'processes': {}}), 400
+
+    snapshot = sampler.snapshot()
+    return cached_json(snapshot.version, lambda: {
+        'processes': {str(pid): _process_stats_response(data) for pid, data in pid_watch.stats_many(pids).items()}
+    })
 
 @app.route('/api/network')
 def network_stats():
     try:
-        # Get network interfaces information
-        interfaces = {}
-        if_addrs = psutil.net_if_addrs()
-        io_counters = psutil.net_io_counters(pernic=True)
-        stats = psutil.net_if_stats()
-        
-        for interface, addrs in if_addrs.items():
-            ipv4_addr = next((addr.address for addr in addrs if addr.family == 2), None)
-            
-            # Get interface stats
-            interface_stats = stats.get(interface, None)
-            is_up = interface_stats.isup if interface_stats else False
-            
-            # Get I/O counters
-            io_counter = io_counters.get(interface, None)
-            bytes_sent = io_counter.bytes_sent if io_counter else 0
-            bytes_recv = io_counter.bytes_recv if io_counter else 0
-            
-            # Calculate max bytes for percentage (use 1GB as reference)
-            max_bytes = 1024 * 1024 * 1024  # 1GB
-            
-            interfaces[interface] = {
-                'address': ipv4_addr,
-                'bytes_sent': bytes_sent,
-                'bytes_recv': bytes_recv,
-                'max_bytes': max_bytes,
-                'isup': is_up
-            }
-        
-        # Get network connections
-        connections = []
-        for conn in psutil.net_connections(kind='inet'):
-            try:
-                connections.append({
-                    'type': 'TCP' if conn.type == socket.SOCK_STREAM else 'UDP',
-                    'laddr': list(conn.laddr) if conn.laddr else None,
-                    'raddr': list(conn.raddr) if conn.raddr else None,
-                    'status': conn.status,
-                    'pid': conn.pid
-                })
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        
-        return jsonify({
-            'interfaces': interfaces,
-            'connections': connections
-        })
-        
+        snapshot = sampler.snapshot()
+        version = (snapshot.version, connection_collector.inventory().version)
+        return cached_json(version, lambda: build_network_stats(snapshot, connection_query(request.args)))
     except Exception as e:
         return jsonify({
             'error': str(e),
@@ -580,16 +566,27 @@ def network_stats():
             'connections': []
         })
 
+@app.route('/api/network/connections')
+def network_connections():
+    # Aggregates plus one filtered page, without the interface stats
+    inventory = connection_collector.inventory()
+
+    def build():
+        connections, matched = inventory.query(**connection_query(request.args))
+        return {
+            'success': True,
+            'summary': inventory.summary,
+            'connections': connections,
+            'matched': matched
+        }
+
+    return cached_json(inventory.version, build)
+
 @app.route('/api/disks')
 def disk_stats():
     try:
-        disk_info = get_disks_info()
-        disk_io = get_disk_io()
-        return jsonify({
-            'disk_info': disk_info,
-            'disk_io': disk_io,
-            'success': True
-        })
+        snapshot = sampler.snapshot()
+        return cached_json(snapshot.version, lambda: build_disk_stats(snapshot))
     except Exception as e:
         return jsonify({
             'disk_info': {},
@@ -598,77 +595,196 @@ def disk_stats():
             'error': str(e)
         })
 
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape, rendered once per sampler tick from the cached snapshot
+    snapshot = sampler.snapshot()
+    processes = process_table.snapshot()
+    top = max(0, min(request.args.get('top', 0, type=int), exporter.MAX_TOP_PROCESSES))
+    return cached_response(
+        (snapshot.version, processes.version),
+        lambda: exporter.render_metrics(snapshot, processes, top),
+        exporter.CONTENT_TYPE
+    )
+
+def _fleet_authorized():
+    # Agents authenticate with a shared secret when FLEET_TOKEN is set
+    token = os.environ.get('FLEET_TOKEN')
+    if not token:
+        return True
+    header = request.headers.get('Authorization', '')
+    return header.startswith('Bearer ') and hmac.compare_digest(header[7:].encode(), token.encode())
+
+@app.route('/api/fleet/ingest', methods=['POST'])
+def fleet_ingest():
+    if not _fleet_authorized():
+        return jsonify({'success': False, 'error': 'Invalid token'}), 401
+    # Backpressure: agents told to come back later keep their batch and spool it
+    if not ingest_slots.acquire(blocking=False):
+        return jsonify({'success': False, 'error': 'Busy'}), 503, {'Retry-After': str(RETRY_AFTER)}
+    try:
+        reports = decode_batch(request.get_data(), request.headers.get('Content-Encoding'))
+        accepted = fleet_store.ingest(reports)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    finally:
+        ingest_slots.release()
+    return jsonify({'success': True, 'accepted': accepted, 'rejected': len(reports) - accepted})
+
+@app.route('/api/fleet')
+def fleet_overview():
+    top = max(1, min(request.args.get('top', FLEET_TOP_N, type=int), 100))
+    return json_response(fleet_store.overview(top))
+
+@app.route('/api/fleet/hosts/<host>', methods=['GET', 'DELETE'])
+def fleet_host(host):
+    if request.method == 'DELETE':
+        # Removing hosts needs the same token as reporting them
+        if not _fleet_authorized():
+            return jsonify({'success': False, 'error': 'Invalid token'}), 401
+        return jsonify({'success': fleet_store.forget(host)})
+    state = fleet_store.host(host, since=request.args.get('since', type=float))
+    if state is None:
+        return jsonify({'success': False, 'error': f"Unknown host '{host}'"}), 404
+    state['success'] = True
+    return json_response(state)
+
+# Upper bound on records in one bulk upload, a day of events is far below it
+MAX_PRODUCTIVITY_RECORDS = 20000
+
+@app.route('/api/productivity/bulk', methods=['POST'])
+def productivity_bulk():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Expected a JSON object with activities and/or workblocks'}), 400
+    activities = data.get('activities') or []
+    workblocks = data.get('workblocks') or []
+    if not isinstance(activities, list) or not isinstance(workblocks, list):
+        return jsonify({'success': False, 'error': 'activities and workblocks must be lists'}), 400
+    if len(activities) + len(workblocks) > MAX_PRODUCTIVITY_RECORDS:
+        return jsonify({'success': False, 'error': f'At most {MAX_PRODUCTIVITY_RECORDS} records per request'}), 413
+    try:
+        added_activities, added_workblocks = productivity.get_tracker().add_bulk(activities, workblocks)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({
+        'success': True,
+        'activities': [record['id'] for record in added_activities],
+        'workblocks': [record['id'] for record in added_workblocks],
+    }), 201
+
+@app.route('/api/productivity')
+def productivity_data():
+    return json_response(productivity.get_productivity_data())
+
+@app.route('/api/productivity/report')
+def productivity_report():
+    tracker = productivity.get_tracker()
+    period = request.args.get('period', 'week')
+    try:
+        if period == 'week':
+            report = tracker.get_weekly_report(request.args.get('date'))
+        elif period == 'month':
+            report = tracker.get_monthly_report(request.args.get('date'))
+        elif period == 'range':
+            start, end = request.args.get('start'), request.args.get('end')
+            if not start or not end:
+                raise ValueError('start and end are required for a range report')
+            report = tracker.get_range_report(start, end)
+        else:
+            raise ValueError(f"Unknown period '{period}', expected week, month or range")
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return json_response(report)
+
+@app.route('/api/alerts')
+def alerts():
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    return json_response({
+        'rules': alert_engine.rules(),
+        'active': alert_engine.active(),
+        'events': alert_engine.events(limit),
+        'evaluation_ms': round(alert_engine.last_duration * 1000, 3),
+    })
+
+@app.route('/api/alerts/rules', methods=['POST'])
+def add_alert_rule():
+    data = request.get_json(silent=True) or {}
+    try:
+        rule = alert_engine.add_rule(str(data.get('rule', '')), data.get('name'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    alert_engine.save()
+    return jsonify({'success': True, 'rule': rule.to_dict()}), 201
+
+@app.route('/api/alerts/rules/<rule_id>', methods=['DELETE'])
+def delete_alert_rule(rule_id):
+    if not alert_engine.remove_rule(rule_id):
+        return jsonify({'success': False, 'error': f"Unknown rule '{rule_id}'"}), 404
+    alert_engine.save()
+    return jsonify({'success': True})
+
+def _history_time(value, now):
+    # Negative values are relative to now, e.g. from=-3600 for the last hour
+    value = float(value)
+    return now + value if value <= 0 else value
+
+@app.route('/api/history')
+def get_history():
+    metric = request.args.get('metric')
+    if not metric:
+        return json_response({'success': True, 'metrics': metric_store.metrics()})
+
+    now = time.time()
+    try:
+        end = _history_time(request.args.get('to', 0), now)
+        start = _history_time(request.args.get('from', -3600), now)
+        step = request.args.get('step', type=float)
+        history = metric_store.query(metric, start, end, step)
+    except KeyError:
+        return jsonify({'success': False, 'error': f"Unknown metric '{metric}'", 'points': []}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e), 'points': []}), 400
+
+    history['success'] = True
+    # No version to key on, but an unchanged range still answers with a 304
+    return json_response(history)
+
 @app.route('/api/logs')
 def get_logs():
     try:
-        log_files = []
-        
-        # Windows-specific log directories and event logs
-        windows_logs = [
-            os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'Logs'),
-            os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'debug'),
-            os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'system32', 'winevt', 'Logs'),
-            os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'System32', 'LogFiles'),
-            os.path.join(os.environ.get('SYSTEMROOT', 'C:\\Windows'), 'System32', 'config'),
-            os.path.join(os.environ.get('SYSTEMDRIVE', 'C:'), 'ProgramData', 'Microsoft', 'Windows', 'WER'),
-            'C:\\ProgramData\\Microsoft\\Windows\\WER\\ReportArchive',
-            'C:\\ProgramData\\Microsoft\\Windows\\WER\\ReportQueue'
-        ]
-        
-        # Common log file extensions
-        log_extensions = ['.log', '.txt', '.evt', '.evtx', '.etl', '.wer', '.dmp']
-        
-        # Check Windows logs
-        for log_dir in windows_logs:
-            if os.path.exists(log_dir):
-                try:
-                    for root, dirs, files in os.walk(log_dir):
-                        for file in files:
-                            file_ext = os.path.splitext(file)[1].lower()
-                            if file_ext in log_extensions:
-                                try:
-                                    full_path = os.path.join(root, file)
-                                    file_size = os.path.getsize(full_path)
-                                    modified_time = datetime.fromtimestamp(os.path.getmtime(full_path))
-                                    log_files.append({
-                                        'name': file,
-                                        'path': full_path,
-                                        'size': bytes2human(file_size),
-                                        'modified': modified_time.strftime('%Y-%m-%d %H:%M:%S'),
-                                        'type': 'system' if 'windows' in full_path.lower() else 'application'
-                                    })
-                                    # Limit to 50 files to prevent overload
-                                    if len(log_files) >= 50:
-                                        break
-                                except (PermissionError, OSError):
-                                    continue
-                        if len(log_files) >= 50:
-                            break
-                except (PermissionError, OSError):
-                    pass
-        
-        # Also check application logs
-        app_log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-        if os.path.exists(app_log_dir):
-            for file in os.listdir(app_log_dir):
-                if file.endswith(tuple(log_extensions)):
-                    full_path = os.path.join(app_log_dir, file)
-                    modified_time = datetime.fromtimestamp(os.path.getmtime(full_path))
-                    log_files.append({
-                        'name': file,
-                        'path': full_path,
-                        'size': bytes2human(os.path.getsize(full_path)),
-                        'modified': modified_time.strftime('%Y-%m-%d %H:%M:%S'),
-                        'type': 'application'
-                    })
-        
-        # Sort logs by modification time (newest first)
-        log_files.sort(key=lambda x: x['modified'], reverse=True)
-        
-        return jsonify({
-            'success': True,
-            'log_files': log_files
-        })
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = max(1, min(request.args.get('limit', LOG_PAGE_SIZE, type=int), MAX_LOG_PAGE_SIZE))
+        # Waits for the first scan, so the version below belongs to a real listing
+        log_catalog.files()
+        version = log_catalog.version
+
+        def build():
+            page, total = log_catalog.page(
+                offset, limit,
+                type=request.args.get('type'),
+                query=request.args.get('q')
+            )
+
+            log_files = [{
+                'name': log_file.name,
+                'path': log_file.path,
+                'size': bytes2human(log_file.size),
+                'modified': datetime.fromtimestamp(log_file.modified).strftime('%Y-%m-%d %H:%M:%S'),
+                'type': log_file.type,
+                'rotated': len(log_file.members) - 1
+            } for log_file in page]
+
+            return {
+                'success': True,
+                'log_files': log_files,
+                'total': total,
+                'offset': offset,
+                'limit': limit,
+                'version': version
+            }
+
+        return cached_json(version, build)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -676,13 +792,37 @@ def get_logs():
             'log_files': []
         })
 
+@app.route('/api/logs/search')
+def search_logs():
+    # Matches stream back as one JSON object per line, ending with a summary
+    try:
+        pattern = logsearch.compile_pattern(
+            query=request.args.get('q'),
+            regex=request.args.get('regex'),
+            ignore_case=request.args.get('ignore_case', 'false').lower() == 'true'
+        )
+        since = request.args.get('since')
+        if since is not None:
+            since = _history_time(since, time.time())
+        paths = [path for path in request.args.get('paths', '').split(',') if path]
+        max_results = max(1, min(request.args.get('limit', logsearch.DEFAULT_RESULTS, type=int), logsearch.MAX_RESULTS))
+        time_budget = max(0.1, min(request.args.get('timeout', logsearch.DEFAULT_TIME_BUDGET, type=float), logsearch.MAX_TIME_BUDGET))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    files = logsearch.select_files(paths, since)
+    results = logsearch.search_logs(pattern, files, max_results, time_budget)
+    lines = (dumps(result) + b'\n' for result in results)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
 @app.route('/api/logs/content')
 def get_log_content():
     try:
         log_path = request.args.get('path')
         download = request.args.get('download', 'false').lower() == 'true'
         
-        if not log_path or not os.path.exists(log_path):
+        # A rotation set can be opened by its active name even after the active file is gone
+        if not log_path or not (os.path.exists(log_path) or rotation_members(log_path)):
             return jsonify({
                 'success': False,
                 'error': 'Log file not found',
@@ -703,27 +843,24 @@ def get_log_content():
                     'content': ''
                 })
             
-        # Read last 100 lines of the log file
+        # Read a window of lines by seeking, never the whole file
         try:
-            with open(log_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()[-100:]
-                content = ''.join(lines)
-        except UnicodeDecodeError:
-            try:
-                with open(log_path, 'r', encoding='latin1') as f:
-                    lines = f.readlines()[-100:]
-                    content = ''.join(lines)
-            except:
-                return jsonify({
-                    'success': False,
-                    'error': 'Unable to read log file - it may be binary',
-                    'content': ''
-                })
+            window = read_log(
+                log_path,
+                lines=request.args.get('lines', 100, type=int),
+                before=request.args.get('before', type=int),
+                after=request.args.get('after', type=int),
+                line=request.args.get('line', type=int)
+            )
+        except BinaryLogError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'content': ''
+            })
                 
-        return jsonify({
-            'success': True,
-            'content': content
-        })
+        window['success'] = True
+        return json_response(window)
     except Exception as e:
         return jsonify({
             'success': False,
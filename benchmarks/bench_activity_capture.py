@@ -0,0 +1,93 @@
+"""CPU cost of classifying the process table for activity capture.
+
+Builds a process table of PROCESSES entries with a workstation-like mix
+of names (editors, chat, browsers, daemons), a third of them using CPU,
+and replaces CHURN of them with new pids every sample, the way short
+lived processes come and go. Times ActivityCapture.sample() cold (every
+process classified, command lines read) and warm, and reports the
+steady-state cost as a share of one core at a 5 second interval.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_activity_capture [processes]
+"""
+import itertools
+import random
+import sys
+import time
+
+from app.activitycapture import ActivityCapture, ProcessClassifier, DEFAULT_INTERVAL
+from app.proctable import ProcessSnapshot
+
+PROCESSES = 400
+CHURN = 10
+SAMPLES = 500
+NAMES = ['code', 'Code Helper (Renderer)', 'slack', 'zoom.us', 'firefox', 'chrome', 'python3', 'node', 'bash',
+         'zsh', 'systemd', 'kworker/0:1', 'sshd', 'dbus-daemon', 'pipewire', 'Xorg', 'gnome-shell', 'thunderbird',
+         'figma_agent', 'soffice.bin', 'postgres', 'nginx', 'containerd', 'dockerd', 'cron', 'nvim']
+
+
+class _Commands:
+    """Stands in for psutil: command lines by pid, counting lookups."""
+
+    def __init__(self):
+        self.lookups = 0
+
+    def __call__(self, pid):
+        self.lookups += 1
+        return f'/usr/bin/{NAMES[pid % len(NAMES)]} --flag value /home/user/project/file{pid}.txt'
+
+
+class _Tracker:
+    def __init__(self):
+        self.batches = []
+
+    def add_activities(self, activities):
+        self.batches.append(list(activities))
+
+
+def table(pids, version):
+    snapshot = ProcessSnapshot(version)
+    for pid in pids:
+        busy = pid % 3 == 0
+        snapshot.append(pid, NAMES[pid % len(NAMES)], 'user', 'running' if busy else 'sleeping',
+                        random.uniform(0.1, 30.0) if busy else 0.0, 1.0, 4, 1_700_000_000.0 + pid)
+    return snapshot
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else PROCESSES
+    commands = _Commands()
+    capture = ActivityCapture(_Tracker(), classifier=ProcessClassifier(cmdline=commands))
+    next_pid = itertools.count(processes + 1000)
+    pids = list(range(1000, 1000 + processes))
+    snapshots = []
+    for version in range(SAMPLES):
+        snapshots.append(table(pids, version))
+        for index in random.sample(range(len(pids)), CHURN):
+            pids[index] = next(next_pid)
+
+    started = time.process_time()
+    capture.sample(snapshots[0], now=0)
+    cold = time.process_time() - started
+    print(f"{processes} processes, cold sample: {cold * 1000:.2f} ms CPU, {commands.lookups} command lines read")
+
+    commands.lookups = 0
+    durations = []
+    for n, snapshot in enumerate(snapshots[1:], 1):
+        started = time.perf_counter()
+        capture.sample(snapshot, now=n * DEFAULT_INTERVAL)
+        durations.append(time.perf_counter() - started)
+    capture.flush(close=True)
+    durations.sort()
+    mean = sum(durations) / len(durations)
+    print(f"warm sample ({CHURN} new processes each): mean {mean * 1e6:,.0f} us, "
+          f"p99 {durations[int(len(durations) * 0.99)] * 1e6:,.0f} us, "
+          f"{commands.lookups / (len(snapshots) - 1):.1f} command lines read per sample")
+    print(f"at one sample per {DEFAULT_INTERVAL:.0f}s: {mean / DEFAULT_INTERVAL * 100:.4f}% of one core")
+    activities = sum(len(batch) for batch in capture.tracker.batches)
+    print(f"{activities} activities in {len(capture.tracker.batches)} write(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Per-tick cost of evaluating hundreds of alert rules.
+
+Builds RULES rules over the metrics of this machine (thresholds, rates,
+disk and process rules, with and without `for`), then evaluates them
+against a real sampler snapshot with advancing timestamps and the cpu,
+memory and process count moving every tick, the way the sampler thread
+does once a second. Reported per tick: mean, p99 and max.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_alert_rules [rules]
+"""
+import itertools
+import sys
+import time
+
+from app.alerts import AlertEngine
+from app.sampler import sampler, Snapshot
+
+RULES = 500
+TICKS = 2000
+
+
+def rule_texts(snapshot):
+    interfaces = list(snapshot.get('network') or {}) or ['lo']
+    mounts = [partition['mountpoint'] for partition in snapshot['disks']['partitions']] or ['/']
+    devices = list(snapshot.get('disk_io') or {}) or ['sda']
+    templates = [
+        lambda n: f'cpu_percent > {50 + n % 50} for {n % 5}m',
+        lambda n: f'memory_percent >= {60 + n % 40} clear {50 + n % 40}',
+        lambda n: f"disk['{mounts[n % len(mounts)]}'].percent > {80 + n % 20}",
+        lambda n: f'rate(net.{interfaces[n % len(interfaces)]}.errors) > 0',
+        lambda n: f"net['{interfaces[n % len(interfaces)]}'].rates.bytes_recv.current > {n * 1000}",
+        lambda n: f'rate(disk_io.{devices[n % len(devices)]}.write_bytes) > {n * 1e6} for 30s',
+        lambda n: f"process 'daemon-{n}' missing for 1m",
+        lambda n: f'process_count > {1000 + n}',
+    ]
+    cycle = itertools.cycle(templates)
+    return [next(cycle)(n) for n in range(RULES if len(sys.argv) < 2 else int(sys.argv[1]))]
+
+
+def varied(base, n):
+    """Snapshot data with cpu, memory and process count moving every tick."""
+    data = dict(base.data)
+    data['cpu'] = dict(data['cpu'], percent=float(n * 37 % 100))
+    data['memory'] = dict(data['memory'], percent=float(n * 13 % 100))
+    data['process_count'] = 900 + n % 300
+    return data
+
+
+def run(engine, snapshots, label):
+    durations = []
+    now = time.monotonic()
+    for tick, snapshot in enumerate(snapshots):
+        started = time.perf_counter()
+        engine.evaluate(snapshot, now=now + tick)
+        durations.append(time.perf_counter() - started)
+    durations.sort()
+    mean = sum(durations) / len(durations)
+    print(f"{label}: mean {mean * 1e6:,.0f} us, p99 {durations[int(len(durations) * 0.99)] * 1e6:,.0f} us, "
+          f"max {durations[-1] * 1e6:,.0f} us per tick")
+
+
+def main():
+    sampler.tick()
+    base = sampler.snapshot()
+    texts = rule_texts(base)
+    snapshots = [Snapshot(base.version + n, base.timestamp + n, varied(base, n), {}) for n in range(TICKS)]
+
+    engine = AlertEngine(path='/nonexistent')
+    for text in texts:
+        engine.add_rule(text)
+    print(f"{len(texts)} rules, {TICKS} ticks")
+    run(engine, snapshots, 'typical')
+
+    # Worst case: every rule is true, so each one walks pending -> firing
+    firing = AlertEngine(path='/nonexistent')
+    for text in texts:
+        rule = firing.add_rule(text)
+        rule.compare = lambda value, threshold: True
+    run(firing, snapshots, 'all true')
+    print(f"firing: {len(firing.active())} of {len(texts)}")
+    sampler.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Bytes on the wire and server CPU per request for the JSON API responses.
+
+Serves a synthetic /api/processes payload (1k and 10k processes) and a
+/api/network payload (64 interfaces with rates, 1000 connections) two
+ways: the old jsonify() route, and the cached_json() response layer.
+Each data version is fetched by CLIENTS clients, as when several
+dashboards poll the same host, and then revalidated once with its ETag.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_api_responses
+"""
+import random
+import sys
+import time
+
+from flask import Flask, jsonify
+
+from app import httpcache
+from app.httpcache import cached_json, response_cache
+from benchmarks.bench_process_snapshot import synthetic_processes, build_snapshot
+
+SIZES = (1_000, 10_000)
+CLIENTS = 10
+VERSIONS = 20
+
+
+def process_payload(snapshot, version):
+    return {
+        'full': True,
+        'version': version,
+        'processes': snapshot.rows(),
+        'matched': len(snapshot),
+        'stats': {'total': len(snapshot), 'running': 3, 'sleeping': len(snapshot) - 3},
+    }
+
+
+def network_payload(version, seed=1):
+    rng = random.Random(seed + version)
+    rate = lambda: {'current': rng.random() * 1e6, 'peak': rng.random() * 1e7,
+                    'avg_1m': rng.random() * 1e6, 'avg_5m': rng.random() * 1e6, 'avg_15m': rng.random() * 1e6}
+    fields = ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv', 'errin', 'errout', 'dropin', 'dropout')
+    return {
+        'interfaces': {f'eth{i}': {
+            'address': f'10.0.{i}.1', 'bytes_sent': rng.getrandbits(40), 'bytes_recv': rng.getrandbits(40),
+            'isup': True, 'speed': 10000, 'rates': {field: rate() for field in fields},
+            'utilisation': {'sent': rng.random() * 100, 'recv': rng.random() * 100},
+        } for i in range(64)},
+        'connections': [{
+            'type': 'TCP', 'laddr': ['10.0.0.1', rng.randint(1024, 65535)],
+            'raddr': [f'192.168.{rng.randint(0, 255)}.{rng.randint(1, 254)}', 443],
+            'status': 'ESTABLISHED', 'pid': rng.randint(1, 50000),
+        } for _ in range(1000)],
+    }
+
+
+def make_app(build):
+    app = Flask(__name__)
+    state = {'version': 0}
+
+    @app.route('/before')
+    def before():
+        return jsonify(build(state['version']))
+
+    @app.route('/after')
+    def after():
+        version = state['version']
+        return cached_json(version, lambda: build(version))
+
+    return app, state
+
+
+def run(app, state, url, encoding, revalidate):
+    client = app.test_client()
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    wire = 0
+    requests = 0
+    started = time.process_time()
+    for version in range(VERSIONS):
+        state['version'] = version
+        etag = None
+        for _ in range(CLIENTS):
+            response = client.get(url, headers=headers)
+            wire += len(response.data)
+            etag = response.headers.get('ETag')
+            requests += 1
+        if revalidate and etag:
+            response = client.get(url, headers=dict(headers, **{'If-None-Match': etag}))
+            assert url == '/before' or response.status_code == 304
+            wire += len(response.data)
+            requests += 1
+    cpu = time.process_time() - started
+    return wire / requests, cpu / requests * 1000
+
+
+def report(name, build):
+    app, state = make_app(build)
+    encodings = [None, 'gzip'] + (['br'] if httpcache.brotli is not None else [])
+    rows = [('jsonify', '/before', None)]
+    rows += [(f'cached {encoding or "identity"}', '/after', encoding) for encoding in encodings]
+    for label, url, encoding in rows:
+        response_cache.clear()
+        wire, cpu_ms = run(app, state, url, encoding, revalidate=True)
+        print(f"{name:>18} {label:>16} {wire:>14,.0f} {cpu_ms:>12.2f}")
+
+
+def main():
+    print(f"JSON encoder: {'orjson' if httpcache.orjson is not None else 'json'}, "
+          f"brotli: {'yes' if httpcache.brotli is not None else 'not installed'}, "
+          f"{CLIENTS} clients per version + 1 revalidation")
+    print(f"{'payload':>18} {'response':>16} {'bytes/request':>14} {'cpu ms/req':>12}")
+    for size in SIZES:
+        snapshot = build_snapshot(synthetic_processes(size))
+        report(f'processes {size // 1000}k', lambda version: process_payload(snapshot, version))
+    report('network', network_payload)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Memory used to tail gzip archives of growing size.
+
+Writes synthetic logs of 64 MB, 256 MB and 1 GB (uncompressed) as gzip
+archives in a temporary directory, then reads the last 100 and the last
+5000 lines of each with read_log(). Archives can't be read backwards, so
+this streams through the whole file; peak traced memory should stay the
+same whatever the archive size, while time grows with it.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_compressed_tail [size in MB ...]
+"""
+import gc
+import gzip
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.logreader import read_log, _archive_meta
+
+SIZES_MB = (64, 256, 1024)
+LINES = (100, 5000)
+
+
+def write_archive(path, size_mb):
+    line_number = 0
+    written = 0
+    target = size_mb * 1024 * 1024
+    # Level 1 keeps generation time reasonable; the reader's work is the same
+    with gzip.open(path, 'wt', compresslevel=1) as f:
+        while written < target:
+            block = ''.join(
+                f"2026-10-18T12:{(n // 60) % 60:02d}:{n % 60:02d} host app[{n % 977}]: "
+                f"request {n} served in {n % 1000} ms status={200 if n % 13 else 500}\n"
+                for n in range(line_number, line_number + 10_000))
+            f.write(block)
+            written += len(block)
+            line_number += 10_000
+    return line_number
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def measure(path, lines):
+    # Uncompressed sizes are cached per archive, start cold every time
+    _archive_meta.clear()
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    window = read_log(path, lines=lines)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return window, peak, elapsed
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES_MB
+    print(f"{'size MB':>8} {'gz MB':>8} {'lines':>6} {'peak traced':>14} {'max rss MB':>11} {'seconds':>8} {'MB/s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in sizes:
+            path = os.path.join(directory, f'app-{size_mb}.log.gz')
+            write_archive(path, size_mb)
+            compressed = os.path.getsize(path) / (1024 * 1024)
+            for lines in LINES:
+                window, peak, elapsed = measure(path, lines)
+                assert window['content'].count('\n') == lines
+                print(f"{size_mb:>8} {compressed:>8.1f} {lines:>6} {peak:>14,} {max_rss_mb():>11.1f} "
+                      f"{elapsed:>8.2f} {window['size'] / elapsed / (1024 * 1024):>8.0f}")
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
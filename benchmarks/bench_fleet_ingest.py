@@ -0,0 +1,56 @@
+"""Aggregator cost of hundreds of agents reporting every few seconds.
+
+Builds one real host report, then pushes it as HOSTS different hosts
+through the /api/fleet/ingest route (gzip body, as the agent sends it)
+for ROUNDS rounds, and times the fleet overview at that size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fleet_ingest [hosts]
+"""
+import gzip
+import json
+import sys
+import time
+
+from app import app
+from app.agent import host_report
+from app.fleet import fleet_store
+from app.proctable import process_table
+from app.sampler import sampler
+
+HOSTS = 500
+ROUNDS = 5
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else HOSTS
+    report = host_report(sampler.snapshot(), 'template', process_table.snapshot())
+    client = app.test_client()
+    bodies = []
+    for n in range(hosts):
+        report = dict(report, host=f'host-{n:04d}')
+        bodies.append(gzip.compress(json.dumps({'reports': [report]}).encode('utf-8')))
+    print(f"{hosts} hosts, {len(bodies[0]):,} byte gzip batches")
+
+    for round in range(ROUNDS):
+        started = time.perf_counter()
+        cpu = time.process_time()
+        for body in bodies:
+            response = client.post('/api/fleet/ingest', data=body, headers={'Content-Encoding': 'gzip'})
+            assert response.status_code == 200, response.data
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu
+        print(f"round {round}: {hosts / elapsed:,.0f} ingests/s, {cpu / hosts * 1000:.2f} ms CPU per ingest")
+
+    started = time.perf_counter()
+    overview = fleet_store.overview()
+    print(f"overview of {overview['total']} hosts: {(time.perf_counter() - started) * 1000:.1f} ms")
+    started = time.perf_counter()
+    client.get('/api/fleet')
+    print(f"GET /api/fleet: {(time.perf_counter() - started) * 1000:.1f} ms")
+    sampler.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Memory and allocation cost of the process list representations.
+
+Compares the dict-of-dicts shape built by the old get_process_list() /
+get_processes() code (one dict per process with a datetime and a
+formatted create_time string) against the columnar ProcessSnapshot, at
+1k, 10k and 50k synthetic processes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_process_snapshot
+"""
+import gc
+import sys
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.proctable import ProcessSnapshot
+
+SIZES = (1_000, 10_000, 50_000)
+RENDERED_ROWS = 50
+
+NAMES = ['python', 'bash', 'postgres', 'nginx', 'node', 'java', 'sshd', 'systemd', 'gcc', 'make', 'cc1plus', 'ld']
+USERS = ['root', 'build', 'www-data', 'postgres']
+STATUSES = ['running', 'sleeping', 'sleeping', 'sleeping', 'idle', 'disk-sleep', 'zombie']
+
+
+def synthetic_processes(count, seed=1):
+    rng = random.Random(seed)
+    now = time.time()
+    for pid in range(1, count + 1):
+        # Names, users and statuses come from psutil as fresh str objects
+        yield (pid, ''.join(rng.choice(NAMES)), ''.join(rng.choice(USERS)), ''.join(rng.choice(STATUSES)),
+               round(rng.random() * 100, 1), round(rng.random() * 10, 1), rng.randint(1, 64),
+               now - rng.random() * 86400)
+
+
+def build_dicts(processes):
+    table = {}
+    for pid, name, username, status, cpu, mem, threads, create_time in processes:
+        created = datetime.fromtimestamp(create_time)
+        table[pid] = {
+            'pid': pid,
+            'name': name,
+            'username': username,
+            'status': status,
+            'cpu_percent': cpu,
+            'memory_percent': mem,
+            'num_threads': threads,
+            'create_time': created,
+            'create_time_str': created.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+    return table
+
+
+def build_snapshot(processes):
+    snapshot = ProcessSnapshot()
+    for pid, name, username, status, cpu, mem, threads, create_time in processes:
+        snapshot.append(pid, sys.intern(name), sys.intern(username), sys.intern(status),
+                        cpu, mem, threads, create_time)
+    return snapshot
+
+
+def measure(builder, processes):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = builder(processes)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    return result, current, peak, blocks, elapsed
+
+
+def main():
+    print(f"{'processes':>10} {'shape':>10} {'retained':>12} {'peak':>12} {'blocks':>10} {'build ms':>10} {'render ms':>10}")
+    for size in SIZES:
+        processes = list(synthetic_processes(size))
+
+        table, current, peak, blocks, elapsed = measure(build_dicts, processes)
+        started = time.perf_counter()
+        top = sorted(table.values(), key=lambda p: p['cpu_percent'], reverse=True)[:RENDERED_ROWS]
+        render = time.perf_counter() - started
+        print(f"{size:>10} {'dicts':>10} {current:>12,} {peak:>12,} {blocks:>10,} {elapsed * 1000:>10.1f} {render * 1000:>10.2f}")
+        del table, top
+
+        snapshot, current, peak, blocks, elapsed = measure(build_snapshot, processes)
+        started = time.perf_counter()
+        cpu = snapshot.cpu_percent
+        top = snapshot.rows(sorted(range(len(snapshot)), key=cpu.__getitem__, reverse=True)[:RENDERED_ROWS])
+        render = time.perf_counter() - started
+        print(f"{size:>10} {'columnar':>10} {current:>12,} {peak:>12,} {blocks:>10,} {elapsed * 1000:>10.1f} {render * 1000:>10.2f}")
+        del snapshot, top
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from app import app
+from app import app, socketio
 import os
 
 if __name__ == "__main__":
@@ -7,8 +7,9 @@ if __name__ == "__main__":
         os.makedirs('logs')
     
     try:
-        # Run the application
-        app.run(
+        # Run the application (through Socket.IO so /live push updates work)
+        socketio.run(
+            app,
             host='127.0.0.1',  # Localhost
             port=5000,         # Default Flask port
             debug=True        # Enable debug mode